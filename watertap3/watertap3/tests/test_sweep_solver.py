@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+pytest.importorskip('idaes')
+from pyomo.environ import SolverFactory, value
+
+from watertap3.utils import SweepSolver, get_case_study, run_sweep_points, run_watertap3, watertap_setup
+
+pytestmark = pytest.mark.skipif(not SolverFactory('ipopt').available(exception_flag=False),
+                                reason='ipopt is not available')
+
+
+@pytest.fixture(scope='module')
+def model():
+    # WaterTAP3 reads its data from data/ relative to the working directory
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        m = watertap_setup(case_study='big_spring', scenario='baseline')
+        m = get_case_study(m=m)
+        m = run_watertap3(m, desired_recovery=1, ro_bounds='other')
+        yield m
+    finally:
+        os.chdir(cwd)
+
+
+def _points(m):
+    pressure = value(m.fs.reverse_osmosis.feed.pressure[0])
+    price = value(m.fs.costing_param.electricity_price)
+    return ([{'label': 'ro_pressure', 'fix': [(m.fs.reverse_osmosis.feed.pressure[0], pressure * k)]}
+             for k in [0.95, 1.0, 1.05]]
+            + [{'label': 'elect_price', 'fix': [(m.fs.costing_param.electricity_price, price * k)]}
+               for k in [0.7, 1.3]])
+
+
+def test_persistent_matches_rebuild(model):
+    outputs = {'LCOW': model.fs.costing.LCOW, 'ro_area': model.fs.reverse_osmosis.membrane_area[0]}
+    sweep = SweepSolver(persistent=True)
+    persistent = run_sweep_points(model, _points(model), outputs, sweep=sweep, verbose=False)
+    rebuilt = run_sweep_points(model, _points(model), outputs, sweep=SweepSolver(), verbose=False)
+
+    assert [r['termination_condition'] for r in persistent] == [r['termination_condition'] for r in rebuilt]
+    for p, r in zip(persistent, rebuilt):
+        assert p['termination_condition'] == 'optimal'
+        for k in outputs:
+            assert p[k] == pytest.approx(r[k], rel=1E-5)
+    # the NL file is written once per swept variable and reused for the other points
+    assert sweep.get_timings().reused.sum() >= 3
+
+
+def test_failed_ipopt_does_not_reuse_previous_solution(model, monkeypatch):
+    sweep = SweepSolver(persistent=True)
+    point = _points(model)[0]
+    run_sweep_points(model, [point], {}, sweep=sweep, verbose=False)
+    monkeypatch.setattr(sweep.model_solver, 'executable', lambda: 'false')
+    with pytest.raises(RuntimeError):
+        sweep._solve_persistent(model, [point['fix'][0][0]], verbose=False)
@@ -1,50 +1,64 @@
+import importlib
 
-from . import constituent_removal_water_recovery
-from .constituent_removal_water_recovery import *
-from . import cost_curves
-from .cost_curves import *
-from . import design
-from .design import *
-from . import financials
-from .financials import *
-from . import mixer_wt3
-from .mixer_wt3 import *
-from . import ml_regression
-from .ml_regression import *
-from . import module_import
-from .module_import import *
-from . import post_processing
-from .post_processing import *
-from . import splitter_wt3
-from .splitter_wt3 import *
-from . import splitter_binary
-from .splitter_binary import *
-from . import case_study_trains
-from .case_study_trains import *
-from . import generate_constituent_list
-from .generate_constituent_list import *
-from . import water_props
-from .water_props import *
-from . import watertap
-from .watertap import *
-from . import sensitivity_runs
-from .sensitivity_runs import *
+# Submodules are imported on first use (PEP 562) so ``import watertap3.utils`` does not pull in
+# IDAES, scipy and sklearn until something that needs them is used.
+# submodule --> names it exports
+_exports = {
+        'data_catalog': ['get_table', 'get_derived', 'file_hash', 'track_files', 'clear_catalog'],
+        'coef_cache': ['get_coefs', 'save_coef_cache', 'flush_coef_cache', 'clear_coef_cache'],
+        'train_spec': ['TrainSpec', 'compile_train', 'get_train_spec', 'clear_train_specs'],
+        'benchmark': ['get_benchmark_cases', 'run_benchmark_case', 'run_benchmark', 'save_baseline', 'load_baseline',
+                      'compare_to_baseline'],
+        'scaling': ['set_nominal', 'scale_stream', 'scale_vars_by_value', 'scale_constraints_by_gradient'],
+        'warm_start': ['get_solution_key', 'save_solution', 'load_solution', 'find_solution', 'clear_warm_starts'],
+        'constituent_removal_water_recovery': ['create', 'get_recovery_index', 'get_water_recovery'],
+        'cost_curves': ['epa_cost_curve', 'basic_unit'],
+        'design': ['add_unit_process', 'add_water_source'],
+        'financials': ['SystemSpecs', 'TEABasis', 'get_tea_basis', 'get_complete_costing', 'get_ind_table',
+                       'get_ind_factors', 'get_system_specs', 'get_system_costing', 'global_costing_parameters'],
+        'mixer_wt3': ['Mixer'],
+        'ml_regression': ['make_df_for_ml', 'make_simple_poly', 'get_linear_regression', 'get_cost_curve_coefs',
+                          'fit_power_laws'],
+        'module_import': ['get_module', 'register_unit', 'unit_modules'],
+        'post_processing': ['get_results_table', 'combine_case_study_results', 'compare_with_excel'],
+        'sensitivity_runs': ['run_sensitivity', 'run_sensitivity_power', 'get_fixed_onm_reduction'],
+        'sweep_solver': ['SweepSolver'],
+        'parallel_sweep': ['get_model_spec', 'build_model', 'run_sweep_points'],
+        'sweep_spec': ['sensitivity_spec', 'tds_sensitivity_spec', 'power_sensitivity_spec', 'sweep_setups',
+                       'load_sweep_spec', 'get_component', 'expand_sweep_spec', 'run_sweep_spec'],
+        'profiler': ['enable_profiling', 'disable_profiling', 'profile_phase', 'profiled', 'get_profile',
+                     'print_profile', 'save_profile', 'compare_profiles', 'clear_profile'],
+        'telemetry': ['record_solve', 'collect_records', 'get_records', 'save_records', 'clear_records'],
+        'batch': ['run_batch_case', 'run_batch'],
+        'uncertainty': ['unit_uncertainty_factors', 'system_uncertainty_factors', 'sample_inputs',
+                        'get_uncertainty_targets', 'evaluate_costing', 'summarize_uncertainty', 'run_uncertainty'],
+        'splitter_wt3': ['Splitter'],
+        'splitter_binary': ['SplitterBinary'],
+        'case_study_trains': ['get_case_study', 'get_pfd_dict', 'create_arcs', 'create_arc_dict',
+                              'check_split_mixer_need', 'create_mixers', 'create_splitters', 'add_waste_streams'],
+        'generate_constituent_list': ['run', 'get_removal_index', 'get_removal_factor', 'get_removal_factors'],
+        'water_props': ['WaterParameterBlock', 'WaterStateBlock'],
+        'watertap': ['watertap_setup', 'run_model', 'run_and_return_model', 'run_model_no_print', 'run_watertap3',
+                     'case_study_constraints', 'get_ix_stash', 'fix_ix_stash', 'print_ro_results', 'print_results',
+                     'set_bounds', 'get_ro_stash', 'fix_ro_stash', 'make_decision', 'connected_units',
+                     'get_flowsheet', 'copy_values', 'clear_templates', 'compile_model', 'solve_model',
+                     'initialize_flowsheet', 'calculate_scaling_factors']
+        }
 
+_export_modules = {name: module for module, names in _exports.items() for name in names}
 
-__all__ = [
-           *constituent_removal_water_recovery.__all__,
-           *cost_curves.__all__,
-           *design.__all__,
-           *financials.__all__,
-           *mixer_wt3.__all__,
-           *ml_regression.__all__,
-           *module_import.__all__,
-           *post_processing.__all__,
-           *sensitivity_runs.__all__,
-           *splitter_wt3.__all__,
-           *splitter_binary.__all__,
-           *case_study_trains.__all__,
-           *generate_constituent_list.__all__,
-           *water_props.__all__,
-           *watertap.__all__
-           ]
+__all__ = [name for names in _exports.values() for name in names]
+
+
+def __getattr__(name):
+    if name in _exports:
+        return importlib.import_module(f'.{name}', __name__)
+    if name in _export_modules:
+        module = importlib.import_module(f'.{_export_modules[name]}', __name__)
+        attr = globals()[name] = getattr(module, name)
+        return attr
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports) | set(__all__))
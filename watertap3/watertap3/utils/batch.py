@@ -0,0 +1,188 @@
+import argparse
+import contextlib
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+import traceback
+from multiprocessing.connection import wait
+
+import pandas as pd
+from pyomo.environ import value
+
+from .benchmark import get_benchmark_cases
+from .case_study_trains import get_case_study
+from .watertap import run_watertap3, watertap_setup
+
+__all__ = ['run_batch_case',
+           'run_batch']
+
+batch_dir = 'results/batch'
+
+_summary_columns = ['case_study', 'scenario', 'desired_recovery', 'ro_bounds', 'status', 'run_time', 'LCOW',
+                    'system_recovery', 'error', 'job_dir']
+
+
+def _job_dir(root, case_study, scenario, data_dir):
+    '''
+    Create the working directory of a job, with data/ linked (or copied, where links are not
+    allowed) from data_dir.
+    '''
+    path = os.path.abspath(os.path.join(root, f'{case_study}_{scenario}'))
+    os.makedirs(path, exist_ok=True)
+    data_link = os.path.join(path, 'data')
+    if not os.path.exists(data_link):
+        try:
+            os.symlink(os.path.abspath(data_dir), data_link, target_is_directory=True)
+        except OSError:
+            shutil.copytree(data_dir, data_link)
+    return path
+
+
+def run_batch_case(case_study, scenario, desired_recovery=1, ro_bounds='seawater', run_options=None):
+    '''
+    Function to build and run one train (watertap_setup, get_case_study and run_watertap3) in the
+    current working directory. Errors are caught and returned instead of raised.
+
+    :param run_options: Extra keyword arguments for run_watertap3 (e.g. {'initialize': True})
+    :type run_options: dict
+    :return: Dictionary with status, run_time [s], LCOW, system_recovery, error and ``results``,
+        the results table of the run (see get_results_table) or None if it did not finish
+    '''
+    result = {'status': None, 'run_time': None, 'LCOW': None, 'system_recovery': None, 'error': None,
+              'results': None}
+    start = time.perf_counter()
+    try:
+        m = watertap_setup(case_study=case_study, scenario=scenario)
+        m = get_case_study(m=m)
+        m = run_watertap3(m, desired_recovery=desired_recovery, ro_bounds=ro_bounds, **(run_options or {}))
+        result['status'] = str(m.fs.results.solver.termination_condition)
+        result['LCOW'] = value(m.fs.costing.LCOW, exception=False)
+        result['system_recovery'] = value(m.fs.costing.system_recovery, exception=False)
+        result['results'] = getattr(m.fs, 'results_df', None)
+    except Exception:
+        result['status'] = 'error'
+        result['error'] = traceback.format_exc()
+    result['run_time'] = time.perf_counter() - start
+    return result
+
+
+def _run_job(conn, job_dir, case, run_options):
+    os.chdir(job_dir)
+    with open('run.log', 'w') as log, contextlib.redirect_stdout(log):
+        result = run_batch_case(case['case_study'], case['scenario'], desired_recovery=case['desired_recovery'],
+                                ro_bounds=case['ro_bounds'], run_options=run_options)
+    conn.send(result)
+    conn.close()
+
+
+def run_batch(case_studies=None, scenarios=None, workers=None, timeout=None, output_dir=None, data_dir='data',
+              run_options=None):
+    '''
+    Function to run the cases in baseline_cases_runs.csv (see benchmark.get_benchmark_cases) in
+    parallel, one process per case with at most ``workers`` running at once.
+
+    Each case runs in its own working directory ``<output_dir>/<case_study>_<scenario>`` with
+    data/ linked from data_dir, so the CSV written by get_results_table and the printed output
+    (run.log) of every case are kept apart. A case that raises, crashes its process or runs
+    longer than ``timeout`` seconds (its process is then terminated) is recorded with its status
+    and error; the other cases carry on.
+
+    Results are written as cases finish: ``summary.csv`` (one row per case) and ``results.csv``
+    (the results tables of every finished case, one after the other) in output_dir.
+
+    :param workers: Number of cases run at once. Defaults to the number of CPUs.
+    :type workers: int
+    :param timeout: Maximum run time per case [s]
+    :type timeout: float
+    :param output_dir: Directory for job directories and results. Defaults to ``batch_dir``.
+    :type output_dir: str
+    :param data_dir: WaterTAP3 data directory
+    :type data_dir: str
+    :param run_options: Extra keyword arguments for run_watertap3
+    :type run_options: dict
+    :return: Summary DataFrame (one row per case, in the order of the cases) and consolidated
+        results DataFrame
+    '''
+    output_dir = batch_dir if output_dir is None else output_dir
+    os.makedirs(output_dir, exist_ok=True)
+    summary_path = os.path.join(output_dir, 'summary.csv')
+    results_path = os.path.join(output_dir, 'results.csv')
+    if os.path.exists(results_path):
+        os.remove(results_path)
+    cases = get_benchmark_cases(case_studies=case_studies, scenarios=scenarios).to_dict('records')
+    workers = workers or os.cpu_count() or 1
+
+    summary = [None] * len(cases)
+    results = []
+    pending = list(range(len(cases)))
+    running = {}
+
+    def finish(k, result):
+        case = cases[k]
+        tables = result.pop('results', None)
+        row = dict.fromkeys(_summary_columns)
+        row.update(case, **result)
+        summary[k] = row
+        print(f'{case["case_study"]} {case["scenario"]}: {row["status"]} in {row["run_time"]:.1f} s, LCOW {row["LCOW"]}')
+        pd.DataFrame([r for r in summary if r is not None], columns=_summary_columns).to_csv(summary_path, index=False)
+        if tables is not None:
+            results.append(tables)
+            tables.to_csv(results_path, mode='a', header=not os.path.exists(results_path), index=False)
+
+    while pending or running:
+        while pending and len(running) < workers:
+            k = pending.pop(0)
+            case = cases[k]
+            job_dir = _job_dir(output_dir, case['case_study'], case['scenario'], data_dir)
+            conn, child_conn = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=_run_job, args=(child_conn, job_dir, case, run_options))
+            process.start()
+            child_conn.close()
+            running[conn] = (k, process, time.perf_counter(), job_dir)
+        for conn in wait(list(running), timeout=1):
+            k, process, start, job_dir = running.pop(conn)
+            try:
+                result = conn.recv()
+            except EOFError:
+                process.join()
+                result = {'status': 'crashed', 'run_time': time.perf_counter() - start,
+                          'error': f'Process exited with code {process.exitcode}'}
+            process.join()
+            conn.close()
+            finish(k, dict(result, job_dir=job_dir))
+        if timeout is not None:
+            for conn, (k, process, start, job_dir) in list(running.items()):
+                if time.perf_counter() - start > timeout:
+                    process.terminate()
+                    process.join()
+                    conn.close()
+                    del running[conn]
+                    finish(k, {'status': 'timeout', 'run_time': time.perf_counter() - start,
+                               'error': f'No result after {timeout} s', 'job_dir': job_dir})
+
+    summary = pd.DataFrame(summary, columns=_summary_columns)
+    return summary, pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Run the WaterTAP3 baseline cases (baseline_cases_runs.csv) in '
+                                                 'parallel. Run from the directory that contains data/.')
+    parser.add_argument('--case-study', nargs='*', help='only run these case studies')
+    parser.add_argument('--scenario', nargs='*', help='only run these scenarios')
+    parser.add_argument('--workers', type=int, default=None, help='cases run at once (default: number of CPUs)')
+    parser.add_argument('--timeout', type=float, default=None, help='maximum run time per case [s]')
+    parser.add_argument('--output-dir', default=None, help=f'directory for job directories and results '
+                                                           f'(default {batch_dir})')
+    args = parser.parse_args(args)
+
+    summary, _ = run_batch(case_studies=args.case_study, scenarios=args.scenario, workers=args.workers,
+                           timeout=args.timeout, output_dir=args.output_dir)
+    print('\n=========================== BATCH RESULTS ============================')
+    print(summary.drop(columns=['error', 'job_dir']).to_string(index=False, float_format=lambda x: f'{x:.4g}'))
+    return 0 if (summary.status == 'optimal').all() else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
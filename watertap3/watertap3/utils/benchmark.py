@@ -0,0 +1,247 @@
+import argparse
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+from idaes.core.util.model_statistics import number_activated_constraints, number_variables
+
+from . import telemetry
+from .case_study_trains import get_case_study
+from .data_catalog import get_table
+from .watertap import clear_templates, run_watertap3, watertap_setup
+
+__all__ = ['get_benchmark_cases',
+           'run_benchmark_case',
+           'run_benchmark',
+           'save_baseline',
+           'load_baseline',
+           'compare_to_baseline']
+
+benchmark_cases_file = 'baseline_cases_runs.csv'
+baseline_path = 'data/benchmark_baseline.csv'
+
+# Relative change over the baseline that is flagged as a regression. Times must also change by
+# more than min_time_change seconds, so short phases are not flagged for noise.
+tolerances = {
+        'build_time': 0.25,
+        'solve_time': 0.25,
+        'iterations': 0.25,
+        'peak_memory': 0.25,
+        'LCOW': 1E-4
+        }
+min_time_change = 0.5
+
+_result_columns = ['case_study', 'scenario', 'desired_recovery', 'ro_bounds', 'status', 'build_time',
+                   'solve_time', 'solver_calls', 'iterations', 'nl_write_time', 'ipopt_time', 'n_variables',
+                   'n_constraints', 'peak_memory', 'LCOW', 'error']
+
+
+def get_benchmark_cases(case_studies=None, scenarios=None):
+    '''
+    Function to get the benchmark cases from baseline_cases_runs.csv.
+
+    :param case_studies: Only include these case studies
+    :type case_studies: list
+    :param scenarios: Only include these scenarios
+    :type scenarios: list
+    :return: DataFrame with case_study, scenario, desired_recovery and ro_bounds columns
+    '''
+    df = get_table(benchmark_cases_file)
+    if case_studies is not None:
+        df = df[df.case_study.isin(case_studies)]
+    if scenarios is not None:
+        df = df[df.scenario.isin(scenarios)]
+    return df.rename(columns={'max_recovery_rate': 'desired_recovery'})[
+        ['case_study', 'scenario', 'desired_recovery', 'ro_bounds']].reset_index(drop=True)
+
+
+def _peak_memory(case_study, scenario, desired_recovery, ro_bounds):
+    '''
+    Build and solve a train again with tracemalloc tracing and return the peak traced memory [MB],
+    or None if tracemalloc was already tracing or the run failed.
+    '''
+    if tracemalloc.is_tracing():
+        return None
+    clear_templates()
+    tracemalloc.start()
+    try:
+        with telemetry.collect_records(store=False):
+            m = watertap_setup(case_study=case_study, scenario=scenario)
+            m = get_case_study(m=m)
+            run_watertap3(m, desired_recovery=desired_recovery, ro_bounds=ro_bounds)
+        return tracemalloc.get_traced_memory()[1] / 1E6
+    except Exception:
+        return None
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark_case(case_study, scenario, desired_recovery=1, ro_bounds='seawater', memory=False):
+    '''
+    Function to build and solve one train with run_watertap3 and record build time (watertap_setup
+    and get_case_study), solve time (run_watertap3), solver calls, ipopt iterations and NL write
+    and ipopt times (summed over every solve of the run, see telemetry), size of the final model
+    and LCOW. Flowsheet templates are cleared first so every case builds from scratch.
+
+    With memory=True the case is then built and solved a second time with tracemalloc tracing to
+    record peak traced memory [MB]. Tracing slows Python down, so it is kept out of the timed run.
+    Peak memory is only recorded if tracemalloc is not already tracing.
+
+    A case that raises or does not solve optimally is recorded with its status and error instead
+    of stopping the benchmark.
+
+    :param memory: Measure peak memory in a second, untimed run
+    :type memory: bool
+    :return: Dictionary
+    '''
+    result = dict.fromkeys(_result_columns)
+    result.update(case_study=case_study, scenario=scenario, desired_recovery=desired_recovery,
+                  ro_bounds=ro_bounds)
+    clear_templates()
+    with telemetry.collect_records() as records:
+        try:
+            start = time.perf_counter()
+            m = watertap_setup(case_study=case_study, scenario=scenario)
+            m = get_case_study(m=m)
+            result['build_time'] = time.perf_counter() - start
+            start = time.perf_counter()
+            m = run_watertap3(m, desired_recovery=desired_recovery, ro_bounds=ro_bounds)
+            result['solve_time'] = time.perf_counter() - start
+            result['status'] = str(m.fs.results.solver.termination_condition)
+            result['n_variables'] = number_variables(m)
+            result['n_constraints'] = number_activated_constraints(m)
+            result['LCOW'] = m.fs.costing.LCOW()
+        except Exception as e:
+            result['status'] = 'error'
+            result['error'] = repr(e)
+    result['solver_calls'] = len(records)
+    for k in ['iterations', 'nl_write_time', 'ipopt_time']:
+        values = [r[k] for r in records if r.get(k) is not None]
+        result[k] = sum(values) if values else None
+    if memory and result['error'] is None:
+        result['peak_memory'] = _peak_memory(case_study, scenario, desired_recovery, ro_bounds)
+    return result
+
+
+def run_benchmark(case_studies=None, scenarios=None, memory=False, output_path=None):
+    '''
+    Function to run every benchmark case (see get_benchmark_cases and run_benchmark_case).
+
+    :param output_path: CSV file to write results to after every case, so partial results are
+        kept if the benchmark is interrupted
+    :type output_path: str
+    :return: DataFrame with one row per case
+    '''
+    cases = get_benchmark_cases(case_studies=case_studies, scenarios=scenarios)
+    results = []
+    for case in cases.itertuples(index=False):
+        print(f'\n========================= BENCHMARK {case.case_study} {case.scenario} =========================')
+        results.append(run_benchmark_case(case.case_study, case.scenario, desired_recovery=case.desired_recovery,
+                                          ro_bounds=case.ro_bounds, memory=memory))
+        if output_path is not None:
+            pd.DataFrame(results, columns=_result_columns).to_csv(output_path, index=False)
+    return pd.DataFrame(results, columns=_result_columns)
+
+
+def save_baseline(df, path=None):
+    '''
+    Function to store benchmark results as the baseline. Defaults to ``baseline_path``.
+    '''
+    df.to_csv(baseline_path if path is None else path, index=False)
+
+
+def load_baseline(path=None):
+    '''
+    Function to read the benchmark baseline. Defaults to ``baseline_path``.
+    '''
+    return pd.read_csv(baseline_path if path is None else path)
+
+
+def compare_to_baseline(df, baseline=None):
+    '''
+    Function to flag regressions of benchmark results against the baseline. A case regresses if it
+    solved optimally in the baseline but not now, if build time, solve time, iterations or peak
+    memory grew by more than ``tolerances`` (relative; times also by more than min_time_change
+    seconds), or if LCOW changed by more than ``tolerances['LCOW']`` (relative, either way).
+
+    Cases that are only in the results or only in the baseline are flagged too (``missing`` is
+    ``'not in baseline'`` or ``'not run'``). To compare a subset of the cases, pass the matching
+    rows of the baseline.
+
+    :param df: Benchmark results (see run_benchmark)
+    :param baseline: Baseline results. Defaults to load_baseline().
+    :return: DataFrame with baseline and new values, ``missing``, one ``<column>_regression`` flag
+        per check and ``regression`` if any check failed
+    '''
+    if baseline is None:
+        baseline = load_baseline()
+    keys = ['case_study', 'scenario']
+    cols = ['status', 'build_time', 'solve_time', 'iterations', 'peak_memory', 'LCOW']
+    comp = df[keys + cols].merge(baseline[keys + cols], on=keys, how='outer', suffixes=('', '_baseline'),
+                                 indicator=True)
+    comp['missing'] = comp._merge.map({'left_only': 'not in baseline', 'right_only': 'not run', 'both': None})
+    comp = comp.drop(columns='_merge')
+    comp['missing_regression'] = comp.missing.notna()
+    comp['status_regression'] = (comp.status_baseline == 'optimal') & (comp.status != 'optimal') & comp.missing.isna()
+    for col, tol in tolerances.items():
+        new, old = comp[col], comp[f'{col}_baseline']
+        if col == 'LCOW':
+            flag = (new - old).abs() > tol * old.abs()
+        else:
+            flag = new > old * (1 + tol)
+            if col.endswith('_time'):
+                flag &= (new - old) > min_time_change
+        comp[f'{col}_regression'] = flag.fillna(False).astype(bool)
+    comp['regression'] = comp[[c for c in comp.columns if c.endswith('_regression')]].any(axis=1)
+    return comp
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Run the WaterTAP3 benchmark suite (baseline_cases_runs.csv). '
+                                                 'Run from the directory that contains data/.')
+    parser.add_argument('--case-study', nargs='*', help='only run these case studies')
+    parser.add_argument('--scenario', nargs='*', help='only run these scenarios')
+    parser.add_argument('--baseline', default=None, help=f'baseline file (default {baseline_path})')
+    parser.add_argument('--output', default=None, help='write results to this CSV file')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--memory', action='store_true', help='measure peak memory in a second, untimed run of '
+                                                                  'every case')
+    args = parser.parse_args(args)
+
+    df = run_benchmark(case_studies=args.case_study, scenarios=args.scenario, memory=args.memory,
+                       output_path=args.output)
+    print('\n========================= BENCHMARK RESULTS ==========================')
+    print(df.drop(columns=['error']).to_string(index=False, float_format=lambda x: f'{x:.4g}'))
+    if args.save_baseline:
+        save_baseline(df, path=args.baseline)
+        print(f'\nBaseline saved to {args.baseline or baseline_path}')
+        return 0
+    try:
+        baseline = load_baseline(path=args.baseline)
+    except FileNotFoundError:
+        print(f'\nNo baseline at {args.baseline or baseline_path}; run with --save-baseline to create one.')
+        return 1
+    if args.case_study:
+        baseline = baseline[baseline.case_study.isin(args.case_study)]
+    if args.scenario:
+        baseline = baseline[baseline.scenario.isin(args.scenario)]
+    comp = compare_to_baseline(df, baseline)
+    regressions = comp[comp.regression]
+    if regressions.empty:
+        print('\nNo regressions against the baseline.')
+        return 0
+    print('\n============================ REGRESSIONS =============================')
+    for row in regressions.itertuples(index=False):
+        if pd.notna(row.missing):
+            print(f'{row.case_study} {row.scenario}: {row.missing}')
+            continue
+        checks = [c[:-len('_regression')] for c in comp.columns
+                  if c.endswith('_regression') and c != 'regression' and getattr(row, c)]
+        print(f'{row.case_study} {row.scenario}: ' + ', '.join(
+            f'{c} {getattr(row, c + "_baseline")} -> {getattr(row, c)}' for c in checks))
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
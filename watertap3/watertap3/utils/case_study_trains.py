@@ -1,11 +1,12 @@
-import ast
-
 import numpy as np
 import pandas as pd
 from pyomo.environ import Block
 from pyomo.network import Arc
 
 from watertap3.utils import Mixer, Splitter, SplitterBinary, design, financials
+from .coef_cache import flush_coef_cache
+from .profiler import profiled
+from .train_spec import compile_train
 from .water_props import WaterParameterBlock
 
 __all__ = [
@@ -19,6 +20,7 @@ __all__ = [
            'add_waste_streams'
            ]
 
+@profiled()
 def get_case_study(m=None, new_df_units=None):
     '''
     Function to add constituents and unit processes to flowsheet and connect 
@@ -26,11 +28,11 @@ def get_case_study(m=None, new_df_units=None):
     '''
     if new_df_units is not None:
         m.fs.df_units = new_df_units
-        m.fs.pfd_dict = get_pfd_dict(new_df_units)
         m.fs.new_case_study = True
     else:
-        m.fs.pfd_dict = get_pfd_dict(m.fs.df_units)
         m.fs.new_case_study = False
+    m.fs.train_spec = compile_train(m.fs.df_units)
+    m.fs.pfd_dict = m.fs.train_spec.get_pfd_dict()
 
     pfd_dict = m.fs.pfd_dict
     financials.get_system_specs(m.fs)
@@ -69,6 +71,8 @@ def get_case_study(m=None, new_df_units=None):
     m = create_arcs(m, arc_dict)
     # add the waste arcs to the model
     m, arc_i, mixer_i = add_waste_streams(m, arc_i, pfd_dict, mixer_i)
+    # write the cost curve coefficients fit while adding the units
+    flush_coef_cache()
 
     return m
 
@@ -76,20 +80,11 @@ def get_case_study(m=None, new_df_units=None):
 ### create pfd_dictionary for treatment train
 def get_pfd_dict(df_units):
     ### create pfd_dictionary for treatment train
-    pfd_dict = df_units.set_index('UnitName').T.to_dict()
-    for key in pfd_dict.keys():
-        # parameter from string to dict
-        if pfd_dict[key]['Parameter'] is not np.nan:
-            pfd_dict[key]['Parameter'] = ast.literal_eval(pfd_dict[key]['Parameter'])
-        if pfd_dict[key]['ToUnitName'] is not np.nan:
-            if ',' in pfd_dict[key]['ToUnitName']:
-                pfd_dict[key]['ToUnitName'] = pfd_dict[key]['ToUnitName'].split(',')
-                pfd_dict[key]['FromPort'] = pfd_dict[key]['FromPort'].split(',')
-
-    return pfd_dict
+    return compile_train(df_units, check_refs=False).get_pfd_dict()
 
 
 # ADDING ARCS TO MODEL
+@profiled()
 def create_arcs(m, arc_dict):
     for key in arc_dict.keys():
         source = arc_dict[key][0]
@@ -102,6 +97,7 @@ def create_arcs(m, arc_dict):
 
 
 # create arc dictionary, add sources, add source to inlet arcs
+@profiled()
 def create_arc_dict(m, pfd_dict, flow):
     arc_dict = {}
     arc_i = 1
@@ -164,6 +160,7 @@ def check_split_mixer_need(arc_dict):
     return splitter_list, mixer_list
 
 
+@profiled()
 def create_mixers(m, mixer_list, arc_dict, arc_i):
     mixer_i = 1
     inlet_i = 1
@@ -197,6 +194,7 @@ def create_mixers(m, mixer_list, arc_dict, arc_i):
     return m, arc_dict, mixer_i, arc_i
 
 
+@profiled()
 def create_splitters(m, splitter_list, arc_dict, arc_i):
     splitter_i = 1
     outlet_i = 1
@@ -279,6 +277,7 @@ def create_splitters(m, splitter_list, arc_dict, arc_i):
 
     return m, arc_dict, splitter_i, arc_i
 
+@profiled()
 def add_waste_streams(m, arc_i, pfd_dict, mixer_i):
     # get number of units going to automatic waste disposal units
     i = 0
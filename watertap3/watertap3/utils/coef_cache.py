@@ -0,0 +1,135 @@
+import atexit
+import json
+import os
+
+import numpy as np
+
+from .data_catalog import file_hash
+
+__all__ = ['get_coefs',
+           'save_coef_cache',
+           'flush_coef_cache',
+           'clear_coef_cache']
+
+# File used to persist fitted coefficients between processes. None keeps the cache in memory only.
+coef_cache_file = None
+
+# Version of the fitting code (ml_regression.fit_power_laws and the unit fits). Bump it whenever a
+# fit changes; cache files written with another version are ignored and overwritten.
+fit_version = 2
+
+_coefs = {}
+_loaded_files = set()
+_unsaved = False
+
+
+def _to_plain(x):
+    '''
+    Convert fitted coefficients (NumPy arrays/scalars, tuples) to plain lists and floats so the
+    in-memory and on-disk caches hold exactly the same values.
+    '''
+    if isinstance(x, (list, tuple, np.ndarray)):
+        return [_to_plain(v) for v in x]
+    if isinstance(x, np.generic):
+        return x.item()
+    return x
+
+
+def _cache_key(unit_process, data_hash, key):
+    return json.dumps([unit_process, data_hash, _to_plain(list(key))])
+
+
+def _read(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('fit_version') != fit_version:
+        return {}
+    return data['coefs']
+
+
+def _load(path):
+    if path in _loaded_files:
+        return
+    _loaded_files.add(path)
+    for k, v in _read(path).items():
+        _coefs.setdefault(k, v)
+
+
+def save_coef_cache(path=None):
+    '''
+    Function to write every cached coefficient set to a JSON file, together with ``fit_version``.
+    Coefficients already in the file (e.g. fit by another process) are kept.
+
+    :param path: File to write to. Defaults to ``coef_cache_file``.
+    :type path: str
+    '''
+    if path is None:
+        path = coef_cache_file
+    if path is None:
+        raise ValueError('No coefficient cache file given and coef_cache_file is not set.')
+    global _unsaved
+    for k, v in _read(path).items():
+        _coefs.setdefault(k, v)
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    with open(tmp_path, 'w') as f:
+        json.dump({'fit_version': fit_version, 'coefs': _coefs}, f)
+    os.replace(tmp_path, path)
+    if path == coef_cache_file:
+        _unsaved = False
+
+
+def flush_coef_cache():
+    '''
+    Function to write the cache to ``coef_cache_file`` if it is set and coefficients were fit since
+    it was last written. Called at the end of every flowsheet build (get_case_study) and when the
+    interpreter exits.
+    '''
+    if _unsaved and coef_cache_file is not None:
+        save_coef_cache(coef_cache_file)
+
+
+def get_coefs(unit_process, data_file, key, fit):
+    '''
+    Function to get fitted cost curve coefficients. Coefficients are cached by
+    ``(unit_process, hash of data_file, key)``, so ``fit`` only runs the first time a unit is built
+    with a given set of discrete inputs (dose, UVT, tds_in bin, etc.) and again only after the data
+    file changes.
+
+    If ``coef_cache_file`` is set, the cache is read from that file on first use (unless it was
+    written with another ``fit_version``). New fits are written back in one go by
+    flush_coef_cache, not after every fit.
+
+    :param unit_process: Unit process name
+    :type unit_process: str
+    :param data_file: Name of the file in the data directory the fit is based on
+    :type data_file: str
+    :param key: Discrete inputs the fit depends on
+    :type key: tuple
+    :param fit: Zero-argument callable returning the coefficients
+    :return: Coefficients as (nested) lists of floats
+    '''
+    global _unsaved
+    if coef_cache_file is not None:
+        _load(coef_cache_file)
+    cache_key = _cache_key(unit_process, file_hash(data_file), key)
+    coefs = _coefs.get(cache_key)
+    if coefs is None:
+        coefs = _coefs[cache_key] = _to_plain(fit())
+        _unsaved = True
+    return coefs
+
+
+def clear_coef_cache():
+    '''
+    Function to drop every coefficient set held in memory, including fits not yet written. The cache
+    file, if any, is left as is and is read again on next use.
+    '''
+    global _unsaved
+    _unsaved = False
+    _coefs.clear()
+    _loaded_files.clear()
+
+
+atexit.register(flush_coef_cache)
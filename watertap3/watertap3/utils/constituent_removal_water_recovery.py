@@ -1,31 +1,72 @@
-import pandas as pd
 from watertap3.utils import generate_constituent_list
+from .data_catalog import get_derived, get_table
 
-__all__ = ['create']
+__all__ = ['create',
+           'get_recovery_index',
+           'get_water_recovery']
+
+
+def get_recovery_index():
+    '''
+    Function to get the water recovery index. Built once from water_recovery_factors.csv and
+    rebuilt only when that file changes.
+
+    The index is a dictionary with two entries:
+
+        * ``'case_study'``: (unit_process, case_study, scenario) --> recovery
+        * ``'default'``: unit_process --> default recovery
+
+    Recovery values are kept as they appear in the table, so they can be either a number or
+    ``'calculated'``.
+
+    :return: Water recovery index
+    '''
+
+    def build():
+        df = get_table('water_recovery_factors.csv')
+        case_study_index = {}
+        default_index = {}
+        for unit_process, case_study, scenario, recovery in df[['unit_process', 'case_study', 'scenario', 'recovery']].itertuples(index=False):
+            if case_study == 'default':
+                default_index.setdefault(unit_process, recovery)
+            else:
+                case_study_index.setdefault((unit_process, case_study, scenario), recovery)
+        return {'case_study': case_study_index, 'default': default_index}
+
+    return get_derived('recovery_index', build, tables=('water_recovery_factors.csv',))
+
+
+def get_water_recovery(unit_process_type, case_study, scenario):
+    '''
+    Function to look up the water recovery for a unit. A case study and scenario specific value is
+    used if there is one, otherwise the ``default`` value for the unit.
+
+    :param unit_process_type: Unit process type (e.g. ``'media_filtration'``)
+    :type unit_process_type: str
+    :param case_study: Case study name
+    :type case_study: str
+    :param scenario: Scenario name
+    :type scenario: str
+    :return: Recovery from the table (a number or ``'calculated'``)
+    '''
+    index = get_recovery_index()
+    recovery = index['case_study'].get((unit_process_type, case_study, scenario))
+    if recovery is None:
+        recovery = index['default'].get(unit_process_type)
+    if recovery is None:
+        raise TypeError(f'There is no default water recovery for {unit_process_type}.\n'
+                        'Check that there is an entry for this unit in water_recovery.csv')
+    return recovery
 
 
 def create(m, unit_process_type, unit_process_name):
-    df = pd.read_csv('data/water_recovery_factors.csv')
     case_study_name = m.fs.train['case_study']
     scenario = m.fs.train['scenario']
 
-    cases = df[df.unit_process == unit_process_type].case_study.to_list()
-    scenarios = df[df.unit_process == unit_process_type].scenario.to_list()
-    default_df = df[((df.unit_process == unit_process_type) & (df.case_study == 'default'))].recovery
-    tups = zip(cases, scenarios)
-
-    if (case_study_name, scenario) in tups:
-        case_study_df = df[((df.unit_process == unit_process_type) & (df.case_study == case_study_name) & (df.scenario == scenario))]
-        if 'calculated' not in case_study_df.recovery.max():
-            flow_recovery_factor = float(case_study_df.recovery)
-            getattr(m.fs, unit_process_name).water_recovery.fix(flow_recovery_factor)
-    else:
-        if default_df.empty:
-            raise TypeError(f'There is no default water recovery for {unit_process_type}.\n'
-                            'Check that there is an entry for this unit in water_recovery.csv')
-        if 'calculated' not in default_df.max():
-            flow_recovery_factor = float(default_df)
-            getattr(m.fs, unit_process_name).water_recovery.fix(flow_recovery_factor)
+    recovery = get_water_recovery(unit_process_type, case_study_name, scenario)
+    if 'calculated' not in str(recovery):
+        flow_recovery_factor = float(recovery)
+        getattr(m.fs, unit_process_name).water_recovery.fix(flow_recovery_factor)
 
     train_constituent_removal_factors = generate_constituent_list.get_removal_factors(m, unit_process_type, unit_process_name)
 
@@ -35,4 +76,3 @@ def create(m, unit_process_type, unit_process_name):
         else:
             getattr(m.fs, unit_process_name).removal_fraction[:, constituent_name].fix(1E-5)
     return m
-
@@ -1,20 +1,21 @@
 import numpy as np
 import pandas as pd
-from scipy.optimize import curve_fit
+
+from .coef_cache import get_coefs
+from .data_catalog import get_table
+from .ml_regression import fit_power_laws
 
 __all__ = ['epa_cost_curve',
            'basic_unit']
 
 
 def epa_cost_curve(unit_process, **kwargs):
-    df = pd.read_csv('data/epa_cost_curves.csv', index_col='unit_process')
+    df = get_table('epa_cost_curves.csv', index_col='unit_process')
     df = df.loc[unit_process]
 
     params = ['flow_in', 'cap_total', 'electricity_intensity', 'tds_in', 'num_stage', 'radon_rem', 'ebct']
 
-    def power(x, a, b):
-        return a * x ** b
-
+    key = ()
     if kwargs:
         temp = list(dict(**kwargs).items())[0]
         k, v = temp[0], temp[1]
@@ -23,32 +24,41 @@ def epa_cost_curve(unit_process, **kwargs):
 
             if unit_process == 'cation_exchange':
                 if v >= 1000:
-                    df = df[df.tds_in == 1000]
+                    tds_bin = 1000
                 elif v < 1000 and v >= 600:
-                    df = df[df.tds_in == 600]
+                    tds_bin = 600
                 else:
-                    df = df[df.tds_in == 200]
+                    tds_bin = 200
             elif unit_process == 'anion_exchange':
                 if v >= 150:
-                    df = df[df.tds_in == 150]
+                    tds_bin = 150
                 elif v < 150 and v >= 100:
-                    df = df[df.tds_in == 100]
+                    tds_bin = 100
                 else:
-                    df = df[df.tds_in == 50]
+                    tds_bin = 50
+            else:
+                tds_bin = None
+            if tds_bin is not None:
+                df = df[df.tds_in == tds_bin]
+                key = (k, tds_bin)
 
         if k == 'radon_rem':
 
             if v >= 0.9:
-                df = df[df.radon_rem == 0.99]
+                radon_bin = 0.99
             else:
-                df = df[df.radon_rem == 0.9]
+                radon_bin = 0.9
+            df = df[df.radon_rem == radon_bin]
+            key = (k, radon_bin)
 
         if k == 'ebct':
 
             if v > 30:
-                df = df[df.ebct == 60]
+                ebct_bin = 60
             else:
-                df = df[df.ebct == 30]
+                ebct_bin = 30
+            df = df[df.ebct == ebct_bin]
+            key = (k, ebct_bin)
 
     df.dropna(axis=1, inplace=True)
     cols = df.columns
@@ -60,17 +70,21 @@ def epa_cost_curve(unit_process, **kwargs):
     y_cost = df.cap_total.to_list()
     y_elect = df.electricity_intensity.to_list()
 
-    cost, _ = curve_fit(power, x, y_cost)
-    elect, _ = curve_fit(power, x, y_elect)
+    def fit():
+        pars, _, _ = fit_power_laws([x, x], [y_cost, y_elect], refine_tol=0)
+        return pars
+
+    cost, elect = get_coefs(unit_process, 'epa_cost_curves.csv', key, fit)
+    cost, elect = np.array(cost), np.array(elect)
 
     return cost, elect, mats_name, mats_cost, df
 
 
 def basic_unit(unit_process, case_specific=None):
     if case_specific == 'solaire':
-        df = pd.read_csv('data/basic_units_solaire.csv', index_col='unit_process')
+        df = get_table('basic_units_solaire.csv', index_col='unit_process')
     else:
-        df = pd.read_csv('data/basic_unit_cost_curves_and_energy_intensities.csv', index_col='unit_process')
+        df = get_table('basic_unit_cost_curves_and_energy_intensities.csv', index_col='unit_process')
     df = df.loc[unit_process]
     flow_basis = df.flow_basis
     cap_basis = df.cap_basis
@@ -0,0 +1,157 @@
+import contextlib
+import hashlib
+import os
+
+import pandas as pd
+
+__all__ = ['get_table',
+           'get_derived',
+           'file_hash',
+           'track_files',
+           'clear_catalog']
+
+data_dir = 'data'
+
+_tables = {}
+_derived = {}
+_hashes = {}
+_trackers = []
+
+
+def _data_path(file_name):
+    '''
+    Resolve a data file name to an absolute path. Bare file names are looked up in the ``data``
+    directory relative to the current working directory, same as the ``'data/...'`` paths used
+    throughout WaterTAP3.
+    '''
+    if os.path.dirname(file_name):
+        return os.path.abspath(file_name)
+    return os.path.abspath(os.path.join(data_dir, file_name))
+
+
+def _track(file_name):
+    for files in _trackers:
+        files.add(file_name)
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _freeze(df):
+    '''
+    Mark the arrays backing a cached DataFrame as read-only so accidental in-place edits raise
+    instead of silently changing the table for every other caller.
+    '''
+    mgr = getattr(df, '_mgr', None)
+    if mgr is None:
+        mgr = df._data
+    for blk in mgr.blocks:
+        try:
+            blk.values.flags.writeable = False
+        except (AttributeError, ValueError):
+            pass
+    return df
+
+
+def get_table(file_name, index_col=None, header='infer'):
+    '''
+    Function to get a table from the WaterTAP3 data directory. Each table is read from disk once
+    and then served from memory until the file's modification time or size changes.
+
+    The returned DataFrame is shared by every caller and must be treated as read-only. Use
+    ``.copy()`` before modifying it.
+
+    :param file_name: Name of the .csv file in the data directory (e.g. ``'chemical_costs.csv'``)
+    :type file_name: str
+    :param index_col: Column to use as the index, passed to ``pd.read_csv``
+    :type index_col: str
+    :param header: Header row, passed to ``pd.read_csv``
+    :return: Read-only DataFrame
+    '''
+    _track(file_name)
+    path = _data_path(file_name)
+    sig = _signature(path)
+    key = (path, index_col, header)
+    cached = _tables.get(key)
+    if cached is not None and cached[0] == sig:
+        return cached[1]
+    df = _freeze(pd.read_csv(path, index_col=index_col, header=header))
+    _tables[key] = (sig, df)
+    return df
+
+
+def get_derived(name, builder, tables=(), key=()):
+    '''
+    Function to get an object derived from one or more data tables (an index, a fitted
+    coefficient table, etc.). ``builder`` is only called when there is no cached result for
+    ``(name, key)`` or when any of ``tables`` has changed on disk since the result was built.
+
+    :param name: Name of the derived object
+    :type name: str
+    :param builder: Zero-argument callable that builds the object
+    :param tables: Data file names the object depends on
+    :type tables: tuple
+    :param key: Additional hashable key (e.g. analysis year)
+    :return: Cached result of ``builder()``
+    '''
+    for t in tables:
+        _track(t)
+    sig = tuple(_signature(_data_path(t)) for t in tables)
+    cache_key = (name, tuple(_data_path(t) for t in tables), key)
+    cached = _derived.get(cache_key)
+    if cached is not None and cached[0] == sig:
+        return cached[1]
+    result = builder()
+    _derived[cache_key] = (sig, result)
+    return result
+
+
+def file_hash(file_name):
+    '''
+    Function to get the SHA-1 hash of a data file. The hash is recomputed only when the file's
+    modification time or size changes.
+
+    :param file_name: Name of the file in the data directory
+    :type file_name: str
+    :return: Hex digest
+    '''
+    _track(file_name)
+    path = _data_path(file_name)
+    sig = _signature(path)
+    cached = _hashes.get(path)
+    if cached is not None and cached[0] == sig:
+        return cached[1]
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _hashes[path] = (sig, digest)
+    return digest
+
+
+@contextlib.contextmanager
+def track_files():
+    '''
+    Context manager that collects the names of the data files read through get_table,
+    get_derived or file_hash inside the ``with`` block, including reads served from memory.
+
+    :return: Set of data file names, filled in as the block runs
+    '''
+    files = set()
+    _trackers.append(files)
+    try:
+        yield files
+    finally:
+        _trackers.remove(files)
+
+
+def clear_catalog():
+    '''
+    Function to drop every cached table, derived object and file hash.
+    '''
+    _tables.clear()
+    _derived.clear()
+    _hashes.clear()
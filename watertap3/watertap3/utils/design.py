@@ -1,6 +1,7 @@
 from . import module_import
 from .constituent_removal_water_recovery import create
 from .mixer_wt3 import Mixer
+from .profiler import profiled
 from .source_wt3 import Source
 
 __all__ = ['add_unit_process',
@@ -8,6 +9,7 @@ __all__ = ['add_unit_process',
            ]
 
 
+@profiled(detail='unit_process_name')
 def add_unit_process(m=None, unit_process_name=None, unit_process_type=None, unit_process_kind=None):
 
     up_module = module_import.get_module(unit_process_type)
@@ -35,6 +37,7 @@ def add_unit_process(m=None, unit_process_name=None, unit_process_type=None, uni
 
     return m
 
+@profiled(detail='source_name')
 def add_water_source(m=None, source_name=None, water_type=None, flow=None, link_to=None):
     setattr(m.fs, source_name, Source(default={'property_package': m.fs.water}))
     getattr(m.fs, source_name).set_source()
@@ -7,39 +7,108 @@
 # University Research Corporation, et al. All rights reserved.
 ##############################################################################
 
+from collections import namedtuple
+
+import numpy as np
 import pandas as pd
 from pyomo.environ import (Block, Expression, Param, Var, NonNegativeReals, units as pyunits)
 
-from .ml_regression import get_linear_regression
+from .data_catalog import get_derived, get_table
+from .profiler import profiled
 
-__all__ = ['SystemSpecs', 'get_complete_costing', 'get_ind_table', 'get_system_specs',
-           'get_system_costing', 'global_costing_parameters']
+__all__ = ['SystemSpecs', 'TEABasis', 'get_tea_basis', 'get_complete_costing', 'get_ind_table',
+           'get_ind_factors', 'get_system_specs', 'get_system_costing', 'global_costing_parameters']
 
 last_year_for_cost_indicies = 2050
 
+tea_basis_file = 'case_study_TEA_basis.csv'
+elec_cost_file = 'industrial_electricity_costs_2020.csv'
+
+# SystemSpecs attribute --> (case_study_TEA_basis.csv variable, type)
+tea_basis_variables = {
+        'location': ('location_basis', str),
+        'land_cost_percent_FCI': ('land_cost_percent', float),
+        'working_cap_percent_FCI': ('working_capital_percent', float),
+        'salaries_percent_FCI': ('base_salary_per_fci', float),
+        'maintenance_costs_percent_FCI': ('maintenance_cost_percent', float),
+        'lab_fees_percent_FCI': ('laboratory_fees_percent', float),
+        'insurance_taxes_percent_FCI': ('insurance_and_taxes_percent', float),
+        'benefit_percent_of_salary': ('employee_benefits_percent', float),
+        'plant_lifetime_yrs': ('plant_life_yrs', int),
+        'analysis_yr_cost_indices': ('analysis_year', int),
+        'debt_interest_rate': ('debt_interest_rate', float),
+        'plant_cap_utilization': ('plant_cap_utilization', float)
+        }
+
+TEABasis = namedtuple('TEABasis', ['case_study', 'scenario', 'elec_price', *tea_basis_variables])
+TEABasis.__doc__ = '''
+Immutable TEA basis for one (case_study, scenario) in case_study_TEA_basis.csv, with the
+electricity price for ``location`` already looked up.
+'''
+
+
+def _build_tea_basis():
+    basis_data = get_table(tea_basis_file)
+    elec_cost = get_table(elec_cost_file, index_col='location')
+    elec_prices = {str(loc).lower(): float(cost) for loc, cost in zip(elec_cost.index, elec_cost.cost)}
+    basis_vars = {}
+    for case_study, scenario, variable, val in zip(basis_data.case_study, basis_data.scenario,
+                                                   basis_data.variable, basis_data.value):
+        basis_vars.setdefault((case_study, scenario), {}).setdefault(variable, val)
+    records = {}
+    for (case_study, scenario), variables in basis_vars.items():
+        fields = {}
+        for attr, (variable, typ) in tea_basis_variables.items():
+            if variable in variables:
+                fields[attr] = typ(float(variables[variable])) if typ is int else typ(variables[variable])
+            else:
+                fields[attr] = None
+        fields['elec_price'] = elec_prices.get(str(fields['location']).lower())
+        records[(case_study, scenario)] = TEABasis(case_study=case_study, scenario=scenario, **fields)
+    return records, elec_prices
+
+
+def get_tea_basis(case_study, scenario='baseline', **overrides):
+    '''
+    Function to get the TEA basis record for a case study. The basis table is pivoted once into
+    immutable records and served from memory until case_study_TEA_basis.csv or the electricity cost
+    table changes. If there is no record for ``scenario``, the baseline record is used.
+
+    Any keyword argument replaces the matching field in the returned record, so financial
+    parameters can be changed for a batch of runs without editing the .csv. Overriding
+    ``location`` also updates ``elec_price`` unless ``elec_price`` is given too.
+
+    :param case_study: Case study name
+    :type case_study: str
+    :param scenario: Scenario name
+    :type scenario: str
+    :return: TEABasis
+    '''
+    records, elec_prices = get_derived('tea_basis', _build_tea_basis, tables=(tea_basis_file, elec_cost_file))
+    record = records.get((case_study, scenario))
+    if record is None:
+        record = records.get((case_study, 'baseline'))
+    if record is None:
+        raise KeyError(f'No TEA basis for case study {case_study} in {tea_basis_file}')
+    if overrides:
+        if 'location' in overrides and 'elec_price' not in overrides:
+            overrides['elec_price'] = elec_prices.get(str(overrides['location']).lower())
+        record = record._replace(**overrides)
+    if record.elec_price is None:
+        raise KeyError(f'No electricity price for location {record.location} in {elec_cost_file}')
+    missing = [attr for attr, val in record._asdict().items() if val is None]
+    if missing:
+        raise KeyError(f'TEA basis for case study {case_study} is missing {missing} in {tea_basis_file}')
+    return record
+
 
 class SystemSpecs():
 
-    def __init__(self, train=None):
-        basis_data = pd.read_csv('data/case_study_TEA_basis.csv', index_col='case_study')
-        elec_cost = pd.read_csv('data/industrial_electricity_costs_2020.csv', index_col='location')
-        elec_cost.index = elec_cost.index.str.lower()
-        case_study = train['case_study']
-        scenario = train['scenario']
-        # print(str(case_study).replace('_', ' ').swapcase() + ':', str(scenario).replace('_', ' ').swapcase())
-        self.location = basis_data[basis_data['variable'] == 'location_basis'].loc[case_study].value
-        self.elec_price = float(elec_cost.loc[self.location])
-        self.land_cost_percent_FCI = float(basis_data[basis_data['variable'] == 'land_cost_percent'].loc[case_study].value)
-        self.working_cap_percent_FCI = float(basis_data[basis_data['variable'] == 'working_capital_percent'].loc[case_study].value)
-        self.salaries_percent_FCI = float(basis_data[basis_data['variable'] == 'base_salary_per_fci'].loc[case_study].value)
-        self.maintenance_costs_percent_FCI = float(basis_data[basis_data['variable'] == 'maintenance_cost_percent'].loc[case_study].value)
-        self.lab_fees_percent_FCI = float(basis_data[basis_data['variable'] == 'laboratory_fees_percent'].loc[case_study].value)
-        self.insurance_taxes_percent_FCI = float(basis_data[basis_data['variable'] == 'insurance_and_taxes_percent'].loc[case_study].value)
-        self.benefit_percent_of_salary = float(basis_data[basis_data['variable'] == 'employee_benefits_percent'].loc[case_study].value)
-        self.plant_lifetime_yrs = int(basis_data[basis_data['variable'] == 'plant_life_yrs'].loc[case_study].value)
-        self.analysis_yr_cost_indices = int(basis_data[basis_data['variable'] == 'analysis_year'].loc[case_study].value)
-        self.debt_interest_rate = float(basis_data[basis_data['variable'] == 'debt_interest_rate'].loc[case_study].value)
-        self.plant_cap_utilization = float(basis_data[basis_data['variable'] == 'plant_cap_utilization'].loc[case_study].value)
+    def __init__(self, train=None, **overrides):
+        tea_basis = get_tea_basis(train['case_study'], train['scenario'], **overrides)
+        for attr, val in tea_basis._asdict().items():
+            if attr not in ['case_study', 'scenario']:
+                setattr(self, attr, val)
 
 
 def create_costing_block(unit, basis_year, tpec_or_tic):
@@ -203,11 +272,11 @@ def get_complete_costing(costing):
 
 
     ## COSTING INDICES
-    df = get_ind_table(sys_specs.analysis_yr_cost_indices)
-    costing.cap_replacement_parts = df.loc[basis_year].Capital_Factor
-    costing.catalysts_chemicals = df.loc[basis_year].CatChem_Factor
-    costing.labor_and_other_fixed = df.loc[basis_year].Labor_Factor
-    costing.consumer_price_index = df.loc[basis_year].CPI_Factor
+    ind_factors = get_ind_factors(sys_specs.analysis_yr_cost_indices, basis_year)
+    costing.cap_replacement_parts = ind_factors['Capital_Factor']
+    costing.catalysts_chemicals = ind_factors['CatChem_Factor']
+    costing.labor_and_other_fixed = ind_factors['Labor_Factor']
+    costing.consumer_price_index = ind_factors['CPI_Factor']
 
     costing.fixed_cap_inv = ((costing.fixed_cap_inv_unadjusted * costing.cap_replacement_parts) * (1 - costing.fci_reduction[t])) * costing.fci_uncertainty[t]
     if unit.parent_block().train['case_study'] == 'cherokee' and unit.unit_name == 'evaporation_pond':
@@ -224,7 +293,7 @@ def get_complete_costing(costing):
     costing.lab = costing.fixed_cap_inv * sys_specs.lab_fees_percent_FCI
     costing.insurance_taxes = costing.fixed_cap_inv * sys_specs.insurance_taxes_percent_FCI
 
-    cat_chem_df = pd.read_csv('data/chemical_costs.csv', index_col='Material')
+    cat_chem_df = get_table('chemical_costs.csv', index_col='Material')
     chem_cost_sum = 0
     for key in chem_dict.keys():
         if key == 'unit_cost':
@@ -254,23 +323,53 @@ def get_complete_costing(costing):
 
 def get_ind_table(analysis_yr_cost_indices):
     '''
-    Function to get costing indicies for WaterTAP3 model.
+    Function to get costing indicies for WaterTAP3 model. The table is built once per analysis
+    year and reused until plant_cost_indices.csv changes, so the returned DataFrame is shared and
+    must not be modified.
 
     :param analysis_yr_cost_indices: Year to get costing indices for.
     :type analysis_yr_cost_indices: int
     :return: Indicies DataFrame
     '''
-    df = pd.read_csv('data/plant_cost_indices.csv')
-
-    df1 = pd.DataFrame()
-    for name in df.columns[1:]:
-        a, b = get_linear_regression(list(df.Year), list(df[('%s' % name)]), name)
-        new_list = []
-        yr_list = []
-        for yr in range(df.Year.max() + 1, last_year_for_cost_indicies + 1):
-            new_list.append(a * yr + b)
-            yr_list.append(yr)
-        df1[name] = new_list
+    analysis_yr_cost_indices = int(analysis_yr_cost_indices)
+    return get_derived('cost_index_table', lambda: _build_ind_table(analysis_yr_cost_indices),
+                       tables=('plant_cost_indices.csv',), key=(analysis_yr_cost_indices,))
+
+
+def get_ind_factors(analysis_yr_cost_indices, basis_year):
+    '''
+    Function to get the Capital, CatChem, Labor and CPI factors that adjust costs from a unit's
+    basis year to the analysis year.
+
+    :param analysis_yr_cost_indices: Year to get costing indices for.
+    :type analysis_yr_cost_indices: int
+    :param basis_year: Basis year of the unit cost data
+    :type basis_year: int
+    :return: Dictionary of factors keyed by column name (e.g. ``'Capital_Factor'``)
+    '''
+    analysis_yr_cost_indices = int(analysis_yr_cost_indices)
+
+    def build():
+        df = get_ind_table(analysis_yr_cost_indices)
+        fac_names = [c for c in df.columns if c.endswith('_Factor')]
+        return {int(yr): {fac_name: float(fac) for fac_name, fac in zip(fac_names, facs)}
+                for yr, facs in zip(df.index, df[fac_names].values)}
+
+    factor_lookup = get_derived('cost_index_factors', build,
+                                tables=('plant_cost_indices.csv',), key=(analysis_yr_cost_indices,))
+    return factor_lookup[int(basis_year)]
+
+
+def _build_ind_table(analysis_yr_cost_indices):
+    df = get_table('plant_cost_indices.csv')
+
+    # Linear extrapolation of every index column to last_year_for_cost_indicies, fit in one
+    # closed-form least squares solve.
+    index_cols = list(df.columns[1:])
+    X = np.column_stack((df.Year.values, np.ones(len(df))))
+    (a, b), _, _, _ = np.linalg.lstsq(X, df[index_cols].values.astype(float), rcond=None)
+    yr_list = np.arange(df.Year.max() + 1, last_year_for_cost_indicies + 1)
+    df1 = pd.DataFrame(np.outer(yr_list, a) + b, columns=index_cols)
     df1['Year'] = yr_list
     df = pd.concat([df, df1], axis=0)
 
@@ -321,7 +420,8 @@ def get_system_specs(m_fs):
     b.component_replace_percent_FCI = Var(initialize=0,
                                           doc='Component replacement costs as % FCI')
 
-    system_specs = SystemSpecs(m_fs.train)
+    system_specs = get_tea_basis(m_fs.train['case_study'], m_fs.train['scenario'],
+                                 **getattr(m_fs, 'tea_overrides', {}))
 
     b.electricity_price.fix(system_specs.elec_price)
     b.salaries_percent_FCI.fix(system_specs.salaries_percent_FCI)
@@ -345,6 +445,7 @@ def get_system_specs(m_fs):
     b.tic = 1.65
 
 
+@profiled()
 def get_system_costing(m_fs):
     '''
     Function to aggregate unit model results for calculation of system costing for WaterTAP3 model.
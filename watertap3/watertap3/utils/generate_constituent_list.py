@@ -1,13 +1,14 @@
-import pandas as pd
-import numpy as np
+
+from .data_catalog import get_derived, get_table
 
 __all__ = ['run',
+           'get_removal_index',
+           'get_removal_factor',
            'get_removal_factors']
 
 
 def get_source_constituents(reference, water_type, case_study, scenario):
-    input_file = 'data/case_study_water_sources.csv'
-    source_df = pd.read_csv(input_file, index_col='variable')
+    source_df = get_table('case_study_water_sources.csv', index_col='variable')
     source_df = source_df[((source_df.case_study == case_study) & (source_df.water_type == water_type) & (source_df.reference == reference) & (source_df.scenario == scenario))]
     source_df.set_index(source_df.index, inplace=True)
     return source_df
@@ -15,12 +16,10 @@ def get_source_constituents(reference, water_type, case_study, scenario):
 def run(m_fs):
     train = m_fs.train
     # getting the list of consituents with removal factors that are bigger than 0
-    df = pd.read_csv('data/constituent_removal_factors.csv')
-    df.case_study = np.where(df.case_study == 'default', train['case_study'], df.case_study)
-    df = df[df.reference == train['reference']]
-    df = df[df.case_study == train['case_study']]
-    df = df[df.scenario == 'baseline']
-    list1 = df[df.value >= 0].constituent.unique()
+    index = get_removal_index()
+    rows = (index['positive'].get((train['reference'], 'baseline', train['case_study']), []) +
+            index['positive'].get((train['reference'], 'baseline', 'default'), []))
+    list1 = list(dict.fromkeys(constituent for _, constituent in sorted(rows)))
     list2 = m_fs.source_df.index.unique().to_list()
 
     m_fs.source_constituents = source_constituents = [x for x in list1 if x in list2]
@@ -28,22 +27,67 @@ def run(m_fs):
     return source_constituents
 
 
+def get_removal_index():
+    '''
+    Function to get the constituent removal factor index. Built once from
+    constituent_removal_factors.csv and rebuilt only when that file changes.
+
+    The index is a dictionary with two entries:
+
+        * ``'factors'``: (unit_process, case_study, scenario, reference, constituent) --> removal factor.
+          If a key appears more than once in the table the first row wins.
+        * ``'positive'``: (reference, scenario, case_study) --> list of (row number, constituent) for
+          rows with a removal factor >= 0, in table order.
+
+    :return: Removal factor index
+    '''
+
+    def build():
+        df = get_table('constituent_removal_factors.csv')
+        factors = {}
+        positive = {}
+        cols = ['unit_process', 'case_study', 'scenario', 'reference', 'constituent', 'value']
+        for i, (unit_process, case_study, scenario, reference, constituent, value) in enumerate(df[cols].itertuples(index=False)):
+            factors.setdefault((unit_process, case_study, scenario, reference, constituent), value)
+            if value >= 0:
+                positive.setdefault((reference, scenario, case_study), []).append((i, constituent))
+        return {'factors': factors, 'positive': positive}
+
+    return get_derived('removal_index', build, tables=('constituent_removal_factors.csv',))
+
+
+def get_removal_factor(unit_process_type, constituent, case_study, reference, scenario='baseline'):
+    '''
+    Function to look up the removal factor for one constituent in one unit. A case study specific
+    value is used if there is one, otherwise the ``default`` value for the unit.
+
+    :param unit_process_type: Unit process type (e.g. ``'media_filtration'``)
+    :type unit_process_type: str
+    :param constituent: Constituent name
+    :type constituent: str
+    :param case_study: Case study name
+    :type case_study: str
+    :param reference: Reference (e.g. ``'nawi'``)
+    :type reference: str
+    :param scenario: Scenario in the removal factor table
+    :type scenario: str
+    :return: Removal factor, or None if the unit has no entry for the constituent
+    '''
+    factors = get_removal_index()['factors']
+    rf = factors.get((unit_process_type, case_study, scenario, reference, constituent))
+    if rf is None:
+        rf = factors.get((unit_process_type, 'default', scenario, reference, constituent))
+    return rf
+
+
 def get_removal_factors(m, unit_process_type, unit_process_name):
 
     train = m.fs.train
-    df = pd.read_csv('data/constituent_removal_factors.csv')
-    const_df = df[((df.unit_process == unit_process_type) & (df.scenario == 'baseline') & (df.reference == train['reference']))].copy()
-    const_df = const_df[(const_df.case_study == train['case_study']) | (const_df.case_study == 'default')].copy()
     constituent_list = getattr(m.fs, unit_process_name).config.property_package.component_list
     removal_dict = {}
     for constituent in constituent_list:
-        if constituent not in const_df.constituent.unique():
-            continue
-        if const_df[((const_df.case_study == train['case_study']) & (const_df.constituent == constituent))].empty:
-            rf = const_df[((const_df.case_study == 'default') & (const_df.constituent == constituent))].value.iloc[0]
-            removal_dict[constituent] = rf
-        else:
-            rf = const_df[((const_df.case_study == train['case_study']) & (const_df.constituent == constituent))].value.iloc[0]
+        rf = get_removal_factor(unit_process_type, constituent, train['case_study'], train['reference'])
+        if rf is not None:
             removal_dict[constituent] = rf
 
-    return removal_dict
\ No newline at end of file
+    return removal_dict
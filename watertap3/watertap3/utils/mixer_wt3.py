@@ -14,7 +14,7 @@ from __future__ import absolute_import, division, print_function  # disable impl
 import logging
 from enum import Enum
 
-from pyomo.environ import (Reals, SolverFactory, TerminationCondition, Var)
+from pyomo.environ import (Reals, SolverFactory, TerminationCondition, Var, value)
 from pyomo.common.config import ConfigBlock, ConfigValue, In
 from idaes.core import (UnitModelBlockData, declare_process_block_class, useDefault)
 from idaes.core.util.config import (is_physical_parameter_block, is_state_block, list_of_strings)
@@ -22,6 +22,8 @@ from idaes.core.util.exceptions import (BurntToast, ConfigurationError, Property
 from idaes.core.util.misc import add_object_reference
 from pyomo.network import Port
 
+from .scaling import scale_stream
+
 __author__ = 'Andrew Lee'
 
 __all__ = ['Mixer']
@@ -649,6 +651,26 @@ linked to all inlet states and the mixed state,
                              'StateBlock class.'.format(blk.name))
 
 
+    def calculate_scaling_factors(self):
+        '''
+        Set scaling factors for the inlet streams from their current flows and concentrations, and
+        for the outlet stream from their totals.
+        '''
+        component_list = self.config.property_package.component_list
+        for t in self.flowsheet().config.time:
+            total_flow = 0
+            total_mass = {j: 0 for j in component_list}
+            for p in self.create_inlet_list():
+                flow = value(getattr(self, f'flow_vol_{p}')[t])
+                conc = {j: value(getattr(self, f'conc_mass_{p}')[t, j]) for j in component_list}
+                scale_stream(self, p, t, flow, conc)
+                total_flow += flow
+                for j in component_list:
+                    total_mass[j] += flow * conc[j]
+            scale_stream(self, 'out', t, total_flow,
+                         {j: total_mass[j] / total_flow if total_flow else 0 for j in component_list})
+
+
     def use_minimum_inlet_pressure_constraint(self):
         '''Activate the mixer pressure = mimimum inlet pressure constraint and
         deactivate the mixer pressure and all inlet pressures are equal
@@ -1,16 +1,19 @@
 import numpy as np
 import pandas as pd
 from scipy.optimize import curve_fit
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
+
+from .data_catalog import get_table
 
 __all__ = ['make_df_for_ml',
            'make_simple_poly',
            'get_linear_regression',
-           'get_cost_curve_coefs']
+           'get_cost_curve_coefs',
+           'fit_power_laws']
 
 
 def make_df_for_ml(df1):
+    from sklearn.preprocessing import PolynomialFeatures
+
     poly2 = PolynomialFeatures(3, include_bias=False)
     df1 = df1.copy(deep=True)
     df1 = df1.T
@@ -30,6 +33,9 @@ def make_df_for_ml(df1):
 
 
 def make_simple_poly(df, y_value):
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import PolynomialFeatures
+
     df['y'] = df[y_value]
     del df[y_value]
 
@@ -94,14 +100,10 @@ def make_simple_poly(df, y_value):
 
 def get_linear_regression(x_values, y_values, variable=None):
 
-    X = np.array(x_values).reshape(-1, 1)
-    y = np.array(y_values).reshape(-1, 1)
-    reg = LinearRegression().fit(X, y)
+    X = np.column_stack((np.asarray(x_values, dtype=float), np.ones(len(x_values))))
+    (a, b), _, _, _ = np.linalg.lstsq(X, np.asarray(y_values, dtype=float), rcond=None)
 
-    a = reg.coef_[0]
-    b = reg.intercept_
-
-    return a[0], b[0]
+    return a, b
 
 
 def power_law(x, a, b):
@@ -119,7 +121,7 @@ def get_cost_curve_coefs(flow_in=None, data_id=None, xs=None, ys=None):
 
     else:
 
-        df = pd.read_csv('data/chlorine_dose_cost_twb.csv')
+        df = get_table('chlorine_dose_cost_twb.csv')
 
         xs = df[((df.Flow_mgd == flow_in) & (df.VariableID == 2))].Value.values
 
@@ -128,6 +130,87 @@ def get_cost_curve_coefs(flow_in=None, data_id=None, xs=None, ys=None):
     return pars, r2_result, xs, ys, ys_new
 
 
+def fit_power_laws(xs, ys, refine_tol=0.01, bounds=(-np.inf, np.inf)):
+    '''
+    Fit y = a * x ** b to many curves at once.
+
+    All curves are first fit together by least squares on log(y) = log(a) + b * log(x). Points with
+    x <= 0 or y <= 0 are left out of this step. Each curve is then refined with ``curve_fit`` (same
+    fit as ``get_cost_curve_coefs``), starting from the log-space fit. The log-space fit minimizes
+    relative rather than absolute errors, so it can differ from ``curve_fit`` by a few percent even
+    on curves it fits closely. Curves whose log-space fit has a relative RMS error below
+    ``refine_tol`` (and is within ``bounds``) keep it, which is what makes bulk refits fast; pass
+    ``refine_tol=0`` to get the ``curve_fit`` coefficients for every curve.
+
+    :param xs: x values for each curve. Curves can have different numbers of points.
+    :type xs: list
+    :param ys: y values for each curve
+    :type ys: list
+    :param refine_tol: Relative RMS error above which a curve is refined. 0 refines every curve
+        except exact fits. If None, curves are only refined when the log-space fit is not possible.
+    :type refine_tol: float
+    :param bounds: Lower and upper bounds on (a, b), passed to ``curve_fit``
+    :type bounds: tuple
+    :return: pars (array of [a, b] for each curve), r2 (correlation coefficient of y and fitted y
+        for each curve, as in ``get_cost_curve_coefs``), refined (True for curves refit with
+        ``curve_fit``)
+    '''
+    n = len(xs)
+    if len(ys) != n:
+        raise ValueError(f'Got {n} sets of x values and {len(ys)} sets of y values.')
+    width = max(len(xi) for xi in xs)
+    x = np.full((n, width), np.nan)
+    y = np.full((n, width), np.nan)
+    for i, (xi, yi) in enumerate(zip(xs, ys)):
+        if len(xi) != len(yi):
+            raise ValueError(f'Curve {i} has {len(xi)} x values and {len(yi)} y values.')
+        x[i, :len(xi)] = xi
+        y[i, :len(yi)] = yi
+    valid = ~np.isnan(x) & ~np.isnan(y)
+    pos = valid & (x > 0) & (y > 0)
+    w = pos.astype(float)
+    lx = np.log(np.where(pos, x, 1.0))
+    ly = np.log(np.where(pos, y, 1.0))
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        cnt = w.sum(axis=1)
+        sx = (w * lx).sum(axis=1)
+        sy = (w * ly).sum(axis=1)
+        sxx = (w * lx * lx).sum(axis=1)
+        sxy = (w * lx * ly).sum(axis=1)
+        b = (cnt * sxy - sx * sy) / (cnt * sxx - sx ** 2)
+        a = np.exp((sy - b * sx) / cnt)
+        pars = np.column_stack((a, b))
+
+        def predict(p):
+            return p[:, :1] * np.where(valid, x, 1.0) ** p[:, 1:]
+
+        wv = valid.astype(float)
+        n_valid = wv.sum(axis=1)
+        y0 = np.where(valid, y, 0.0)
+        err = np.sqrt((wv * (y0 - np.where(valid, predict(pars), 0.0)) ** 2).sum(axis=1) / n_valid)
+        rel_err = err / (np.abs(y0).sum(axis=1) / n_valid)
+
+    lo = np.broadcast_to(np.asarray(bounds[0], dtype=float), (2,))
+    hi = np.broadcast_to(np.asarray(bounds[1], dtype=float), (2,))
+    refined = ~np.isfinite(pars).all(axis=1)
+    refined |= ((pars < lo) | (pars > hi)).any(axis=1)
+    if refine_tol is not None:
+        refined |= ~(rel_err <= refine_tol)
+    for i in np.flatnonzero(refined):
+        p0 = pars[i] if np.isfinite(pars[i]).all() else np.ones(2)
+        p0 = np.clip(p0, lo, hi)
+        pars[i], _ = curve_fit(f=power_law, xdata=x[i, valid[i]], ydata=y[i, valid[i]], p0=p0, bounds=bounds)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        ys_new = np.where(valid, predict(pars), 0.0)
+        dy = np.where(valid, y0 - (wv * y0).sum(axis=1, keepdims=True) / n_valid[:, None], 0.0)
+        dp = np.where(valid, ys_new - (wv * ys_new).sum(axis=1, keepdims=True) / n_valid[:, None], 0.0)
+        r2 = (dy * dp).sum(axis=1) / np.sqrt((dy ** 2).sum(axis=1) * (dp ** 2).sum(axis=1))
+
+    return pars, r2, refined
+
+
 # def main():
 #     print('importing something')
 
@@ -1,192 +1,126 @@
+import importlib
+
+__all__ = ['get_module',
+           'register_unit',
+           'unit_modules']
+
+entry_point_group = 'watertap3.units'
+
+# unit process type (Unit column in treatment_train_setup.csv) --> module with its UnitProcess class
+unit_modules = {name: f'watertap3.wt_units.{name}' for name in [
+        'agglom_stacking',
+        'alum_addition',
+        'ammonia_addition',
+        'anion_exchange',
+        'anion_exchange_epa',
+        'anti_scalant_addition',
+        'backwash_solids_handling',
+        'basic_unit',
+        'brine_concentrator',
+        'cartridge_filtration',
+        'cation_exchange',
+        'caustic_soda_addition',
+        'chemical_addition',
+        'chlorination',
+        'co2_addition',
+        'coag_and_floc',
+        'coagulant_addition',
+        'cooling_tower',
+        'crystallizer',
+        'deep_well_injection',
+        'electrodialysis_reversal',
+        'evaporation_pond',
+        'ferric_chloride_addition',
+        'filter_press',
+        'fixed_bed_gravity_basin',
+        'fixed_bed_pressure_vessel',
+        'flocculator',
+        'fluidized_bed',
+        'gac_gravity',
+        'gac_pressure_vessel',
+        'heap_leaching',
+        'holding_tank',
+        'hydrochloric_acid_addition',
+        'ion_exchange',
+        'iron_and_manganese_removal',
+        'landfill',
+        'landfill_zld',
+        'lime_addition',
+        'lime_softening',
+        'media_filtration',
+        'microfiltration',
+        'multi_stage_bubble_aeration',
+        'municipal_drinking',
+        'ozone_aop',
+        'packed_tower_aeration',
+        'passthrough',
+        'rapid_mix',
+        'reverse_osmosis',
+        'sedimentation',
+        'sodium_bisulfite_addition',
+        'solution_distribution_and_recovery_plant',
+        'static_mixer',
+        'sulfuric_acid_addition',
+        'surface_discharge',
+        'sw_onshore_intake',
+        'treated_storage',
+        'tri_media_filtration',
+        'uv_aop',
+        'water_pumping_station',
+        'well_field'
+        ]}
+
+_entry_points_loaded = False
+
+
+def _load_entry_points():
+    '''
+    Add unit modules registered by other packages under the ``watertap3.units`` entry point group,
+    e.g. ``my_unit = my_package.my_unit``. Units in the static table take precedence.
+    '''
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return
+    eps = entry_points()
+    if hasattr(eps, 'select'):
+        eps = eps.select(group=entry_point_group)
+    else:
+        eps = eps.get(entry_point_group, [])
+    for ep in eps:
+        unit_modules.setdefault(ep.name, ep.value)
+
+
+def register_unit(unit_process_type, module_path):
+    '''
+    Function to register a unit process module so it can be used in a treatment train.
+
+    :param unit_process_type: Unit process type as used in the Unit column of the input sheet
+    :type unit_process_type: str
+    :param module_path: Importable path of the module with the UnitProcess class
+    :type module_path: str
+    '''
+    unit_modules[unit_process_type] = module_path
 
-__all__ = ['get_module']
 
 def get_module(module_name):
-    if module_name == 'ion_exchange':
-        import wt_units.ion_exchange as up
-
-    if module_name == 'chlorination':
-        import wt_units.chlorination as up
-    
-    if module_name == 'coag_and_floc':
-        import wt_units.coag_and_floc as up
-
-    if module_name == 'water_pumping_station':
-        import wt_units.water_pumping_station as up
-        
-    if module_name == 'media_filtration':
-        import wt_units.media_filtration as up
-     
-    if module_name == 'lime_softening':
-        import wt_units.lime_softening as up
-
-    if module_name == 'electrocoagulation':
-        import wt_units.electrocoagulation as up
-        
-    if module_name == 'treated_storage':
-        import wt_units.treated_storage as up
-    
-    if module_name == 'sedimentation':
-        import wt_units.sedimentation as up
-        
-    if module_name == 'water_pumping_station':
-        import wt_units.water_pumping_station as up
-        
-    if module_name == 'sulfuric_acid_addition':
-        import wt_units.sulfuric_acid_addition as up
-        
-    if module_name == 'sodium_bisulfite_addition':
-        import wt_units.sodium_bisulfite_addition as up
-    
-    if module_name == 'co2_addition':
-        import wt_units.co2_addition as up
-    
-    if module_name == 'ammonia_addition':
-        import wt_units.ammonia_addition as up
-    
-    if module_name == 'municipal_drinking':
-        import wt_units.municipal_drinking as up
-        
-    if module_name == 'sw_onshore_intake':
-        import wt_units.sw_onshore_intake as up
-        
-    if module_name == 'holding_tank':
-        import wt_units.holding_tank as up
-        
-    if module_name == 'tri_media_filtration':
-        import wt_units.tri_media_filtration as up
-        
-    if module_name == 'cartridge_filtration':
-        import wt_units.cartridge_filtration as up
-        
-    if module_name == 'backwash_solids_handling':
-        import wt_units.backwash_solids_handling as up
-
-    if module_name == 'surface_discharge':
-        import wt_units.surface_discharge as up
-
-    if module_name == 'landfill':
-        import wt_units.landfill as up
-    
-    if module_name == 'flocculator':
-        import wt_units.flocculator as up
-
-    if module_name == 'rapid_mix':
-        import wt_units.rapid_mix as up
-
-    if module_name == 'coagulant_addition':
-        import wt_units.coagulant_addition as up
-
-    if module_name == 'alum_addition':
-        import wt_units.alum_addition as up
-
-    if module_name == 'ferric_chloride_addition':
-        import wt_units.ferric_chloride_addition as up
-
-    if module_name == 'caustic_soda_addition':
-        import wt_units.caustic_soda_addition as up
-
-    if module_name == 'static_mixer':
-        import wt_units.static_mixer as up
-
-    if module_name == 'uv_aop':
-        import wt_units.uv_aop as up
-
-    if module_name == 'anti_scalant_addition':
-        import wt_units.anti_scalant_addition as up
-
-    if module_name == 'iron_and_manganese_removal':
-        import wt_units.iron_and_manganese_removal as up
-
-    if module_name == 'well_field':
-        import wt_units.well_field as up
-
-    if module_name == 'hydrochloric_acid_addition':
-        import wt_units.hydrochloric_acid_addition as up
-
-    if module_name == 'deep_well_injection':
-        import wt_units.deep_well_injection as up
-
-    if module_name == 'anion_exchange':
-        import wt_units.anion_exchange as up
-
-    if module_name == 'cation_exchange':
-        import wt_units.cation_exchange as up
-
-    if module_name == 'electrodialysis_reversal':
-        import wt_units.electrodialysis_reversal as up
-
-    if module_name == 'fixed_bed_pressure_vessel':
-        import wt_units.fixed_bed_pressure_vessel as up
-
-    if module_name == 'fixed_bed_gravity_basin':
-        import wt_units.fixed_bed_gravity_basin as up
-
-    if module_name == 'fluidized_bed':
-        import wt_units.fluidized_bed as up
-
-    if module_name == 'multi_stage_bubble_aeration':
-        import wt_units.multi_stage_bubble_aeration as up
-
-    if module_name == 'packed_tower_aeration':
-        import wt_units.packed_tower_aeration as up
-
-    if module_name == 'gac_pressure_vessel':
-        import wt_units.gac_pressure_vessel as up
-
-    if module_name == 'gac_gravity':
-        import wt_units.gac_gravity as up
-
-    if module_name == 'ozone_aop':
-        import wt_units.ozone_aop as up
-
-    if module_name == 'microfiltration':
-        import wt_units.microfiltration as up
-    
-    if module_name == 'reverse_osmosis':
-        import wt_units.reverse_osmosis as up
-
-    if module_name == 'basic_unit':
-        import wt_units.basic_unit as up
-    
-    if module_name == 'cooling_tower':
-        import wt_units.cooling_tower as up
-
-    if module_name == 'evaporation_pond':
-        import wt_units.evaporation_pond as up
-
-    if module_name == 'heap_leaching':
-        import wt_units.heap_leaching as up
-
-    if module_name == 'agglom_stacking':
-        import wt_units.agglom_stacking as up
-
-    if module_name == 'solution_distribution_and_recovery_plant':
-        import wt_units.solution_distribution_and_recovery_plant as up
-
-    if module_name == 'lime_addition':
-        import wt_units.lime_addition as up
-
-    if module_name == 'brine_concentrator':
-        import wt_units.brine_concentrator as up
-
-    if module_name == 'crystallizer':
-        import wt_units.crystallizer as up
-
-    if module_name == 'chemical_addition':
-        import wt_units.chemical_addition as up
-
-    if module_name == 'anion_exchange_epa':
-        import wt_units.anion_exchange_epa as up
-
-    if module_name == 'landfill_zld':
-        import wt_units.landfill_zld as up
-
-    if module_name == 'passthrough':
-        import wt_units.passthrough as up
-
-    if module_name == 'filter_press':
-        import wt_units.filter_press as up
-
-    return up
-
+    '''
+    Function to get the module for a unit process type. Modules are imported the first time they
+    are used, so only the units in the trains being built are loaded.
+
+    :param module_name: Unit process type (e.g. ``'chlorination'``)
+    :type module_name: str
+    :return: Unit process module
+    '''
+    if module_name not in unit_modules:
+        _load_entry_points()
+    try:
+        module_path = unit_modules[module_name]
+    except KeyError:
+        raise ValueError(f'Unknown unit process {module_name!r}. Add it to module_import.unit_modules, '
+                         f'register it with register_unit or the {entry_point_group!r} entry point group.') from None
+    return importlib.import_module(module_path)
@@ -0,0 +1,303 @@
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+from pyomo.core.base.componentuid import ComponentUID
+from pyomo.environ import Var, value
+
+from .sweep_solver import SweepSolver
+from .watertap import get_flowsheet, run_watertap3
+
+__all__ = ['get_model_spec',
+           'build_model',
+           'run_sweep_points']
+
+# model, solver and starting point of a worker process (see _init_worker)
+_model = None
+_sweep = None
+_start = None
+
+
+def _uid(c):
+    return c if isinstance(c, str) else str(ComponentUID(c))
+
+
+def _find(m, uid):
+    c = ComponentUID(uid).find_component_on(m)
+    if c is None:
+        raise KeyError(f'{uid} is not on the model')
+    return c
+
+
+def _get_state(m):
+    return {v.name: (v.value, v.fixed) for v in m.component_data_objects(Var, descend_into=True)}
+
+
+def _set_state(m, state):
+    for v in m.component_data_objects(Var, descend_into=True):
+        if v.name not in state:
+            continue
+        val, fixed = state[v.name]
+        v.value = val
+        if fixed:
+            v.fix()
+        else:
+            v.unfix()
+
+
+def get_model_spec(m):
+    '''
+    Function to get everything needed to rebuild a model in another process: the train, sources,
+    TEA overrides, run_watertap3 options and the value and fixed state of every variable. Only
+    models returned by run_watertap3 can be rebuilt.
+
+    :param m: Model returned by run_watertap3
+    :return: Dictionary (picklable)
+    '''
+    run_options = getattr(m.fs, 'run_options', None)
+    if run_options is None:
+        raise ValueError('Only models returned by run_watertap3 can be rebuilt.')
+    return {
+            'case_study': m.fs.train['case_study'],
+            'reference': m.fs.train['reference'],
+            'scenario': m.fs.train['scenario'],
+            'source_reference': m.fs.source_water['reference'],
+            'source_case_study': m.fs.source_water['case_study'],
+            'source_scenario': m.fs.source_water['scenario'],
+            'new_df_units': m.fs.df_units.copy() if m.fs.new_case_study else None,
+            'tea_overrides': dict(m.fs.tea_overrides),
+            'run_options': dict(run_options),
+            'state': _get_state(m)
+            }
+
+
+def build_model(spec):
+    '''
+    Function to rebuild a model from get_model_spec: the flowsheet is built and run with
+    run_watertap3 as before, then every variable is set to the value and fixed state in spec.
+    '''
+    m = get_flowsheet(case_study=spec['case_study'], reference=spec['reference'], scenario=spec['scenario'],
+                      source_reference=spec['source_reference'], source_case_study=spec['source_case_study'],
+                      source_scenario=spec['source_scenario'], new_df_units=spec['new_df_units'],
+                      tea_overrides=spec['tea_overrides'])
+    m = run_watertap3(m, **spec['run_options'])
+    _set_state(m, spec['state'])
+    return m
+
+
+def _prepare(point, outputs):
+    '''
+    Convert the components of a sweep point to ComponentUID strings so it can be sent to workers.
+    Indexed components are expanded into their elements.
+    '''
+    fix = []
+    for c, val in point.get('fix', []):
+        if not isinstance(c, str) and c.is_indexed():
+            fix.extend((_uid(cd), val) for cd in c.values())
+        else:
+            fix.append((_uid(c), val))
+    point_outputs = dict(outputs)
+    point_outputs.update(point.get('outputs', {}))
+    return {
+            'label': point.get('label'),
+            'fix': fix,
+            'outputs': {k: _uid(c) for k, c in point_outputs.items()}
+            }
+
+
+def _solve(m, sweep, point, verbose=True, objective=False, keep_state=False):
+    '''
+    Fix the variables of a sweep point, solve and read the outputs. Fixed variables are restored
+    afterwards. With keep_state=True the solution is returned in ``state`` if the point converged.
+    '''
+    fixed = [_find(m, uid) for uid, _ in point['fix']]
+    stash = [(v, v.value, v.fixed) for v in fixed]
+    try:
+        for v, (_, val) in zip(fixed, point['fix']):
+            v.fix(val)
+        results = sweep.solve(m, objective=objective, label=point['label'], verbose=verbose, parameters=fixed)
+        result = {'termination_condition': str(results.solver.termination_condition), 'error': None}
+        for k, uid in point['outputs'].items():
+            result[k] = value(_find(m, uid), exception=False)
+        if keep_state and _converged(result):
+            result['state'] = _get_state(m)
+    except Exception as e:
+        result = {'termination_condition': 'error', 'error': repr(e)}
+        result.update(dict.fromkeys(point['outputs']))
+    finally:
+        for v, val, was_fixed in stash:
+            v.value = val
+            if not was_fixed:
+                v.unfix()
+    return result
+
+
+def _converged(result):
+    return result['error'] is None and result['termination_condition'] == 'optimal'
+
+
+def _distance(x, y, scale):
+    return sum(((a - b) / s) ** 2 for a, b, s in zip(x, y, scale))
+
+
+def _continuation(m, sweep, points, verbose=True, objective=False, max_bisections=3):
+    '''
+    Solve the points of one sweep by continuation. Points are solved in order of distance from the
+    current values of the swept variables, each one starting from the stored solution of the
+    nearest point that converged (or the starting solution). If a point fails, the step is halved:
+    the midpoint between the neighbour and the point is solved first and used as the new starting
+    solution, up to max_bisections times. m is left at its starting state.
+    '''
+    uids = [uid for uid, _ in points[0]['fix']]
+    if any([uid for uid, _ in point['fix']] != uids for point in points):
+        raise ValueError('Continuation needs every point of a sweep to fix the same variables.')
+    start = _get_state(m)
+    base = [_find(m, uid).value for uid in uids]
+    scale = [abs(b) if b else 1 for b in base]
+    anchors = [(base, start)]
+
+    def solve_from(x, state, point, target, depth):
+        _set_state(m, state)
+        result = _solve(m, sweep, point, verbose=verbose, objective=objective, keep_state=True)
+        if _converged(result) or depth >= max_bisections:
+            return result
+        mid = [(a + b) / 2 for a, b in zip(x, target)]
+        if verbose:
+            print(f'{point["label"]}: bisecting step to {mid}')
+        mid_result = solve_from(x, state, dict(point, fix=list(zip(uids, mid))), mid, depth + 1)
+        if not _converged(mid_result):
+            return result
+        anchors.append((mid, mid_result['state']))
+        return solve_from(mid, mid_result['state'], point, target, depth + 1)
+
+    results = [None] * len(points)
+    try:
+        for k in sorted(range(len(points)), key=lambda k: _distance([val for _, val in points[k]['fix']], base, scale)):
+            target = [val for _, val in points[k]['fix']]
+            x, state = min(anchors, key=lambda anchor: _distance(target, anchor[0], scale))
+            result = solve_from(x, state, points[k], target, 0)
+            if 'state' in result:
+                anchors.append((target, result.pop('state')))
+            results[k] = result
+    finally:
+        _set_state(m, start)
+    return results
+
+
+def _init_worker(spec):
+    global _model, _sweep, _start
+    _model = build_model(spec)
+    _sweep = SweepSolver(solver=spec['run_options'].get('solver', 'ipopt'),
+                         tolerance=spec['run_options'].get('tolerance'))
+    _start = _get_state(_model)
+
+
+def _solve_point(point, objective=False):
+    # every point starts from the same state, so results do not depend on which worker solves it
+    _set_state(_model, _start)
+    return _solve(_model, _sweep, point, verbose=False, objective=objective)
+
+
+def _solve_group(group, objective=False, max_bisections=3):
+    _set_state(_model, _start)
+    return _continuation(_model, _sweep, group, verbose=False, objective=objective, max_bisections=max_bisections)
+
+
+def _groups(points):
+    groups = {}
+    for k, point in enumerate(points):
+        groups.setdefault(point['label'], []).append(k)
+    return list(groups.values())
+
+
+def run_sweep_points(m, points, outputs, workers=1, sweep=None, verbose=True, objective=False, continuation=False,
+                     max_bisections=3, chained=False):
+    '''
+    Function to solve a model at a list of sweep points and read outputs at each one.
+
+    A point is a dictionary with a ``label`` (e.g. the sweep name), ``fix``, a list of
+    (variable, value) pairs to fix, and optionally its own ``outputs``. outputs is a
+    dictionary of output names and components (variables or expressions) read after every solve.
+    Variables fixed for a point are restored after it is solved.
+
+    With workers=1 the points are solved in order on m. Otherwise they are solved in a
+    ProcessPoolExecutor with that many processes (None for one per core), each of which rebuilds
+    its own copy of m once (see get_model_spec). Either way every point starts from m's values
+    when run_sweep_points was called, so results do not depend on the number of workers, and m is
+    left at those values. Results are returned in the order of points. Telemetry records of solves
+    in worker processes are only kept if telemetry.telemetry_file is set.
+
+    With chained=True (workers=1 only) each point instead starts from the solution of the one
+    before, and m is re-solved at its original values whenever the label changes. This is the
+    behaviour of earlier versions; results can then differ from a parallel run.
+
+    With continuation=True the points with the same label are solved as one continuation sweep
+    instead: nearest the current values first, each from the stored solution of the nearest point
+    that converged, halving the step up to max_bisections times when a point fails (see
+    _continuation). Every point of a label must fix the same variables. m is returned to its
+    starting values after each label without a reset solve; with workers other than 1 each label is
+    solved by one process.
+
+    :param m: Model. For workers other than 1 this must be a model returned by run_watertap3.
+    :param points: List of sweep points
+    :type points: list
+    :param outputs: Output names and components
+    :type outputs: dict
+    :param workers: Number of processes
+    :type workers: int
+    :param sweep: SweepSolver to use for workers=1
+    :param verbose: Print solve progress (workers=1 only)
+    :type verbose: bool
+    :param objective: Solve with the LCOW objective
+    :type objective: bool
+    :param continuation: Solve each label by continuation
+    :type continuation: bool
+    :param max_bisections: Maximum number of step halvings per point (continuation only)
+    :type max_bisections: int
+    :param chained: Start each point from the previous point's solution (workers=1, no
+        continuation)
+    :type chained: bool
+    :return: List with a dictionary of output values, ``termination_condition`` and ``error`` for
+        each point
+    '''
+    points = [_prepare(point, outputs) for point in points]
+    groups = _groups(points) if continuation else None
+    if workers == 1:
+        if sweep is None:
+            sweep = SweepSolver()
+        if continuation:
+            results = [None] * len(points)
+            for group in groups:
+                group_results = _continuation(m, sweep, [points[k] for k in group], verbose=verbose,
+                                              objective=objective, max_bisections=max_bisections)
+                for k, result in zip(group, group_results):
+                    results[k] = result
+            return results
+        results = []
+        if chained:
+            label = None
+            for point in points:
+                if label is not None and point['label'] != label:
+                    sweep.solve(m, objective=objective, label='reset', verbose=verbose)
+                label = point['label']
+                results.append(_solve(m, sweep, point, verbose=verbose, objective=objective))
+            return results
+        start = _get_state(m)
+        try:
+            for point in points:
+                _set_state(m, start)
+                results.append(_solve(m, sweep, point, verbose=verbose, objective=objective))
+        finally:
+            _set_state(m, start)
+        return results
+    spec = get_model_spec(m)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(spec,)) as executor:
+        if not continuation:
+            return list(executor.map(functools.partial(_solve_point, objective=objective), points))
+        results = [None] * len(points)
+        group_results = executor.map(functools.partial(_solve_group, objective=objective,
+                                                       max_bisections=max_bisections),
+                                     [[points[k] for k in group] for group in groups])
+        for group, group_result in zip(groups, group_results):
+            for k, result in zip(group, group_result):
+                results[k] = result
+        return results
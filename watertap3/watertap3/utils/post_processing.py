@@ -3,6 +3,8 @@ import pandas as pd
 from pylab import *
 from pyomo.environ import Block, Expression, units as pyunits, value
 from watertap3.utils import generate_constituent_list
+from .data_catalog import get_table
+from .profiler import profiled
 
 __all__ = ['get_results_table', 'combine_case_study_results', 'compare_with_excel']
 
@@ -121,6 +123,7 @@ def get_unit_nice_name(unit_str):
         return unit_str.replace('_', ' ').title()
 
 
+@profiled()
 def get_results_table(m=None, scenario=None, case_study=None, save=True, incl_constituent_results=True):
     if scenario is None:
         scenario = m.fs.train['scenario']
@@ -148,7 +151,7 @@ def get_results_table(m=None, scenario=None, case_study=None, save=True, incl_co
     flow_ins_ro = []
     flow_outs_ro = []
 
-    name_lup = pd.read_csv('data/excel_to_python_names.csv', index_col='Python_variable')
+    name_lup = get_table('excel_to_python_names.csv', index_col='Python_variable')
 
     value_list.append(value(m.fs.costing.LCOW))
     python_var.append('system')
@@ -0,0 +1,203 @@
+import contextlib
+import functools
+import time
+import tracemalloc
+
+import pandas as pd
+
+__all__ = ['enable_profiling',
+           'disable_profiling',
+           'profile_phase',
+           'profiled',
+           'get_profile',
+           'print_profile',
+           'save_profile',
+           'compare_profiles',
+           'clear_profile']
+
+# Profiling is off by default; phases then cost one attribute lookup.
+enabled = False
+track_memory = False
+
+_records = []
+_stack = []
+_started_tracemalloc = False
+
+_summary_columns = ['path', 'calls', 'wall_time', 'peak_memory']
+
+
+def enable_profiling(memory=True):
+    '''
+    Function to start recording phases (see profile_phase). With memory=True, peak Python memory
+    per phase is traced with tracemalloc, which slows model construction down noticeably.
+
+    On Python < 3.9 tracemalloc's peak cannot be reset, so the peak memory of a phase is only
+    exact if the phase set a new overall peak; otherwise the memory in use at the end of the phase
+    is reported.
+
+    :param memory: Trace peak memory
+    :type memory: bool
+    '''
+    global enabled, track_memory, _started_tracemalloc
+    enabled = True
+    track_memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+
+
+def disable_profiling():
+    '''
+    Function to stop recording phases. Recorded phases are kept (see clear_profile).
+    '''
+    global enabled, track_memory, _started_tracemalloc
+    enabled = False
+    track_memory = False
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+
+
+def _peak(start_peak=None):
+    current, peak = tracemalloc.get_traced_memory()
+    if not hasattr(tracemalloc, 'reset_peak') and start_peak is not None and peak <= start_peak:
+        return current
+    return peak
+
+
+def _reset_peak():
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+
+
+@contextlib.contextmanager
+def profile_phase(name, detail=None):
+    '''
+    Context manager to record the wall time and peak memory of a phase. Phases can be nested; each
+    record has the path of enclosing phases (e.g. ``run_watertap3/solve_model``). Phases with a
+    detail appear in the path as ``name[detail]`` so they are reported separately.
+
+    :param name: Phase name
+    :type name: str
+    :param detail: Extra label for the record (e.g. the unit name)
+    '''
+    if not enabled:
+        yield
+        return
+    memory = track_memory and tracemalloc.is_tracing()
+    if memory:
+        if _stack:
+            _stack[-1]['peak'] = max(_stack[-1]['peak'], _peak())
+        _reset_peak()
+    label = name if detail is None else f'{name}[{detail}]'
+    entry = {'name': label, 'peak': tracemalloc.get_traced_memory()[0] if memory else 0,
+             'start_peak': _peak() if memory else 0}
+    path = '/'.join([e['name'] for e in _stack] + [label])
+    _stack.append(entry)
+    # records are kept in the order phases start, so parents come before their children
+    index = len(_records)
+    _records.append(None)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        wall_time = time.perf_counter() - start
+        _stack.pop()
+        peak = None
+        if memory:
+            peak = max(entry['peak'], _peak(entry['start_peak']))
+            if _stack:
+                _stack[-1]['peak'] = max(_stack[-1]['peak'], peak)
+            _reset_peak()
+        _records[index] = {
+                'path': path,
+                'phase': name,
+                'detail': detail,
+                'depth': len(_stack),
+                'wall_time': wall_time,
+                'peak_memory': None if peak is None else peak / 1E6
+                }
+
+
+def profiled(name=None, detail=None):
+    '''
+    Decorator to record every call of a function as a phase (see profile_phase).
+
+    :param name: Phase name. Defaults to the function name.
+    :type name: str
+    :param detail: Name of a keyword argument whose value is used as the record detail
+    :type detail: str
+    '''
+
+    def decorator(f):
+        phase_name = name or f.__name__
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return f(*args, **kwargs)
+            with profile_phase(phase_name, detail=kwargs.get(detail) if detail else None):
+                return f(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def get_profile(summary=False):
+    '''
+    :param summary: Aggregate records by path (number of calls, total wall time [s], largest peak
+        memory [MB]) in the order the paths first ran
+    :type summary: bool
+    :return: DataFrame with one row per recorded phase, or per path if summary=True
+    '''
+    df = pd.DataFrame([r for r in _records if r is not None], columns=['path', 'phase', 'detail', 'depth', 'wall_time', 'peak_memory'])
+    if not summary:
+        return df
+    return df.groupby('path', sort=False).agg(calls=('wall_time', 'size'), wall_time=('wall_time', 'sum'),
+                                              peak_memory=('peak_memory', 'max')).reset_index()
+
+
+def print_profile():
+    '''
+    Print the phase summary (see get_profile), indented by nesting.
+    '''
+    df = get_profile(summary=True)
+    if df.empty:
+        return
+    labels = [('  ' * p.count('/')) + p.rsplit('/', 1)[-1] for p in df.path]
+    df = df.drop(columns=[c for c in ['path', 'phase', 'detail', 'depth'] if c in df]).set_index(pd.Index(labels))
+    print('\n=========================== PHASE PROFILE ============================')
+    print(df.to_string(float_format=lambda x: f'{x:.3f}'))
+
+
+def save_profile(path):
+    '''
+    Function to write the phase summary (see get_profile) to a CSV file, e.g. to compare releases
+    with compare_profiles.
+    '''
+    get_profile(summary=True).to_csv(path, index=False)
+
+
+def compare_profiles(old_path, new_path):
+    '''
+    Function to compare two saved phase summaries (see save_profile).
+
+    :param old_path: Summary CSV of the reference run
+    :param new_path: Summary CSV of the new run
+    :return: DataFrame with wall time and peak memory of both runs per path, and the change in
+        wall time (absolute and relative)
+    '''
+    old = pd.read_csv(old_path, usecols=_summary_columns)
+    new = pd.read_csv(new_path, usecols=_summary_columns)
+    df = old.merge(new, on='path', how='outer', suffixes=('_old', '_new'), sort=False)
+    df['wall_time_change'] = df.wall_time_new - df.wall_time_old
+    df['wall_time_ratio'] = df.wall_time_new / df.wall_time_old
+    return df
+
+
+def clear_profile():
+    '''
+    Function to drop every recorded phase.
+    '''
+    _records.clear()
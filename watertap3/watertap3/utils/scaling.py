@@ -0,0 +1,95 @@
+import math
+
+import idaes.core.util.scaling as iscale
+from pyomo.core.expr.calculus.derivatives import differentiate
+from pyomo.core.expr.visitor import identify_variables
+from pyomo.environ import Constraint, Var
+
+__all__ = ['set_nominal',
+           'scale_stream',
+           'scale_vars_by_value',
+           'scale_constraints_by_gradient']
+
+# Scaling factors are powers of 10 between these limits.
+min_scaling_factor = 1E-8
+max_scaling_factor = 1E8
+
+
+def _clip(sf):
+    return min(max(sf, min_scaling_factor), max_scaling_factor)
+
+
+def set_nominal(var, nominal=None, overwrite=False):
+    '''
+    Function to set the scaling factor of a variable, or of every element of an indexed variable,
+    to the power of 10 closest to 1 / nominal. nominal defaults to the current value of each
+    element; elements with no value or a value of zero are skipped.
+
+    :param var: Variable
+    :param nominal: Typical magnitude of the variable
+    :type nominal: float
+    :param overwrite: Replace scaling factors that are already set
+    :type overwrite: bool
+    '''
+    for v in (var.values() if var.is_indexed() else [var]):
+        if not overwrite and iscale.get_scaling_factor(v) is not None:
+            continue
+        x = v.value if nominal is None else nominal
+        if x is None or x == 0:
+            continue
+        iscale.set_scaling_factor(v, _clip(10.0 ** -round(math.log10(abs(x)))))
+
+
+def scale_vars_by_value(blk):
+    '''
+    Function to set scaling factors from current values for every unfixed variable in blk that
+    does not have one yet.
+    '''
+    for v in blk.component_data_objects(Var, descend_into=True):
+        if not v.fixed:
+            set_nominal(v)
+
+
+def scale_constraints_by_gradient(blk, max_gradient=100):
+    '''
+    Function to set scaling factors for every active constraint in blk that does not have one
+    yet. This follows ipopt's gradient-based rule (the largest derivative of a scaled constraint is
+    at most max_gradient), but derivatives are taken at the current point with respect to the
+    scaled variables and factors are rounded to powers of 10. Constraints with a variable that has
+    no value are skipped.
+    '''
+    for c in blk.component_data_objects(Constraint, active=True, descend_into=True):
+        if iscale.get_scaling_factor(c) is not None:
+            continue
+        variables = list(identify_variables(c.body, include_fixed=False))
+        if not variables or any(v.value is None for v in variables):
+            continue
+        try:
+            grad = differentiate(c.body, wrt_list=variables, mode=differentiate.Modes.reverse_numeric)
+        except (ArithmeticError, ValueError):
+            continue
+        max_grad = max(abs(g) / (iscale.get_scaling_factor(v) or 1) for g, v in zip(grad, variables))
+        if max_grad > max_gradient:
+            iscale.set_scaling_factor(c, _clip(10.0 ** math.floor(math.log10(max_gradient / max_grad))))
+
+
+def scale_stream(b, name, t, flow, conc):
+    '''
+    Function to set scaling factors for the stream variables of a WaterTAP3 block
+    (flow_vol_<name>, conc_mass_<name>, temperature_<name>, pressure_<name>) at time t.
+
+    :param b: Unit, splitter or mixer block
+    :param name: Stream name (e.g. ``'in'``, ``'out'``, ``'waste'`` or a port name)
+    :type name: str
+    :param t: Time index
+    :param flow: Nominal flow [m3/s]
+    :type flow: float
+    :param conc: Nominal concentration of each component [kg/m3]
+    :type conc: dict
+    '''
+    set_nominal(getattr(b, f'flow_vol_{name}')[t], nominal=flow)
+    conc_var = getattr(b, f'conc_mass_{name}')
+    for j, c in conc.items():
+        set_nominal(conc_var[t, j], nominal=c)
+    set_nominal(getattr(b, f'temperature_{name}')[t], nominal=300)
+    set_nominal(getattr(b, f'pressure_{name}')[t], nominal=1)
@@ -11,10 +11,12 @@
 from idaes.core import (UnitModelBlockData, declare_process_block_class, useDefault)
 from idaes.core.util.config import is_physical_parameter_block
 from pyomo.common.config import ConfigBlock, ConfigValue, In
-from pyomo.environ import Binary, Constraint, ConstraintList, NonNegativeReals, Set, Var, units as pyunits
+from pyomo.environ import Binary, Constraint, ConstraintList, NonNegativeReals, Set, Var, units as pyunits, value
 from pyomo.network import Port
 from pyomo.gdp import Disjunct, Disjunction
 
+from .scaling import scale_stream
+
 module_name = 'splitter_binary'
 
 __all__ = ['SplitterBinary']
@@ -190,4 +192,16 @@ class SplitterProcessData(UnitModelBlockData):
                     
                 #     disj_outlet.no_conc_mass_out.add(other_outlet_conc_mass[t, c] * other_outlet_flow[t]== 1E-16 * self.conc_mass_in[t, c] * self.flow_vol_in[t])
                 
-        self.splitter_disjunction = Disjunction(expr=self.disj_list, xor=True)
\ No newline at end of file
+        self.splitter_disjunction = Disjunction(expr=self.disj_list, xor=True)
+
+    def calculate_scaling_factors(self):
+        '''
+        Set scaling factors for the inlet and outlet streams from the current inlet flow and
+        concentrations. Outlets are scaled by the inlet flow even when they are not chosen, so the
+        near-zero values of the "no flow" constraints do not set their scale.
+        '''
+        for t in self.flowsheet().config.time:
+            flow = value(self.flow_vol_in[t])
+            conc = {j: value(self.conc_mass_in[t, j]) for j in self.config.property_package.component_list}
+            for name in ['in', *self.outlet_list]:
+                scale_stream(self, name, t, flow, conc)
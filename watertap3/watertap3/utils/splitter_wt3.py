@@ -11,9 +11,11 @@
 from idaes.core import (UnitModelBlockData, declare_process_block_class, useDefault)
 from idaes.core.util.config import is_physical_parameter_block
 from pyomo.common.config import ConfigBlock, ConfigValue, In
-from pyomo.environ import Constraint, NonNegativeReals, Var, units as pyunits
+from pyomo.environ import Constraint, NonNegativeReals, Var, units as pyunits, value
 from pyomo.network import Port
 
+from .scaling import scale_stream
+
 module_name = 'splitter_wt3'
 
 __all__ = ['Splitter']
@@ -154,3 +156,14 @@ class SplitterProcessData(UnitModelBlockData):
         for p in outlet_list:
             setattr(self, ('%s_eq_temp' % (p)), Constraint(expr=self.temperature_in[t] == getattr(self, ('temperature_%s' % p))[t]))
             setattr(self, ('%s_eq_pres' % (p)), Constraint(expr=self.pressure_in[t] == getattr(self, ('pressure_%s' % p))[t]))
+
+    def calculate_scaling_factors(self):
+        '''
+        Set scaling factors for the inlet and outlet streams from the current inlet flow and
+        concentrations.
+        '''
+        for t in self.flowsheet().config.time:
+            flow = value(self.flow_vol_in[t])
+            conc = {j: value(self.conc_mass_in[t, j]) for j in self.config.property_package.component_list}
+            for name in ['in', *self.outlet_list]:
+                scale_stream(self, name, t, flow, conc)
@@ -0,0 +1,304 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import weakref
+
+import pandas as pd
+from pyomo.environ import Constraint, Objective, Param, SolverFactory, Var, value
+from pyomo.opt import ReaderFactory, ResultsFormat
+
+from .telemetry import read_ipopt_output, record_solve
+from .watertap import compile_model, solve_model
+
+__all__ = ['SweepSolver']
+
+
+def _signature(m, parameters):
+    '''
+    Everything the NL file depends on apart from the values and bounds of the sweep parameters and
+    the starting point: active constraints and objectives, values of the other fixed variables and
+    of mutable Params, and bounds of the free variables.
+    '''
+    ids = {id(v) for v in parameters}
+    fixed = []
+    bounds = []
+    for v in m.component_data_objects(Var, descend_into=True):
+        if id(v) in ids:
+            continue
+        if v.fixed:
+            fixed.append((id(v), v.value))
+        else:
+            bounds.append((id(v), v.lb, v.ub))
+    params = [(id(p), value(p)) for c in m.component_objects(Param, descend_into=True) if c._mutable
+              for p in c.values()]
+    return (frozenset(ids),
+            tuple(fixed),
+            tuple(bounds),
+            tuple(params),
+            tuple(id(c) for c in m.component_data_objects(Constraint, active=True, descend_into=True)),
+            tuple((id(o), o.sense) for o in m.component_data_objects(Objective, active=True, descend_into=True)))
+
+
+def _segment(lines, key):
+    for i, line in enumerate(lines):
+        if line.startswith(key) and (len(line) == len(key) or not line[len(key)].isalpha()):
+            return i
+    return None
+
+
+def _check_problem(lines, n_vars, x, b, r):
+    '''
+    Check that the NL file has the layout the in-place updates rely on: a header with the number
+    of variables, an optional starting point segment, and a bounds segment with one line per
+    variable (see the NL format: code 0-4 followed by the bounds).
+    '''
+    if x is not None:
+        n_start = int(lines[x][1:].split()[0])
+        if any(len(line.split()) != 2 for line in lines[x + 1:x + n_start + 1]):
+            raise ValueError('Unexpected starting point segment in the NL file.')
+    if b is None or len(lines) < b + n_vars + 1:
+        raise ValueError('No bounds segment for every variable in the NL file.')
+    for line in lines[b + 1:b + n_vars + 1]:
+        parts = line.split()
+        if not parts or parts[0] not in '01234' or len(parts) != {'0': 3, '1': 2, '2': 2, '3': 1, '4': 2}[parts[0]]:
+            raise ValueError(f'Unexpected line {line!r} in the bounds segment of the NL file.')
+    if r is not None and r > b:
+        raise ValueError('Ranges segment after the bounds segment in the NL file.')
+
+
+class SweepSolver():
+    '''
+    Solver for running the same model at many sweep points (sensitivity runs, parameter scans).
+
+    The solver object is created once and reused for every point. With ``persistent=True`` and
+    ``solver='ipopt'``, the problem is written to an NL file once and reused while only the sweep
+    parameters (the variables fixed for the point, see solve) change: they are written as
+    variables whose bounds pin them to their value, so a new point only rewrites their bounds and
+    the starting point in the file before ipopt is run on it. The NL file is written again if
+    anything else it depends on changes (active constraints or objective, other fixed values,
+    bounds, mutable Params). Points that do not solve optimally are re-solved with solve_model and
+    its retries.
+
+    The wall time, termination condition and whether the NL file was reused are recorded in
+    ``timings`` for every solve.
+
+    :param persistent: Reuse the NL file between points (ipopt only)
+    :type persistent: bool
+    :param solver: Solver name
+    :type solver: str
+    :param tolerance: Solver tolerance (ipopt only)
+    :type tolerance: float
+    :param max_attempts: Maximum number of retries per point
+    :type max_attempts: int
+    :param tee: Print solver output
+    :type tee: bool
+    :param timeout: Maximum ipopt run time per point with the stored NL file [s]. A point that
+        takes longer raises instead of falling back to solve_model.
+    :type timeout: float
+    '''
+
+    def __init__(self, persistent=False, solver='ipopt', tolerance=None, max_attempts=3, tee=False, timeout=600):
+        self.solver = solver
+        self.timeout = timeout
+        self.tolerance = tolerance
+        self.max_attempts = max_attempts
+        self.tee = tee
+        self.model_solver = SolverFactory(solver)
+        if tolerance and solver == 'ipopt':
+            self.model_solver.options['tol'] = tolerance
+        self.persistent = persistent and solver == 'ipopt'
+        if self.persistent and not self.model_solver.available(exception_flag=False):
+            print('ipopt executable not found, NL files are written for every point.')
+            self.persistent = False
+        self._problem = None
+        self._dir = None
+        self.timings = []
+
+    def _write_problem(self, m, parameters):
+        '''
+        Write the NL file with the sweep parameters as (pinned) variables.
+        '''
+        if self._dir is None:
+            self._dir = tempfile.mkdtemp(prefix='wt3_sweep_')
+            weakref.finalize(self, shutil.rmtree, self._dir, True)
+        path = os.path.join(self._dir, 'sweep.nl')
+        for v in parameters:
+            v.unfix()
+        try:
+            _, smap_id = m.write(path, format='nl', io_options={'symbolic_solver_labels': False})
+        finally:
+            for v in parameters:
+                v.fix()
+        smap = m.solutions.symbol_map[smap_id]
+        with open(path) as f:
+            lines = f.read().split('\n')
+        n_vars = int(lines[1].split()[0])
+        variables = [smap.getObject(f'v{i}') for i in range(n_vars)]
+        m.solutions.delete_symbol_map(smap_id)
+        x = _segment(lines, 'x')
+        _check_problem(lines, n_vars, x, _segment(lines, 'b'), _segment(lines, 'r'))
+        if x is not None:
+            del lines[x:x + int(lines[x][1:].split()[0]) + 1]
+        b = _segment(lines, 'b')
+        r = _segment(lines, 'r')
+        self._problem = {
+                'path': path,
+                'head': lines[:b],
+                'bounds': lines[b:b + n_vars + 1],
+                'tail': lines[b + n_vars + 1:],
+                'x': r if r is not None and r < b else b,
+                'variables': variables,
+                'pinned': {id(v): i for i, v in enumerate(variables) if id(v) in {id(p) for p in parameters}},
+                'parameters': list(parameters),
+                'signature': _signature(m, parameters)
+                }
+
+    def _update_problem(self):
+        '''
+        Write the current parameter values and starting point into the NL file.
+        '''
+        problem = self._problem
+        bounds = list(problem['bounds'])
+        for v in problem['parameters']:
+            if id(v) in problem['pinned']:
+                bounds[problem['pinned'][id(v)] + 1] = f'4 {v.value!r}'
+        start = [f'{i} {v.value!r}' for i, v in enumerate(problem['variables']) if v.value is not None]
+        head = problem['head']
+        lines = head[:problem['x']] + [f'x{len(start)}'] + start + head[problem['x']:] + bounds + problem['tail']
+        with open(problem['path'], 'w') as f:
+            f.write('\n'.join(lines))
+
+    def _solve_persistent(self, m, parameters, label=None, verbose=True):
+        '''
+        Solve with the stored NL file, writing it first if it cannot be reused.
+
+        :return: Solver results and whether the NL file was reused
+        '''
+        if parameters is None:
+            parameters = [v for v in self._problem['parameters'] if v.fixed] if self._problem else []
+        start = time.perf_counter()
+        reused = self._problem is not None and self._problem['signature'] == _signature(m, parameters)
+        if not reused:
+            self._write_problem(m, parameters)
+        self._update_problem()
+        nl_write_time = time.perf_counter() - start
+
+        problem = self._problem
+        stem = os.path.splitext(problem['path'])[0]
+        output_file = stem + '.out'
+        sol_file = stem + '.sol'
+        # results of the previous point must never be read back for this one
+        for path in [output_file, sol_file]:
+            if os.path.exists(path):
+                os.remove(path)
+        options = dict(self.model_solver.options, output_file=output_file)
+        if getattr(m.fs, 'scaled', False):
+            options['nlp_scaling_method'] = 'user-scaling'
+        start = time.perf_counter()
+        try:
+            process = subprocess.run([self.model_solver.executable(), problem['path'], '-AMPL']
+                                     + [f'{k}={v}' for k, v in options.items()],
+                                     stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True,
+                                     timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            raise TimeoutError(f'ipopt did not finish within {self.timeout} s')
+        if self.tee:
+            print(process.stdout)
+        if process.returncode != 0 or not os.path.exists(sol_file):
+            raise RuntimeError(f'ipopt exited with code {process.returncode} without a solution file:\n'
+                               f'{process.stdout[-2000:]}')
+        with ReaderFactory(ResultsFormat.sol) as reader:
+            results = reader(sol_file)
+        solve_time = time.perf_counter() - start
+        if len(results.solution) > 0:
+            solution = results.solution[0].variable
+            for i, v in enumerate(problem['variables']):
+                if id(v) not in problem['pinned']:
+                    v.value = solution[f'v{i}']['Value']
+        stats = read_ipopt_output(output_file)
+        entry = {
+                'attempt': 0,
+                'solver': 'ipopt (reused NL)' if reused else 'ipopt',
+                'options': {},
+                'reset': None,
+                'termination_condition': str(results.solver.termination_condition),
+                'iterations': stats.get('iterations'),
+                'restorations': stats.get('restorations'),
+                'n_variables': stats.get('n_variables'),
+                'n_equality_constraints': stats.get('n_equality_constraints'),
+                'n_inequality_constraints': stats.get('n_inequality_constraints'),
+                'infeasibility': stats.get('infeasibility'),
+                'nl_write_time': nl_write_time,
+                'ipopt_time': stats.get('ipopt_time'),
+                'solve_time': solve_time
+                }
+        m.fs.solve_log = [entry]
+        record_solve(m, entry, label=label)
+        m.fs.results = results
+        if verbose:
+            print(f'{label}: {entry["termination_condition"]}, '
+                  f'{"reused" if reused else "wrote"} NL file, {solve_time:.2f} s')
+        return results, reused
+
+    def solve(self, m, objective=False, label=None, verbose=True, parameters=None):
+        '''
+        Compile (if needed) and solve a model at the current sweep point.
+
+        :param m: Model
+        :param objective: Attach/activate the LCOW objective
+        :type objective: bool
+        :param label: Label for this point in ``timings`` and the telemetry records (e.g. the sweep name)
+        :param verbose: Print solve progress
+        :type verbose: bool
+        :param parameters: Fixed variables that change between points (persistent mode). Defaults
+            to the parameters of the stored NL file that are fixed.
+        :type parameters: list
+        :return: Solver results
+        '''
+        compile_model(m, objective=objective)
+        start = time.perf_counter()
+        results = None
+        reused = False
+        if self.persistent:
+            try:
+                results, reused = self._solve_persistent(m, parameters, label=label, verbose=verbose)
+            except TimeoutError:
+                self._problem = None
+                raise
+            except Exception as e:
+                print(f'Solve with the stored NL file failed ({e}), using solve_model.')
+                self._problem = None
+            if results is not None and results.solver.termination_condition != 'optimal':
+                results = None
+        if results is None:
+            results = solve_model(m, solver=self.model_solver, tee=self.tee, max_attempts=self.max_attempts,
+                                  verbose=verbose, label=label)
+        self.timings.append({
+                'label': label,
+                'persistent': self.persistent,
+                'reused': reused,
+                'solve_time': time.perf_counter() - start,
+                'termination_condition': str(results.solver.termination_condition)
+                })
+        return results
+
+    def get_timings(self):
+        '''
+        :return: DataFrame with one row per solve
+        '''
+        return pd.DataFrame(self.timings, columns=['label', 'persistent', 'reused', 'solve_time',
+                                                   'termination_condition'])
+
+    def print_timings(self):
+        '''
+        Print number of solves and total/mean wall time per label.
+        '''
+        df = self.get_timings()
+        if df.empty:
+            return
+        summary = df.groupby('label', sort=False).solve_time.agg(['count', 'sum', 'mean'])
+        print('\n========================= SWEEP SOLVE TIMES ==========================')
+        print(summary.to_string(float_format=lambda x: f'{x:.3f}'))
+        print(f'Total: {len(df)} solves, {df.solve_time.sum():.3f} s, NL file reused for {df.reused.sum()}')
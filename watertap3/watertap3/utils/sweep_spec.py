@@ -0,0 +1,439 @@
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from pyomo.environ import Constraint, Var, value
+
+from .parallel_sweep import run_sweep_points
+
+__all__ = ['sensitivity_spec',
+           'tds_sensitivity_spec',
+           'power_sensitivity_spec',
+           'sweep_setups',
+           'load_sweep_spec',
+           'get_component',
+           'expand_sweep_spec',
+           'run_sweep_spec']
+
+_system_outputs = {
+        'lcow': 'fs.costing.LCOW',
+        'water_recovery': 'fs.costing.system_recovery',
+        'elec_lcow': 'fs.costing.elec_frac_LCOW',
+        'elec_int': 'fs.costing.electricity_intensity',
+        'treated_water': 'fs.costing.treated_water'
+        }
+
+_ro_sweep = {
+        'unit_types': ['reverse_osmosis'],
+        'units': ['reverse_osmosis', 'ro_first_pass', 'ro_a1', 'ro_b1', 'ro_active', 'ro_restore', 'ro_first_stage'],
+        'exclude_case_studies': ['cherokee', 'gila_river', 'upw'],
+        'exclude_scenarios': ['edr_ph_ro', 'ro_and_mf'],
+        'outputs': {
+                'ro_pressure': 'fs.{unit}.feed.pressure[0]',
+                'ro_area': 'fs.{unit}.membrane_area[0]',
+                'mem_replacement': 'fs.{unit}.factor_membrane_replacement[0]'
+                }
+        }
+
+_tds_sweep = {
+        'name': 'Inlet TDS +-25%',
+        'sens_var': 'tds_in',
+        'target': 'fs.{source}.conc_mass_in[0,tds]',
+        'mode': 'relative',
+        'range': [0.75, 1.25]
+        }
+
+# Sweeps of run_sensitivity. See expand_sweep_spec for the keys of a sweep.
+sensitivity_spec = {
+        'runs': 20,
+        'outputs': _system_outputs,
+        'sweeps': [
+                {'name': 'Plant Capacity Utilization 70-100%', 'sens_var': 'plant_cap',
+                 'target': 'fs.costing_param.plant_cap_utilization', 'range': [0.7, 1], 'report_scale': 100},
+                {'name': 'Weighted Average Cost of Capital 5-10%', 'sens_var': 'wacc',
+                 'target': 'fs.costing_param.wacc', 'mode': 'offset', 'range': [-0.03, 0.02], 'report_scale': 100},
+                _tds_sweep,
+                {'name': 'Inlet Flow +-25%', 'sens_var': 'flow_in', 'target': 'fs.{source}.flow_vol_in[0]',
+                 'mode': 'relative', 'range': [0.75, 1.25], 'exclude_case_studies': ['cherokee', 'gila_river'],
+                 'exclude_scenarios': ['edr_ph_ro', 'ro_and_mf']},
+                {'name': 'Plant Lifetime 15-45 yrs', 'sens_var': 'plant_life',
+                 'target': 'fs.costing_param.plant_lifetime_yrs', 'range': [15, 45], 'norm': 'difference'},
+                {'name': 'Electricity Price +- 30%', 'sens_var': 'elect_price',
+                 'target': 'fs.costing_param.electricity_price', 'mode': 'relative', 'range': [0.7, 1.3]},
+                {'name': 'Injection Pressure LH 100-2000 ft', 'sens_var': 'dwi_inj_pressure',
+                 'target': 'fs.{unit}.lift_height', 'unit_types': ['deep_well_injection'], 'range': [100, 3500]},
+                dict(_ro_sweep, name='{unit}_membrane_area', target='fs.{unit}.membrane_area', mode='relative',
+                     range=[0.8, 1.2], normalize={'ro_area_norm': 'ro_area'}),
+                dict(_ro_sweep, name='{unit}_pressure', target='fs.{unit}.feed.pressure', mode='relative',
+                     range=[0.85, 1.15], normalize={'ro_press_norm': 'ro_pressure'}),
+                dict(_ro_sweep, name='{unit}_factor_membrane_replacement',
+                     target='fs.{unit}.factor_membrane_replacement', mode='offset', range=[-0.1, 0.3]),
+                {'name': 'Component Replacement Costs -75%', 'sens_var': 'component_replacement',
+                 'target': 'fs.costing_param.maintenance_costs_percent_FCI', 'mode': 'relative', 'range': [0.1, 1]},
+                {'name': 'Alum Dose 0.5-20 mg/L', 'sens_var': 'alum_dose', 'target': 'fs.coag_and_floc.alum_dose',
+                 'range': [0.0005, 0.020], 'case_studies': ['monterey_one']}
+                ]
+        }
+
+# Inlet TDS sweep of run_sensitivity(tds_only=True)
+tds_sensitivity_spec = {
+        'runs': 10,
+        'outputs': {
+                'lcow': 'fs.costing.LCOW',
+                'tci_total': 'fs.costing.capital_investment_total',
+                'op_total': 'fs.costing.operating_cost_total',
+                'op_annual': 'fs.costing.operating_cost_annual',
+                'fixed_op_annual': 'fs.costing.fixed_op_cost_annual',
+                'other_annual': 'fs.costing.other_var_cost_annual',
+                'elect_cost_annual': 'fs.costing.electricity_cost_annual',
+                'elect_intens': 'fs.costing.electricity_intensity',
+                'catchem_annual': 'fs.costing.cat_and_chem_cost_annual'
+                },
+        'sweeps': [
+                dict(_tds_sweep, case_overrides={'cherokee': {'range': [0.8, 1.2]},
+                                                 'gila_river': {'range': [0.8, 1.2]}})
+                ]
+        }
+
+# RO recovery vs. evaporation pond area scans of run_sensitivity_power
+power_sensitivity_spec = {
+        'objective': True,
+        'outputs': {
+                'lcow': 'fs.costing.LCOW',
+                'system_recovery': 'fs.costing.system_recovery',
+                'elec_lcow': 'fs.costing.elec_frac_LCOW',
+                'elec_int': 'fs.costing.electricity_intensity'
+                },
+        'sweeps': [
+                {'name': 'Area', 'sens_var': 'evap_pond_area', 'case_studies': ['cherokee'], 'scenarios': ['zld_ct'],
+                 'units': ['reverse_osmosis_a'], 'setup': 'ro_target_recovery', 'target': 'fs.{unit}.target_recovery',
+                 'values': sorted(list(np.arange(0.45, 0.99, (0.99 - 0.45) / 50)) + [0.95]),
+                 'fix': {'fs.evaporation_pond.water_recovery': 0.892},
+                 'unfix': ['fs.evaporation_pond.area', 'fs.{unit}.feed.pressure', 'fs.{unit}.membrane_area'],
+                 'outputs': {
+                         'evap_pond_area': 'fs.evaporation_pond.area[0]',
+                         'ro_a_pressure': 'fs.{unit}.feed.pressure[0]',
+                         'ro_a_mem_area': 'fs.{unit}.membrane_area[0]',
+                         'ro_a_recovery': 'fs.{unit}.ro_recovery',
+                         'ro_a_elec_int': 'fs.{unit}.electricity',
+                         'ro_a_elect_int_sys_treated': 'fs.{unit}.elec_int_treated'
+                         }},
+                {'name': 'Area', 'sens_var': 'evap_pond_area', 'case_studies': ['gila_river'], 'scenarios': ['baseline'],
+                 'units': ['reverse_osmosis'], 'setup': 'ro_target_recovery',
+                 'target': ['fs.{unit}.target_recovery', 'fs.brine_concentrator.water_recovery'],
+                 'values': list(np.arange(0.45, 0.95, (0.95 - 0.45) / 50)),
+                 'fix': {'fs.evaporation_pond.water_recovery': 0.895},
+                 'unfix': ['fs.evaporation_pond.area', 'fs.{unit}.feed.pressure', 'fs.{unit}.membrane_area'],
+                 'outputs': {
+                         'evap_pond_area': 'fs.evaporation_pond.area[0]',
+                         'ro_pressure': 'fs.{unit}.feed.pressure[0]',
+                         'ro_mem_area': 'fs.{unit}.membrane_area[0]',
+                         'ro_recovery': 'fs.{unit}.ro_recovery'
+                         }}
+                ]
+        }
+
+
+def _ro_target_recovery(m, unit):
+    '''
+    Sweep setup that makes an RO unit's recovery a fixed variable, ``target_recovery``, held by the
+    ``kurby4`` constraint, so every point of a recovery scan only changes its value.
+
+    :return: Function that deactivates the constraint again
+    '''
+    ro = getattr(m.fs, unit)
+    recovery = value(ro.flow_vol_out[0] / ro.flow_vol_in[0])
+    if hasattr(ro, 'kurby4'):
+        ro.target_recovery.fix(recovery)
+        ro.kurby4.activate()
+    else:
+        ro.target_recovery = Var(initialize=recovery)
+        ro.target_recovery.fix()
+        ro.kurby4 = Constraint(expr=ro.flow_vol_out[0] / ro.flow_vol_in[0] == ro.target_recovery)
+    return ro.kurby4.deactivate
+
+
+# Setup hooks a sweep can name in ``setup`` (see expand_sweep_spec): name --> function called with
+# the model and the sweep's {unit} (if any) as keyword argument, returning a function that undoes it.
+sweep_setups = {
+        'ro_target_recovery': _ro_target_recovery
+        }
+
+_path_part = re.compile(r'[^.\[]+(?:\[[^\]]*\])?')
+_path_segment = re.compile(r'^(\w+)(?:\[(.*)\])?$')
+
+
+def load_sweep_spec(path):
+    '''
+    Function to read a sweep spec from a JSON or YAML (.yaml/.yml, needs PyYAML) file.
+    '''
+    with open(path) as f:
+        if os.path.splitext(path)[1].lower() in ['.yaml', '.yml']:
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError('Reading YAML sweep specs needs PyYAML (pip install pyyaml).')
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def _parse_index(index):
+    parts = []
+    for part in index.split(','):
+        part = part.strip().strip('\'"')
+        for cast in (int, float):
+            try:
+                part = cast(part)
+                break
+            except ValueError:
+                pass
+        parts.append(part)
+    return parts[0] if len(parts) == 1 else tuple(parts)
+
+
+def get_component(m, path):
+    '''
+    Function to get a component of a model from its path, e.g. ``'fs.costing_param.wacc'`` or
+    ``'fs.well_water.conc_mass_in[0,tds]'``. Numeric indices are read as numbers, anything else as
+    strings.
+
+    :raises AttributeError: if a block or component on the path does not exist
+    :raises KeyError: if an index does not exist
+    '''
+    c = m
+    for part in _path_part.findall(path):
+        match = _path_segment.match(part)
+        if match is None:
+            raise ValueError(f'Invalid component path {path!r}')
+        c = getattr(c, match.group(1))
+        if match.group(2) is not None:
+            c = c[_parse_index(match.group(2))]
+    return c
+
+
+def _instances(m, sweep):
+    if '{unit}' not in str(sweep['target']):
+        return [{}]
+    unit_types = sweep.get('unit_types')
+    units = sweep.get('units')
+    return [{'unit': key} for key in m.fs.pfd_dict
+            if (unit_types is None or m.fs.pfd_dict[key]['Unit'] in unit_types)
+            and (units is None or key in units)]
+
+
+def _targets(m, target, fmt):
+    if isinstance(target, list):
+        return [c for t in target for c in _targets(m, t, fmt)]
+    if '{source}' not in target:
+        return [get_component(m, target.format(**fmt))]
+    targets = []
+    for source in m.fs.flow_in_dict:
+        try:
+            targets.append(get_component(m, target.format(source=source, **fmt)))
+        except (AttributeError, KeyError):
+            pass
+    return targets
+
+
+def _first(c):
+    return next(iter(c.values())) if c.is_indexed() else c
+
+
+def _components(c):
+    return list(c.values()) if c.is_indexed() else [c]
+
+
+def _set_up(m, sweep, fmt):
+    '''
+    Apply a sweep's ``setup`` hook, ``fix`` and ``unfix``, and return a function that undoes them.
+    '''
+    undo = []
+    if 'setup' in sweep:
+        setup = sweep['setup']
+        undo.append((sweep_setups[setup] if isinstance(setup, str) else setup)(m, **fmt))
+    changes = list(sweep.get('fix', {}).items()) + [(path, None) for path in sweep.get('unfix', [])]
+    stash = []
+    for path, val in changes:
+        for v in _components(get_component(m, path.format(**fmt))):
+            stash.append((v, v.value, v.fixed))
+            if val is None:
+                v.unfix()
+            else:
+                v.fix(val)
+
+    def restore():
+        for v, val, fixed in reversed(stash):
+            v.value = val
+            if fixed:
+                v.fix()
+            else:
+                v.unfix()
+        for f in reversed(undo):
+            if f is not None:
+                f()
+    return restore
+
+
+def _sweeps(m, spec):
+    '''
+    Yield every sweep of a spec that applies to the model (case overrides applied), once per
+    ``{unit}`` instance, with the instance's format arguments.
+    '''
+    case_study = m.fs.train['case_study']
+    scenario = m.fs.train['scenario']
+    for sweep in spec['sweeps']:
+        sweep = dict(sweep, **sweep.get('case_overrides', {}).get(case_study, {}))
+        if 'case_studies' in sweep and case_study not in sweep['case_studies']:
+            continue
+        if 'scenarios' in sweep and scenario not in sweep['scenarios']:
+            continue
+        if case_study in sweep.get('exclude_case_studies', []) or scenario in sweep.get('exclude_scenarios', []):
+            continue
+        for fmt in _instances(m, sweep):
+            yield sweep, fmt
+
+
+def _points(m, spec, sweep, fmt):
+    mode = sweep.get('mode', 'absolute')
+    if 'values' in sweep:
+        steps = list(sweep['values'])
+    else:
+        lb, ub = sweep['range']
+        step = (ub - lb) / sweep.get('runs', spec.get('runs', 20))
+        steps = np.arange(lb, ub + step, step)
+    targets = _targets(m, sweep['target'], fmt)
+    if not targets:
+        return []
+    base = [value(_first(t)) for t in targets]
+    name = sweep['name'].format(**fmt)
+    outputs = {k: get_component(m, path.format(**fmt)) for k, path in sweep.get('outputs', {}).items()}
+    points = []
+    for i in steps:
+        if mode == 'relative':
+            values = [b * i for b in base]
+        elif mode == 'offset':
+            values = [b + i for b in base]
+        else:
+            values = [i] * len(targets)
+        reported = i if mode == 'absolute' else sum(values)
+        baseline = sum(base) / len(base) if mode == 'absolute' else sum(base)
+        points.append({
+                'label': name,
+                'fix': list(zip(targets, values)),
+                'outputs': outputs,
+                'sweep': name,
+                'sens_var': sweep.get('sens_var', name).format(**fmt),
+                'scenario_value': reported * sweep.get('report_scale', 1),
+                'baseline_sens_value': baseline,
+                'sensitivity_var_norm': reported - baseline if sweep.get('norm') == 'difference'
+                else reported / baseline,
+                'normalize': sweep.get('normalize', {})
+                })
+    return points
+
+
+def _needs_setup(sweep):
+    return any(k in sweep for k in ['setup', 'fix', 'unfix'])
+
+
+def expand_sweep_spec(m, spec):
+    '''
+    Function to list the points of every sweep in a spec that applies to a model.
+
+    A spec is a dictionary with ``sweeps`` (list), ``outputs`` (output names and component paths
+    read at every point), ``runs`` (default number of steps per sweep) and optionally
+    ``objective`` (solve with the LCOW objective, default False). Each sweep has:
+
+    * ``name`` and ``sens_var``: labels for the results (``sens_var`` defaults to ``name``)
+    * ``target``: path of the variable to fix (see get_component), or a list of paths all set to
+      the same value. ``{source}`` in the path stands for every water source of the train, all
+      set at once; sources without the component are skipped. ``{unit}`` stands for each unit
+      process in turn (one sweep per unit, filtered by ``unit_types`` and ``units``) and can also
+      be used in ``name``, ``outputs``, ``fix`` and ``unfix``.
+    * ``range`` ([lower, upper], split into ``runs`` steps with both ends included) or ``values``
+    * ``mode``: ``'absolute'`` (default, the target is set to each value), ``'relative'`` (each
+      value multiplies the target's current value) or ``'offset'`` (each value is added to it)
+    * optional ``outputs`` read for this sweep only, ``normalize`` (new output name --> output
+      divided by the baseline value), ``norm`` (``'ratio'``, the default, or ``'difference'``
+      between value and baseline), ``report_scale`` (factor for the reported value), ``runs``
+    * optional filters ``case_studies``, ``scenarios``, ``exclude_case_studies``,
+      ``exclude_scenarios`` and ``case_overrides`` (case study --> keys that replace the sweep's
+      keys for that case study)
+    * optional model changes made for the sweep only: ``setup`` (name in sweep_setups, or a
+      function, see sweep_setups), ``fix`` (paths --> values) and ``unfix`` (list of paths).
+      run_sweep_spec applies them before listing the sweep's points and undoes them afterwards;
+      when calling expand_sweep_spec directly the model must already have them.
+
+    The reported value of a point is the value set, or for relative and offset sweeps the sum of
+    the values set over every target; the baseline is the current value (summed the same way).
+
+    :return: List of sweep points for parallel_sweep.run_sweep_points, with ``sweep``,
+        ``sens_var``, ``scenario_value``, ``baseline_sens_value``, ``sensitivity_var_norm`` and
+        ``normalize`` added
+    '''
+    return [point for sweep, fmt in _sweeps(m, spec) for point in _points(m, spec, sweep, fmt)]
+
+
+def run_sweep_spec(m, spec, workers=1, sweep=None, verbose=True, continuation=False, chained=False):
+    '''
+    Function to run every sweep in a spec (see expand_sweep_spec) on a model with
+    parallel_sweep.run_sweep_points.
+
+    Sweeps with a ``setup``, ``fix`` or ``unfix`` are run on their own, with those changes made
+    to m for the sweep and undone afterwards, and always in this process: worker processes build
+    their own copy of the model, which does not have them. The other sweeps are run together.
+    If no sweep applies to the model, an empty DataFrame is returned without looking up the
+    spec's outputs, which may not exist on every train.
+
+    :param m: Model returned by run_watertap3
+    :param spec: Sweep spec, or path of a JSON/YAML file with one
+    :param workers: See run_sweep_points
+    :type workers: int
+    :param sweep: SweepSolver to use for workers=1
+    :param verbose: Print solve progress
+    :type verbose: bool
+    :param continuation: Solve each sweep by continuation (see run_sweep_points)
+    :type continuation: bool
+    :param chained: Start each point from the previous point's solution (see run_sweep_points)
+    :type chained: bool
+    :return: DataFrame with one row per point: sweep, sens_var, scenario_value,
+        baseline_sens_value, sensitivity_var_norm, the outputs, termination_condition and error
+    '''
+    if isinstance(spec, str):
+        spec = load_sweep_spec(spec)
+    sweeps = list(_sweeps(m, spec))
+    if not sweeps:
+        return pd.DataFrame()
+    outputs = {k: get_component(m, path) for k, path in spec.get('outputs', {}).items()}
+    rows = []
+
+    def run(points, workers):
+        if not points:
+            return
+        results = run_sweep_points(m, points, outputs, workers=workers, sweep=sweep, verbose=verbose,
+                                   objective=spec.get('objective', False), continuation=continuation,
+                                   chained=chained)
+        for point, result in zip(points, results):
+            row = {k: point[k] for k in ['sweep', 'sens_var', 'scenario_value', 'baseline_sens_value',
+                                         'sensitivity_var_norm']}
+            row.update(result)
+            for k, output in point['normalize'].items():
+                row[k] = None if row.get(output) is None else row[output] / point['baseline_sens_value']
+            rows.append(row)
+
+    points = []
+    for spec_sweep, fmt in sweeps:
+        if not _needs_setup(spec_sweep):
+            points.extend(_points(m, spec, spec_sweep, fmt))
+            continue
+        run(points, workers)
+        points = []
+        restore = _set_up(m, spec_sweep, fmt)
+        try:
+            run(_points(m, spec, spec_sweep, fmt), 1)
+        finally:
+            restore()
+    run(points, workers)
+    return pd.DataFrame(rows)
@@ -0,0 +1,205 @@
+import contextlib
+import datetime
+import io
+import json
+import os
+import re
+import sys
+
+import pandas as pd
+
+__all__ = ['record_solve',
+           'collect_records',
+           'get_records',
+           'save_records',
+           'clear_records']
+
+# JSONL file every record is appended to. None keeps records in memory only.
+telemetry_file = None
+
+# Keep records in memory (see get_records). Turn off to only write them to telemetry_file.
+keep_records = True
+
+# With telemetry_file set, only the last max_records records are kept in memory; the file has all
+# of them. None keeps every record.
+max_records = 10000
+
+_records = []
+_collectors = []
+
+_ipopt_patterns = {
+        'n_variables': (re.compile(r'^Number of variables\.+:\s*(\d+)'), int),
+        'n_equality_constraints': (re.compile(r'^Total number of equality constraints\.+:\s*(\d+)'), int),
+        'n_inequality_constraints': (re.compile(r'^Total number of inequality constraints\.+:\s*(\d+)'), int),
+        'iterations': (re.compile(r'^Number of Iterations\.+:\s*(\d+)'), int),
+        'infeasibility': (re.compile(r'^Constraint violation\.+:\s*\S+\s+(\S+)'), float),
+        'ipopt_time': (re.compile(r'^Total (?:CPU )?sec(?:ond)?s in IPOPT[^=]*=\s*(\S+)'), float)
+        }
+_iteration_line = re.compile(r'^\s*\d+(r?)\s+-?\d\.\d+e[-+]\d+')
+_presolve_time = re.compile(r'([\d.]+) seconds required for presolve')
+
+
+class _Tee():
+    '''
+    Write to several streams at once (used to keep solver output on screen while capturing it).
+    '''
+
+    def __init__(self, *streams):
+        self.streams = streams
+
+    def write(self, s):
+        for stream in self.streams:
+            stream.write(s)
+
+    def flush(self):
+        for stream in self.streams:
+            stream.flush()
+
+
+def read_ipopt_output(output_file):
+    '''
+    Function to read problem size, iteration and restoration counts, final (unscaled) constraint
+    violation and time spent in ipopt from an ipopt output file (output_file option). Values that
+    are not in the file are None.
+
+    :param output_file: Path of the ipopt output file
+    :type output_file: str
+    :return: Dictionary
+    '''
+    stats = {k: None for k in _ipopt_patterns}
+    stats['restorations'] = None
+    try:
+        with open(output_file) as f:
+            lines = f.readlines()
+    except OSError:
+        return stats
+    restorations = 0
+    in_restoration = False
+    for line in lines:
+        match = _iteration_line.match(line)
+        if match:
+            is_restoration = bool(match.group(1))
+            if is_restoration and not in_restoration:
+                restorations += 1
+            in_restoration = is_restoration
+            continue
+        for k, (pattern, cast) in _ipopt_patterns.items():
+            match = pattern.match(line)
+            if match:
+                try:
+                    stats[k] = cast(match.group(1))
+                except ValueError:
+                    pass
+    stats['restorations'] = restorations
+    return stats
+
+
+@contextlib.contextmanager
+def capture_output(tee=False):
+    '''
+    Context manager that captures everything printed to stdout in a StringIO, which it yields.
+    With tee=True the output is printed as well.
+    '''
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(_Tee(sys.stdout, buffer) if tee else buffer):
+        yield buffer
+
+
+def read_presolve_time(solver_output):
+    '''
+    Function to read the presolve time (writing the NL file) from solver output printed with
+    report_timing=True.
+
+    :param solver_output: Captured solver output
+    :type solver_output: str
+    :return: Presolve time [s] or None
+    '''
+    match = _presolve_time.search(solver_output)
+    return float(match.group(1)) if match else None
+
+
+def record_solve(m, entry, label=None):
+    '''
+    Function to store a telemetry record for one solver call. The record is entry (see
+    watertap.solve_model) plus the case study, scenario, label and a timestamp. Records are kept
+    in memory (if keep_records is set, and only the last max_records of them when telemetry_file
+    is set) and, if telemetry_file is set, appended to it as one JSON line. Records are also
+    passed to every open collect_records.
+
+    :param m: Model that was solved
+    :param entry: Solve log entry
+    :type entry: dict
+    :param label: Label for the solve (e.g. a sweep point)
+    :return: Record
+    '''
+    train = getattr(m.fs, 'train', {})
+    record = {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'case_study': train.get('case_study'),
+            'scenario': train.get('scenario'),
+            'label': label
+            }
+    record.update(entry)
+    store = True
+    for records, collector_store in _collectors:
+        records.append(record)
+        store = store and collector_store
+    if not store:
+        return record
+    if keep_records:
+        _records.append(record)
+        if telemetry_file is not None and max_records is not None and len(_records) > max_records:
+            del _records[:len(_records) - max_records]
+    if telemetry_file is not None:
+        with open(telemetry_file, 'a') as f:
+            f.write(json.dumps(record, default=str) + '\n')
+    return record
+
+
+@contextlib.contextmanager
+def collect_records(store=True):
+    '''
+    Context manager that yields a list receiving every record made inside it, whatever
+    keep_records and max_records are set to. With store=False these records are not kept in memory
+    or written to telemetry_file.
+    '''
+    records = []
+    _collectors.append((records, store))
+    try:
+        yield records
+    finally:
+        _collectors.pop()
+
+
+def get_records():
+    '''
+    :return: DataFrame with one row per telemetry record
+    '''
+    return pd.DataFrame(_records)
+
+
+def save_records(path):
+    '''
+    Function to write the telemetry records held in memory to a file. Files ending in .parquet are
+    written as Parquet (needs pyarrow or fastparquet), .csv as CSV and anything else as JSONL.
+
+    :param path: Output file
+    :type path: str
+    '''
+    df = get_records()
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.parquet':
+        if 'options' in df:
+            df = df.assign(options=df.options.astype(str))
+        df.to_parquet(path, index=False)
+    elif ext == '.csv':
+        df.to_csv(path, index=False)
+    else:
+        df.to_json(path, orient='records', lines=True, default_handler=str)
+
+
+def clear_records():
+    '''
+    Function to drop every telemetry record held in memory.
+    '''
+    _records.clear()
@@ -0,0 +1,204 @@
+import ast
+import copy
+import os
+import pickle
+
+import numpy as np
+
+from .data_catalog import file_hash, get_derived, get_table
+
+__all__ = ['TrainSpec',
+           'compile_train',
+           'get_train_spec',
+           'clear_train_specs']
+
+train_setup_file = 'treatment_train_setup.csv'
+train_columns = ['CaseStudy', 'Reference', 'Scenario', 'Unit', 'Type', 'UnitName', 'ToUnitName',
+                 'FromPort', 'Parameter']
+valid_ports = ['outlet', 'waste']
+
+# Directory for compiled specs on disk. None keeps the cache in memory only.
+spec_cache_dir = None
+
+# Number of specs compiled by compile_train kept in memory (least recently used are dropped)
+max_compiled = 64
+
+_compiled = {}
+
+
+class TrainSpec():
+    '''
+    Compiled treatment train.
+
+    Holds everything WaterTAP3 needs from the treatment train input sheet for one train, parsed and
+    checked once:
+
+        * ``df_units``: rows of the input sheet for the train (shared, do not modify)
+        * ``pfd_dict``: unit name --> row dictionary with ``Parameter`` parsed to a dict and
+          ``ToUnitName``/``FromPort`` split into lists for units with more than one outlet
+        * ``units``: unit names in input sheet order
+        * ``edges``: list of (from unit, from port, to unit)
+        * ``water_types``: water types fed by the intakes, in input sheet order
+    '''
+
+    def __init__(self, df_units, pfd_dict, edges, water_types):
+        self.df_units = df_units
+        self.pfd_dict = pfd_dict
+        self.units = list(pfd_dict.keys())
+        self.edges = edges
+        self.water_types = water_types
+
+    @property
+    def key(self):
+        '''
+        Content of the train rows, usable as a cache key: specs compiled from the same rows have
+        the same key.
+        '''
+        if getattr(self, '_key', None) is None:
+            self._key = _rows_key(self.df_units)
+        return self._key
+
+    def get_pfd_dict(self):
+        '''
+        Return a copy of ``pfd_dict`` that the caller is free to modify.
+        '''
+        return copy.deepcopy(self.pfd_dict)
+
+
+def _is_nan(x):
+    return isinstance(x, float) and np.isnan(x)
+
+
+def _restore_nan(pfd_dict):
+    '''
+    Unpickling creates new float NaN objects, but the flowsheet code checks for missing values with
+    ``is np.nan``.
+    '''
+    for row in pfd_dict.values():
+        for k, v in row.items():
+            if _is_nan(v):
+                row[k] = np.nan
+    return pfd_dict
+
+
+def _rows_key(df_units):
+    cols = [c for c in train_columns if c in df_units.columns]
+    return tuple(tuple(None if _is_nan(v) else v for v in row) for row in df_units[cols].itertuples(index=False))
+
+
+def _compile(df_units, check_refs=True):
+    unit_names = list(df_units.UnitName)
+    dups = sorted(set(u for u in unit_names if unit_names.count(u) > 1))
+    if dups:
+        raise ValueError(f'Treatment train has duplicate unit names: {dups}')
+
+    pfd_dict = df_units.set_index('UnitName').T.to_dict()
+    edges = []
+    water_types = []
+    for key, row in pfd_dict.items():
+        params = row['Parameter']
+        if params is not np.nan:
+            try:
+                params = ast.literal_eval(params)
+            except (ValueError, SyntaxError) as e:
+                raise ValueError(f'Parameter for unit {key} could not be parsed: {row["Parameter"]!r}') from e
+            if not isinstance(params, dict):
+                raise ValueError(f'Parameter for unit {key} must be a dictionary: {row["Parameter"]!r}')
+            row['Parameter'] = params
+
+        to_units, from_ports = row['ToUnitName'], row['FromPort']
+        if (to_units is np.nan) != (from_ports is np.nan):
+            raise ValueError(f'Unit {key} must have both ToUnitName and FromPort or neither.')
+        if to_units is not np.nan:
+            to_list, port_list = to_units.split(','), from_ports.split(',')
+            if len(to_list) != len(port_list):
+                raise ValueError(f'Unit {key} has {len(to_list)} ToUnitName entries but {len(port_list)} FromPort entries.')
+            for to_unit, port in zip(to_list, port_list):
+                if check_refs and to_unit not in pfd_dict:
+                    raise ValueError(f'Unit {key} connects to {to_unit}, which is not in the treatment train.')
+                if port not in valid_ports:
+                    raise ValueError(f'Unit {key} has invalid FromPort {port!r}. Must be one of {valid_ports}.')
+                edges.append((key, port, to_unit))
+            if len(to_list) > 1:
+                row['ToUnitName'] = to_list
+                row['FromPort'] = port_list
+
+        if row['Type'] == 'intake':
+            if not isinstance(row['Parameter'], dict) or 'water_type' not in row['Parameter']:
+                raise ValueError(f'Intake {key} must have a water_type in Parameter.')
+            water_types += list(row['Parameter']['water_type'])
+
+    return TrainSpec(df_units, pfd_dict, edges, water_types)
+
+
+def compile_train(df_units, check_refs=True):
+    '''
+    Function to compile treatment train rows from the input sheet into a TrainSpec. Compiled specs
+    are cached by row content, so compiling the same rows again is a dictionary lookup. Only the
+    ``max_compiled`` most recently used specs are kept.
+
+    :param df_units: Treatment train rows from the input sheet
+    :type df_units: DataFrame
+    :param check_refs: Raise if a unit connects to a unit that is not in ``df_units``. Turn off
+        for partial trains (e.g. while ``make_decision`` is pruning a train).
+    :type check_refs: bool
+    :return: TrainSpec
+    '''
+    key = (_rows_key(df_units), check_refs)
+    spec = _compiled.pop(key, None)
+    if spec is None:
+        spec = _compile(df_units, check_refs=check_refs)
+    _compiled[key] = spec
+    while len(_compiled) > max_compiled:
+        del _compiled[next(iter(_compiled))]
+    return spec
+
+
+def get_train_spec(reference, case_study, scenario, cache_dir=None):
+    '''
+    Function to get the compiled spec for a treatment train in treatment_train_setup.csv. The spec
+    is kept in memory until the input sheet changes. If ``cache_dir`` (or the module level
+    ``spec_cache_dir``) is set, compiled specs are also saved there, keyed by the hash of the input
+    sheet, and reused by later processes.
+
+    :param reference: Reference name (e.g. ``'nawi'``)
+    :type reference: str
+    :param case_study: Case study name
+    :type case_study: str
+    :param scenario: Scenario name
+    :type scenario: str
+    :param cache_dir: Directory for compiled specs on disk
+    :type cache_dir: str
+    :return: TrainSpec
+    '''
+    if cache_dir is None:
+        cache_dir = spec_cache_dir
+
+    def build():
+        if cache_dir is not None:
+            path = os.path.join(cache_dir, f'train_spec_{file_hash(train_setup_file)}_{reference}_{case_study}_{scenario}.pkl')
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    spec = pickle.load(f)
+                _restore_nan(spec.pfd_dict)
+                return spec
+        df = get_table(train_setup_file)
+        df_units = df[((df.Reference == reference) & (df.Scenario == scenario) & (df.CaseStudy == case_study))]
+        if df_units.empty:
+            raise ValueError(f'No treatment train for reference {reference}, case study {case_study}, '
+                             f'scenario {scenario} in {train_setup_file}')
+        spec = _compile(df_units)
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(path, 'wb') as f:
+                pickle.dump(spec, f)
+        return spec
+
+    return get_derived('train_spec', build, tables=(train_setup_file,), key=(reference, case_study, scenario))
+
+
+def clear_train_specs():
+    '''
+    Function to drop compiled treatment train specs held in memory.
+    '''
+    _compiled.clear()
@@ -0,0 +1,229 @@
+import numpy as np
+import pandas as pd
+from pyomo.core.expr.numeric_expr import LinearExpression, UnaryFunctionExpression
+from pyomo.core.expr.numvalue import native_numeric_types
+from pyomo.core.expr.visitor import identify_variables
+from pyomo.environ import Constraint, value
+
+from .parallel_sweep import run_sweep_points
+from .sweep_spec import get_component
+
+__all__ = ['unit_uncertainty_factors',
+           'system_uncertainty_factors',
+           'sample_inputs',
+           'get_uncertainty_targets',
+           'evaluate_costing',
+           'summarize_uncertainty',
+           'run_uncertainty']
+
+# Unit (costing block of every unit process) and system uncertainty factors, e.g.
+# {'tci': {'target': unit_uncertainty_factors['tci'], 'dist': 'triangular', 'low': 0.7, 'mode': 1, 'high': 1.5}}
+unit_uncertainty_factors = {
+        'tci': 'fs.{unit}.costing.tci_uncertainty',
+        'fci': 'fs.{unit}.costing.fci_uncertainty',
+        'fixed_op': 'fs.{unit}.costing.fixed_op_uncertainty',
+        'annual_op': 'fs.{unit}.costing.annual_op_uncertainty',
+        'total_op': 'fs.{unit}.costing.total_op_uncertainty',
+        'catchem': 'fs.{unit}.costing.catchem_uncertainty',
+        'elect_intens': 'fs.{unit}.costing.elect_intens_uncertainty',
+        'elect_cost': 'fs.{unit}.costing.elect_cost_uncertainty',
+        'other': 'fs.{unit}.costing.other_uncertainty'
+        }
+
+system_uncertainty_factors = {
+        'sys_tci': 'fs.costing.sys_tci_uncertainty',
+        'sys_catchem': 'fs.costing.sys_catchem_uncertainty',
+        'sys_elect': 'fs.costing.sys_elect_uncertainty',
+        'sys_other': 'fs.costing.sys_other_uncertainty',
+        'sys_fixed_op': 'fs.costing.sys_fixed_op_uncertainty',
+        'sys_total_op': 'fs.costing.sys_total_op_uncertainty'
+        }
+
+
+def _distribution(spec):
+    from scipy import stats
+    dist = spec.get('dist', 'uniform')
+    if dist == 'uniform':
+        return stats.uniform(loc=spec['low'], scale=spec['high'] - spec['low'])
+    if dist == 'triangular':
+        width = spec['high'] - spec['low']
+        return stats.triang((spec['mode'] - spec['low']) / width, loc=spec['low'], scale=width)
+    if dist == 'normal':
+        return stats.norm(loc=spec['mean'], scale=spec['std'])
+    if dist == 'lognormal':
+        return stats.lognorm(spec['sigma'], scale=np.exp(spec['mu']))
+    raise ValueError(f'Unknown distribution {dist!r}: use uniform, triangular, normal or lognormal.')
+
+
+def sample_inputs(distributions, n, method='lhs', seed=None):
+    '''
+    Function to draw samples of uncertain inputs.
+
+    Each distribution is a dictionary with ``dist`` and its parameters: ``'uniform'`` (low, high),
+    ``'triangular'`` (low, mode, high), ``'normal'`` (mean, std) or ``'lognormal'`` (mu, sigma of
+    the log of the input).
+
+    :param distributions: Input names and distributions
+    :type distributions: dict
+    :param n: Number of samples
+    :type n: int
+    :param method: ``'lhs'`` (Latin hypercube: one sample in each of n equal-probability strata of
+        every input, strata paired at random) or ``'random'`` (plain Monte Carlo)
+    :type method: str
+    :param seed: Seed of the random number generator
+    :return: DataFrame with one column per input and one row per sample
+    '''
+    rng = np.random.default_rng(seed)
+    samples = {}
+    for name, spec in distributions.items():
+        if method == 'lhs':
+            u = (rng.permutation(n) + rng.random(n)) / n
+        elif method == 'random':
+            u = rng.random(n)
+        else:
+            raise ValueError(f'Unknown sampling method {method!r}: use lhs or random.')
+        samples[name] = _distribution(spec).ppf(u)
+    return pd.DataFrame(samples)
+
+
+def get_uncertainty_targets(m, distributions):
+    '''
+    Function to find the variables each uncertain input sets. ``target`` is a component path (see
+    sweep_spec.get_component); ``{unit}`` in the path stands for every unit process with costing
+    (filtered by ``unit_types`` if given). With ``per_unit=True`` each unit gets its own input,
+    named ``<name>[<unit>]``, drawn from the same distribution; otherwise one draw sets every unit.
+    Indexed variables are set at every index.
+
+    :return: Dictionary of input names and distributions, and dictionary of input names and lists
+        of variables
+    '''
+    inputs = {}
+    targets = {}
+    for name, spec in distributions.items():
+        if '{unit}' not in spec['target']:
+            inputs[name] = spec
+            targets[name] = [get_component(m, spec['target'])]
+            continue
+        unit_types = spec.get('unit_types')
+        units = [key for key in m.fs.pfd_dict if hasattr(getattr(m.fs, key), 'costing')
+                 and (unit_types is None or m.fs.pfd_dict[key]['Unit'] in unit_types)]
+        for unit in units:
+            key = f'{name}[{unit}]' if spec.get('per_unit', False) else name
+            inputs[key] = spec
+            targets.setdefault(key, []).append(get_component(m, spec['target'].format(unit=unit)))
+    for name, components in targets.items():
+        targets[name] = [v for c in components for v in (c.values() if c.is_indexed() else [c])]
+    return inputs, targets
+
+
+def _evaluate(expr, values, cache):
+    if type(expr) in native_numeric_types:
+        return expr
+    if not expr.is_expression_type():
+        return values[id(expr)] if id(expr) in values else value(expr)
+    if id(expr) in cache:
+        return cache[id(expr)]
+    if isinstance(expr, LinearExpression) and hasattr(expr, 'linear_vars'):
+        result = _evaluate(expr.constant, values, cache) + sum(
+                _evaluate(coef, values, cache) * _evaluate(v, values, cache)
+                for coef, v in zip(expr.linear_coefs, expr.linear_vars))
+    elif isinstance(expr, UnaryFunctionExpression):
+        result = getattr(np, expr.getname())(_evaluate(expr.args[0], values, cache))
+    else:
+        result = expr._apply_operation([_evaluate(arg, values, cache) for arg in expr.args])
+    cache[id(expr)] = result
+    return result
+
+
+def evaluate_costing(outputs, samples, targets):
+    '''
+    Function to evaluate costing outputs for every sample at once, without solving: variables set
+    by the samples are replaced by arrays of their sampled values and every other variable keeps
+    its current value. Only valid if the sampled variables do not appear in any active constraint
+    (see run_uncertainty).
+
+    :param outputs: Output names and components (e.g. m.fs.costing.LCOW)
+    :type outputs: dict
+    :param samples: Samples (see sample_inputs)
+    :param targets: Input names and variables (see get_uncertainty_targets)
+    :return: DataFrame with one column per output and one row per sample
+    '''
+    values = {}
+    for name, variables in targets.items():
+        for v in variables:
+            values[id(v)] = samples[name].to_numpy()
+    cache = {}
+    n = len(samples)
+    return pd.DataFrame({k: np.broadcast_to(_evaluate(c, values, cache), (n,)) for k, c in outputs.items()},
+                        index=samples.index)
+
+
+def _in_constraints(m, targets):
+    ids = {id(v) for variables in targets.values() for v in variables}
+    for c in m.component_data_objects(Constraint, active=True, descend_into=True):
+        if any(id(v) in ids for v in identify_variables(c.body, include_fixed=True)):
+            return True
+    return False
+
+
+def summarize_uncertainty(results, outputs=None, percentiles=(5, 50, 95)):
+    '''
+    :param results: Samples and outputs (see run_uncertainty)
+    :param outputs: Output columns to summarize. Defaults to ``['LCOW']``.
+    :param percentiles: Percentiles to report
+    :return: DataFrame with mean, std, min, max and percentiles (``p5`` etc.) of each output
+    '''
+    rows = {}
+    for k in outputs or ['LCOW']:
+        x = results[k].astype(float).dropna().to_numpy()
+        row = {'samples': len(x), 'mean': x.mean(), 'std': x.std(ddof=1), 'min': x.min(), 'max': x.max()}
+        for p, q in zip(percentiles, np.percentile(x, percentiles)):
+            row[f'p{p:g}'] = q
+        rows[k] = row
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def run_uncertainty(m, distributions, n=1000, method='lhs', seed=None, outputs=None, resolve=None, workers=1,
+                    percentiles=(5, 50, 95)):
+    '''
+    Function to propagate uncertain inputs (the ``*_uncertainty`` costing factors, see
+    unit_uncertainty_factors and system_uncertainty_factors, or any other input) to LCOW.
+
+    Samples are drawn with sample_inputs. If none of the sampled variables appears in an active
+    constraint, the outputs only depend on them through the costing expressions and all samples
+    are evaluated at once with evaluate_costing, at the current solution. Otherwise (or with
+    resolve=True) the model is solved for each sample with parallel_sweep.run_sweep_points, in
+    ``workers`` processes.
+
+    :param m: Solved model (e.g. returned by run_watertap3)
+    :param distributions: Input names and distributions, each with a ``target`` (see
+        get_uncertainty_targets and sample_inputs)
+    :type distributions: dict
+    :param n: Number of samples
+    :type n: int
+    :param method: ``'lhs'`` or ``'random'``
+    :param seed: Seed of the random number generator
+    :param outputs: Output names and component paths. Defaults to LCOW.
+    :type outputs: dict
+    :param resolve: Solve the model for every sample. Defaults to only when needed.
+    :type resolve: bool
+    :param workers: Processes for re-solving (see run_sweep_points)
+    :type workers: int
+    :param percentiles: Percentiles to report
+    :return: DataFrame of samples and outputs (one row per sample, with termination_condition if
+        re-solved) and summary DataFrame (see summarize_uncertainty)
+    '''
+    outputs = {k: get_component(m, path) for k, path in (outputs or {'LCOW': 'fs.costing.LCOW'}).items()}
+    inputs, targets = get_uncertainty_targets(m, distributions)
+    samples = sample_inputs(inputs, n, method=method, seed=seed)
+    if resolve is None:
+        resolve = _in_constraints(m, targets)
+    if not resolve:
+        results = pd.concat([samples, evaluate_costing(outputs, samples, targets)], axis=1)
+    else:
+        points = [{'label': 'uncertainty',
+                   'fix': [(v, sample[name]) for name, variables in targets.items() for v in variables]}
+                  for sample in samples.to_dict('records')]
+        solved = run_sweep_points(m, points, outputs, workers=workers, verbose=False)
+        results = pd.concat([samples, pd.DataFrame(solved, index=samples.index)], axis=1)
+    return results, summarize_uncertainty(results, outputs=list(outputs), percentiles=percentiles)
@@ -0,0 +1,227 @@
+import hashlib
+import json
+import os
+
+from pyomo.environ import Constraint, Suffix, Var
+
+from .train_spec import _rows_key
+
+__all__ = ['get_solution_key',
+           'save_solution',
+           'load_solution',
+           'find_solution',
+           'clear_warm_starts']
+
+# Directory for stored solutions. None keeps the store in memory only.
+warm_start_dir = None
+# Number of stored solutions kept, in memory and in warm_start_dir; the least recently used are
+# dropped first.
+max_solutions = 64
+
+_solutions = {}
+_loaded_dirs = set()
+
+
+def _hash(x):
+    return hashlib.sha1(repr(x).encode()).hexdigest()[:12]
+
+
+def get_solution_key(m):
+    '''
+    Key of the train a model was built for: case study, scenario, hash of the treatment train rows
+    and the source water (sources and inlet flows).
+    '''
+    source = dict(m.fs.source_water, flows={k: float(v) for k, v in m.fs.flow_in_dict.items()})
+    return {
+            'case_study': m.fs.train['case_study'],
+            'reference': m.fs.train['reference'],
+            'scenario': m.fs.train['scenario'],
+            'units_hash': _hash(_rows_key(m.fs.df_units)),
+            'source_hash': _hash(json.dumps(source, sort_keys=True))
+            }
+
+
+def _file_name(key):
+    return f'{key["case_study"]}_{key["scenario"]}_{key["units_hash"]}_{key["source_hash"]}.json'
+
+
+def _stored_files(path):
+    '''
+    Solution files in path, least recently used first.
+    '''
+    if not os.path.isdir(path):
+        return []
+    files = [os.path.join(path, f) for f in os.listdir(path) if f.endswith('.json')]
+    return sorted(files, key=os.path.getmtime)
+
+
+def _trim(path=None):
+    while len(_solutions) > max_solutions:
+        del _solutions[next(iter(_solutions))]
+    if path is not None:
+        files = _stored_files(path)
+        for file_path in files[:max(len(files) - max_solutions, 0)]:
+            os.remove(file_path)
+
+
+def _touch(file_name, path=None):
+    _solutions[file_name] = _solutions.pop(file_name)
+    if path is not None and os.path.exists(os.path.join(path, file_name)):
+        os.utime(os.path.join(path, file_name))
+
+
+def _load(path):
+    if path in _loaded_dirs:
+        return
+    _loaded_dirs.add(path)
+    stored = dict(_solutions)
+    _solutions.clear()
+    for file_path in _stored_files(path):
+        with open(file_path) as f:
+            _solutions[os.path.basename(file_path)] = json.load(f)
+    _solutions.update(stored)
+    _trim(path)
+
+
+def _declare_duals(m):
+    '''
+    Declare the ``dual`` suffix so constraint duals are read back after a solve and sent to the
+    solver as the starting point of the next one.
+    '''
+    dual = getattr(m, 'dual', None)
+    if dual is None:
+        m.dual = Suffix(direction=Suffix.IMPORT_EXPORT)
+    elif dual.direction != Suffix.IMPORT_EXPORT:
+        dual.set_direction(Suffix.IMPORT_EXPORT)
+    return m.dual
+
+
+def save_solution(m, duals=True, path=None):
+    '''
+    Function to store the solution of a solved model. Values of every variable are stored, along
+    with constraint duals if the model has a ``dual`` suffix (declared by load_solution) and
+    duals=True. A stored solution replaces any earlier one for the same key (see
+    get_solution_key); only the ``max_solutions`` most recently used solutions are kept.
+
+    :param m: Solved model
+    :param duals: Also store duals
+    :type duals: bool
+    :param path: Directory to write the solution to. Defaults to ``warm_start_dir``.
+    :type path: str
+    '''
+    if path is None:
+        path = warm_start_dir
+    key = get_solution_key(m)
+    solution = {
+            'key': key,
+            'units': list(m.fs.df_units.UnitName),
+            'primal': {v.name: v.value for v in m.component_data_objects(Var, descend_into=True)
+                       if v.value is not None},
+            'dual': {}
+            }
+    if duals and isinstance(getattr(m, 'dual', None), Suffix):
+        solution['dual'] = {c.name: d for c, d in m.dual.items() if d is not None}
+    file_name = _file_name(key)
+    _solutions.pop(file_name, None)
+    _solutions[file_name] = solution
+    if path is not None:
+        os.makedirs(path, exist_ok=True)
+        tmp_path = os.path.join(path, f'{file_name}.tmp{os.getpid()}')
+        with open(tmp_path, 'w') as f:
+            json.dump(solution, f)
+        os.replace(tmp_path, os.path.join(path, file_name))
+    _trim(path)
+
+
+def find_solution(m, min_overlap=0.5, path=None):
+    '''
+    Function to find the stored solution closest to the train a model was built for. Only
+    solutions for the same case study and reference are considered. An exact key match is
+    preferred, then the largest overlap in unit names, then the same source water, then the same
+    scenario.
+
+    :param m: Model
+    :param min_overlap: Minimum share of unit names (intersection over union) shared with the
+        stored train
+    :type min_overlap: float
+    :param path: Directory to read solutions from. Defaults to ``warm_start_dir``.
+    :type path: str
+    :return: Stored solution dictionary, or None
+    '''
+    if path is None:
+        path = warm_start_dir
+    if path is not None:
+        _load(path)
+    key = get_solution_key(m)
+    units = set(m.fs.df_units.UnitName)
+    best, best_score = None, None
+    for file_name, solution in _solutions.items():
+        stored_key = solution['key']
+        if (stored_key['case_study'], stored_key['reference']) != (key['case_study'], key['reference']):
+            continue
+        stored_units = set(solution['units'])
+        overlap = len(units & stored_units) / len(units | stored_units)
+        if overlap < min_overlap:
+            continue
+        score = (stored_key == key, overlap, stored_key['source_hash'] == key['source_hash'],
+                 stored_key['scenario'] == key['scenario'])
+        if best_score is None or score > best_score:
+            best, best_score = file_name, score
+    if best is None:
+        return None
+    _touch(best, path)
+    return _solutions[best]
+
+
+def load_solution(m, duals=True, min_overlap=0.5, path=None):
+    '''
+    Function to warm start a model from the closest stored solution (see find_solution). Values
+    are set on variables with the same name that are not fixed in m, so inputs of the new run are
+    left as they are.
+
+    With duals=True, a ``dual`` suffix is declared on m so the duals of its next solve are imported
+    (and stored by save_solution), and stored duals are loaded into it. When duals were loaded,
+    the next solve_model call starts ipopt from them (warm_start_init_point).
+
+    The model should be compiled (see compile_model) first so the costing variables exist.
+
+    :param m: Model
+    :param duals: Also load duals
+    :type duals: bool
+    :param min_overlap: See find_solution
+    :type min_overlap: float
+    :param path: Directory to read solutions from. Defaults to ``warm_start_dir``.
+    :type path: str
+    :return: Number of variables set
+    '''
+    if duals:
+        _declare_duals(m)
+    solution = find_solution(m, min_overlap=min_overlap, path=path)
+    if solution is None:
+        return 0
+    primal = solution['primal']
+    n = 0
+    for v in m.component_data_objects(Var, descend_into=True):
+        if v.fixed or v.name not in primal:
+            continue
+        v.value = primal[v.name]
+        n += 1
+    if duals and solution['dual']:
+        dual = solution['dual']
+        for c in m.component_data_objects(Constraint, descend_into=True, active=True):
+            if c.name in dual:
+                m.dual[c] = dual[c.name]
+        m.fs.warm_start_duals = True
+    stored_key = solution['key']
+    print(f'Warm start from stored {stored_key["case_study"]} {stored_key["scenario"]} solution '
+          f'({n} variables set)')
+    return n
+
+
+def clear_warm_starts():
+    '''
+    Function to drop every stored solution held in memory. Files in the store directory, if any,
+    are left as they are and are read again on next use.
+    '''
+    _solutions.clear()
+    _loaded_dirs.clear()
@@ -1,6 +1,7 @@
-import ast
 import logging
 from re import template
+import tempfile
+import time
 import warnings
 
 import numpy as np
@@ -13,8 +14,19 @@ from pyomo.network import SequentialDecomposition, Arc
 from pyomo.network.port import SimplePort
 # from pyomo.contrib.mindtpy.MindtPy import MindtPySolver
 from . import financials
+from .data_catalog import file_hash, get_table, track_files
 from .case_study_trains import *
 from .post_processing import get_results_table
+from .train_spec import compile_train, get_train_spec
+from .warm_start import _declare_duals, load_solution, save_solution
+from .scaling import scale_constraints_by_gradient, scale_vars_by_value
+from .profiler import profile_phase, profiled
+from .telemetry import capture_output, read_ipopt_output, read_presolve_time, record_solve
+from .mixer_wt3 import Mixer1Data
+from .source_wt3 import SourceData
+from .splitter_binary import SplitterProcessData as SplitterBinaryData
+from .splitter_wt3 import SplitterProcessData
+from watertap3.wt_units.wt_unit import WT3UnitProcessData
 import pyomo.environ
 from pyomo.gdp import *
 
@@ -23,24 +35,29 @@ warnings.filterwarnings('ignore')
 __all__ = ['watertap_setup', 'run_model', 'run_and_return_model', 'run_model_no_print', 
             'run_watertap3', 'case_study_constraints', 'get_ix_stash', 'fix_ix_stash',
             'print_ro_results', 'print_results', 'set_bounds', 'get_ro_stash', 'fix_ro_stash', 
-            'make_decision', 'connected_units']
+            'make_decision', 'connected_units', 'get_flowsheet', 'copy_values', 'clear_templates',
+            'compile_model', 'solve_model', 'initialize_flowsheet', 'calculate_scaling_factors']
 
 
+@profiled()
 def watertap_setup(dynamic=False, case_study=None, reference='nawi', scenario=None,
-                   source_reference=None, source_case_study=None, source_scenario=None, new_df_units=None):
+                   source_reference=None, source_case_study=None, source_scenario=None, new_df_units=None,
+                   tea_overrides=None):
 
     '''
     Initial setup of WaterTAP3 model. 
 
     Create flowsheet and read in basic information about model (water sources, units in treatment train)
+
+    tea_overrides is an optional dictionary of TEA basis fields (see financials.TEABasis) used
+    instead of the values in case_study_TEA_basis.csv, e.g. {'plant_lifetime_yrs': 25}.
     '''
 
     def get_source(reference, water_type, case_study, scenario):
         '''
         Read in water source data. 
         '''
-        input_file = 'data/case_study_water_sources.csv'
-        df = pd.read_csv(input_file, index_col='variable')
+        df = get_table('case_study_water_sources.csv', index_col='variable')
         try:
             source_df = df[((df.case_study == case_study) & (df.water_type == water_type) & (df.reference == reference) & (df.scenario == scenario))].copy()
             source_flow = source_df.loc['flow'].value
@@ -66,6 +83,8 @@ def watertap_setup(dynamic=False, case_study=None, reference='nawi', scenario=No
             'scenario': scenario
             }
 
+    m.fs.tea_overrides = dict(tea_overrides) if tea_overrides is not None else {}
+
     if source_reference is None:
         source_reference = reference
     if source_case_study is None:
@@ -73,13 +92,12 @@ def watertap_setup(dynamic=False, case_study=None, reference='nawi', scenario=No
     if source_scenario is None:
         source_scenario = scenario
 
-    df = pd.read_csv('data/treatment_train_setup.csv') # Read in treatment train input sheet.
-
-    water_type_list = []
     if new_df_units is not None:
         m.fs.df_units = new_df_units.copy()
+        train_spec = compile_train(m.fs.df_units, check_refs=False)
     else:
-        m.fs.df_units = df[((df.Reference == reference) & (df.Scenario == scenario) & (df.CaseStudy == case_study))].copy()
+        train_spec = get_train_spec(reference, case_study, scenario) # Compiled treatment train input sheet.
+        m.fs.df_units = train_spec.df_units.copy()
         print(f'\nCase Study = {case_study_print}'
               f'\nScenario = {scenario_print}\n')
 
@@ -90,10 +108,7 @@ def watertap_setup(dynamic=False, case_study=None, reference='nawi', scenario=No
     if 'reverse_osmosis' in m.fs.df_units.Unit:
         m.fs.has_ro = True
 
-    for i in m.fs.df_units[m.fs.df_units.Type == 'intake'].index:
-        temp_dict = ast.literal_eval(m.fs.df_units[m.fs.df_units.Type == 'intake'].loc[i]['Parameter'])
-        for water_type in temp_dict['water_type']:
-            water_type_list.append(water_type)
+    water_type_list = list(train_spec.water_types)
 
     if len(water_type_list) == 1:
         water_type_list = water_type_list[0]
@@ -131,135 +146,404 @@ def watertap_setup(dynamic=False, case_study=None, reference='nawi', scenario=No
     return m
 
 
-def run_and_return_model(m, solver='ipopt', tolerance=None, tee=False, objective=False, 
-                        max_attempts=3, print_it=False, initial_run=True, mip_solver='glpk'):
+# Number of flowsheet templates kept in memory (least recently used are dropped). Each one is a
+# whole built model.
+max_templates = 8
 
+_templates = {}
+
+
+@profiled()
+def get_flowsheet(case_study=None, reference='nawi', scenario=None, source_reference=None, source_case_study=None,
+                  source_scenario=None, new_df_units=None, tea_overrides=None, values_from=None, dynamic=False):
     '''
-    Function to attempt model solve and return model object.
-    '''
+    Get a built (but not yet costed or solved) WaterTAP3 flowsheet, same as watertap_setup followed
+    by get_case_study.
 
-    if initial_run:
-        financials.get_system_costing(m.fs)
+    Each flowsheet is built once per (case study, scenario, treatment train, sources, TEA overrides)
+    and kept as a template together with the hashes of the data files read while building it; the
+    template is rebuilt if any of those files has changed since. Only the ``max_templates`` most
+    recently used templates are kept. Every call returns an independent clone of the template.
 
-    TransformationFactory('network.expand_arcs').apply_to(m)
+    If values_from is a model, variable values are carried over from it to the new flowsheet for
+    every variable with the same name that is not fixed in the new flowsheet.
+    '''
+    if new_df_units is not None:
+        spec = compile_train(new_df_units)
+    else:
+        spec = get_train_spec(reference, case_study, scenario)
+    if tea_overrides is None:
+        tea_overrides = {}
+    key = (dynamic, case_study, reference, scenario, source_reference, source_case_study, source_scenario, spec.key,
+           tuple(sorted(tea_overrides.items())))
+    template, hashes = _templates.pop(key, (None, None))
+    if template is None or any(file_hash(f) != h for f, h in hashes.items()):
+        with track_files() as files:
+            template = watertap_setup(dynamic=dynamic, case_study=case_study, reference=reference,
+                                      scenario=scenario, source_reference=source_reference,
+                                      source_case_study=source_case_study, source_scenario=source_scenario,
+                                      new_df_units=new_df_units, tea_overrides=tea_overrides)
+            template = get_case_study(m=template, new_df_units=new_df_units)
+        hashes = {f: file_hash(f) for f in files}
+    _templates[key] = (template, hashes)
+    while len(_templates) > max_templates:
+        del _templates[next(iter(_templates))]
+    m = template.clone()
+    if values_from is not None:
+        copy_values(values_from, m)
+    return m
 
-    if objective:
-        m.fs.objective_function = Objective(expr=m.fs.costing.LCOW)
 
-    model_solver = SolverFactory(solver)
-    if tolerance and solver == 'ipopt':
-        model_solver.options['tol'] = tolerance
+def copy_values(from_m, to_m):
+    '''
+    Copy variable values from one model to another. Variables are matched by name; variables that
+    are fixed in to_m or do not exist in both models are left as they are.
+    '''
+    to_vars = {v.name: v for v in to_m.component_data_objects(Var, descend_into=True)}
+    for from_var in from_m.component_data_objects(Var, descend_into=True):
+        if from_var.value is None:
+            continue
+        to_var = to_vars.get(from_var.name)
+        if to_var is not None and not to_var.fixed:
+            to_var.value = from_var.value
+    return to_m
 
-    logging.getLogger('pyomo.core').setLevel(logging.ERROR)
 
-    print('.................................')
-    print('\nDegrees of Freedom:', degrees_of_freedom(m))
-    if solver == 'gdpopt':
-        m.fs.results = results = model_solver.solve(m, tee=tee, mip_solver=mip_solver)
-    else:
-        m.fs.results = results = model_solver.solve(m, tee=tee)
-    
-    print(f'\nInitial solve attempt {results.solver.termination_condition.swapcase()}')
+def clear_templates():
+    '''
+    Drop all cached flowsheet templates.
+    '''
+    _templates.clear()
 
-    attempt_number = 1
-    while ((m.fs.results.solver.termination_condition in ['infeasible', 'maxIterations', 'unbounded', 'other']) & (attempt_number <= max_attempts)):
-        print(f'\nAttempt {attempt_number}:')
-        if solver == 'gdpopt':
-            m.fs.results = results = model_solver.solve(m, tee=tee, mip_solver=mip_solver)
-        else:
-            m.fs.results = results = model_solver.solve(m, tee=tee)
-        print(f'\n\tWaterTAP3 solver returned {results.solver.termination_condition.swapcase()} solution...')
-        attempt_number += 1
 
-    print(f'\nWaterTAP3 solution {results.solver.termination_condition.swapcase()}\n')
-    print('.................................')
+retry_conditions = ['infeasible', 'maxIterations', 'unbounded', 'other']
 
-    if print_it:
-        print_results(m)
 
+def _set_stream(b, name, t, flow=None, conc=None, temperature=None, pressure=None):
+    '''
+    Set the unfixed stream variables of a splitter, mixer or source port (flow_vol_<name>,
+    conc_mass_<name>, temperature_<name>, pressure_<name>).
+    '''
+    for var_name, val in [('flow_vol', flow), ('temperature', temperature), ('pressure', pressure)]:
+        var = getattr(b, f'{var_name}_{name}')[t]
+        if val is not None and not var.fixed:
+            var.value = val
+    if conc is not None:
+        conc_var = getattr(b, f'conc_mass_{name}')
+        for j, c in conc.items():
+            if not conc_var[t, j].fixed:
+                conc_var[t, j].value = c
+
+
+def _initialize_block(b):
+    '''
+    Set the outlet streams of one flowsheet block from its inlet streams. Called by
+    SequentialDecomposition for every block in the arc graph.
+    '''
+    if isinstance(b, WT3UnitProcessData):
+        b.initialize()
+        return
+    for t in b.flowsheet().config.time:
+        if isinstance(b, Mixer1Data):
+            inlets = b.create_inlet_list()
+            flows = {p: value(getattr(b, f'flow_vol_{p}')[t]) for p in inlets}
+            flow = sum(flows.values())
+            conc = {j: sum(flows[p] * value(getattr(b, f'conc_mass_{p}')[t, j]) for p in inlets) / flow if flow > 0 else 0
+                    for j in b.config.property_package.component_list}
+            _set_stream(b, 'out', t, flow=flow, conc=conc,
+                        temperature=sum(value(getattr(b, f'temperature_{p}')[t]) for p in inlets) / len(inlets),
+                        pressure=sum(value(getattr(b, f'pressure_{p}')[t]) for p in inlets) / len(inlets))
+            continue
+        stream = {
+                'flow': value(b.flow_vol_in[t]),
+                'conc': {j: value(b.conc_mass_in[t, j]) for j in b.config.property_package.component_list},
+                'temperature': value(b.temperature_in[t]),
+                'pressure': value(b.pressure_in[t])
+                }
+        if isinstance(b, SourceData):
+            _set_stream(b, 'out', t, **stream)
+        elif isinstance(b, SplitterProcessData):
+            for p in b.outlet_list:
+                _set_stream(b, p, t, **dict(stream, flow=value(getattr(b, f'split_fraction_{p}')[t]) * stream['flow']))
+        elif isinstance(b, SplitterBinaryData):
+            # Outlet is not chosen yet, so start from an even split.
+            for p in b.outlet_list:
+                _set_stream(b, p, t, **dict(stream, flow=stream['flow'] / len(b.outlet_list)))
+
+
+@profiled()
+def initialize_flowsheet(m, iter_lim=40, tol=1E-5):
+    '''
+    Function to initialize the streams of a flowsheet with expanded arcs. Blocks are visited in
+    arc order from the water sources and each block's outlet streams are calculated from its inlet
+    streams using its current water_recovery, removal_fraction and split fractions (see
+    WT3UnitProcess.initialize). Recycles are handled by tearing arcs and iterating on the torn
+    streams until they change by less than tol or iter_lim iterations are reached.
+
+    Values of fixed variables are not changed. Initialization only sets starting values for the
+    solver, so if it fails a warning is printed and the model is left as it is.
+    '''
+    seq = SequentialDecomposition(select_tear_method='heuristic', tear_method='Direct', iterLim=iter_lim, tol=tol)
+    try:
+        seq.run(m, _initialize_block)
+    except (RuntimeError, ValueError) as e:
+        print(f'Flowsheet initialization stopped early: {e}')
     return m
 
-def run_model(m, solver='ipopt', tolerance=None, tee=False, objective=False, 
-                max_attempts=3, print_it=False, initial_run=True, mip_solver='glpk'):
-    
+
+@profiled()
+def calculate_scaling_factors(m, max_gradient=100):
     '''
-    Function used to attempt model solve.
+    Function to set scaling factors for a flowsheet with expanded arcs. Units, splitters and mixers
+    scale their streams (and unit specific variables) from their current values; every other
+    unfixed variable is scaled by its current value, and every constraint so that its largest
+    derivative with respect to the scaled variables is at most max_gradient.
+
+    Factors are stored in the scaling_factor suffixes used by ipopt's user-scaling, which
+    solve_model turns on for scaled models. Scaling is based on current values, so it works best
+    after initialize_flowsheet or a warm start.
     '''
+    for b in m.block_data_objects(active=True, descend_into=True):
+        if isinstance(b, (WT3UnitProcessData, Mixer1Data, SplitterProcessData, SplitterBinaryData)):
+            b.calculate_scaling_factors()
+    scale_vars_by_value(m)
+    scale_constraints_by_gradient(m, max_gradient=max_gradient)
+    m.fs.scaled = True
+    return m
 
-    if initial_run:
-        financials.get_system_costing(m.fs)
 
-    TransformationFactory('network.expand_arcs').apply_to(m)
+@profiled()
+def compile_model(m, objective=False, initialize=False, scale=False):
+    '''
+    Function to prepare a model for solving: build system costing, expand arcs and attach the LCOW
+    objective. With initialize=True, the flowsheet streams are initialized after the arcs are
+    expanded (see initialize_flowsheet). With scale=True, scaling factors are then calculated
+    (see calculate_scaling_factors).
 
+    Costing is built and arcs are expanded only the first time a model is compiled, so it is safe
+    to call this before every solve. Later calls only add or re-activate the objective.
+    '''
+    if not getattr(m.fs, 'compiled', False):
+        financials.get_system_costing(m.fs)
+        with profile_phase('expand_arcs'):
+            TransformationFactory('network.expand_arcs').apply_to(m)
+        if initialize:
+            initialize_flowsheet(m)
+        if scale:
+            calculate_scaling_factors(m)
+        m.fs.compiled = True
     if objective:
-        m.fs.objective_function = Objective(expr=m.fs.costing.LCOW)
+        if hasattr(m.fs, 'objective_function'):
+            m.fs.objective_function.activate()
+        else:
+            m.fs.objective_function = Objective(expr=m.fs.costing.LCOW)
+    return m
+
+
+# Retry ladder for solve_model. Each step gives the ipopt options for one retry (on top of the
+# solver's own options) and, with 'reset', where the retry starts from: 'start' is the point the
+# model had before the first attempt (e.g. a warm start), 'initialize' re-runs
+# initialize_flowsheet. Without 'reset' the retry starts from the failed iterate. The last step is
+# repeated if max_attempts is larger than the ladder.
+retry_ladder = [
+        {'options': {'mu_strategy': 'adaptive'}},
+        {'options': {'mu_strategy': 'adaptive', 'bound_push': 1E-1, 'max_iter': 5000}, 'reset': 'start'},
+        {'options': {'mu_init': 1E-1, 'nlp_scaling_max_gradient': 10, 'acceptable_tol': 1E-4, 'max_iter': 5000},
+         'reset': 'initialize'}
+        ]
 
-    model_solver = SolverFactory(solver)
+# ipopt options for the first attempt after stored duals were loaded (see warm_start.load_solution)
+warm_start_options = {'warm_start_init_point': 'yes', 'warm_start_bound_push': 1E-8,
+                      'warm_start_mult_bound_push': 1E-8}
+
+
+@profiled()
+def solve_model(m, solver='ipopt', tolerance=None, tee=False, max_attempts=3, mip_solver='glpk',
+                verbose=True, retry_on=retry_conditions, ladder=retry_ladder, label=None):
+    '''
+    Function to solve a compiled model, retrying up to max_attempts times while the termination
+    condition is in retry_on. Results are stored in m.fs.results.
+
+    Retries follow ladder (see retry_ladder): each retry uses different ipopt options and can
+    restart from the starting point or a fresh initialization instead of the failed iterate. With
+    ladder=None every retry re-solves the same problem. Every attempt is logged in m.fs.solve_log
+    with its termination condition and wall time and, for ipopt, the NL write time, iteration and
+    restoration counts, problem size and final constraint violation. Each entry is also stored as
+    a telemetry record under label (see telemetry.record_solve).
+
+    Scaled models (see calculate_scaling_factors) are solved with ipopt's user-scaling. If duals
+    were loaded into the model by warm_start.load_solution, the first ipopt attempt starts from
+    them with warm_start_options.
+
+    solver is either a solver name or a solver object (e.g. from SolverFactory) to reuse across
+    calls.
+    '''
+    model_solver = SolverFactory(solver) if isinstance(solver, str) else solver
+    solver_name = solver if isinstance(solver, str) else getattr(solver, 'name', '')
     if tolerance and solver == 'ipopt':
         model_solver.options['tol'] = tolerance
+    is_ipopt = 'ipopt' in str(solver_name)
+    if not is_ipopt:
+        ladder = None
 
     logging.getLogger('pyomo.core').setLevel(logging.ERROR)
 
-    print('.................................')
-    print('\nDegrees of Freedom:', degrees_of_freedom(m))
-    if solver == 'gdpopt':
-        m.fs.results = results = model_solver.solve(m, tee=tee, mip_solver=mip_solver)
-    else:
-        m.fs.results = results = model_solver.solve(m, tee=tee)
-    print(f'\nInitial solve attempt {results.solver.termination_condition.swapcase()}')
+    if verbose:
+        print('.................................')
+        print('\nDegrees of Freedom:', degrees_of_freedom(m))
+
+    start_point = [(v, v.value) for v in m.component_data_objects(Var, descend_into=True) if not v.fixed]
+    m.fs.solve_log = solve_log = []
+
+    def attempt(step):
+        options = step.get('options', {})
+        reset = step.get('reset')
+        if reset == 'start':
+            for v, val in start_point:
+                v.value = val
+        elif reset == 'initialize':
+            initialize_flowsheet(m)
+        if is_ipopt and getattr(m.fs, 'scaled', False):
+            options = dict(options, nlp_scaling_method='user-scaling')
+        if is_ipopt:
+            fd, output_file = tempfile.mkstemp(prefix='ipopt_', suffix='.out')
+            os.close(fd)
+            options = dict(options, output_file=output_file)
+        old_options = {k: model_solver.options.get(k) for k in options}
+        model_solver.options.update(options)
+        start = time.perf_counter()
+        try:
+            if solver == 'gdpopt':
+                results = model_solver.solve(m, tee=tee, mip_solver=mip_solver)
+            elif is_ipopt:
+                # report_timing prints the presolve (NL write) time, which is read from the output
+                with capture_output(tee=tee) as output:
+                    results = model_solver.solve(m, tee=tee, report_timing=True)
+            else:
+                results = model_solver.solve(m, tee=tee)
+        finally:
+            solve_time = time.perf_counter() - start
+            for k, v in old_options.items():
+                if v is None:
+                    model_solver.options.pop(k, None)
+                else:
+                    model_solver.options[k] = v
+            stats = {}
+            if is_ipopt:
+                stats = read_ipopt_output(output_file)
+                os.remove(output_file)
+        entry = {
+                'attempt': len(solve_log),
+                'solver': str(solver_name),
+                'options': step.get('options', {}),
+                'reset': reset,
+                'termination_condition': str(results.solver.termination_condition),
+                'iterations': stats.get('iterations'),
+                'restorations': stats.get('restorations'),
+                'n_variables': stats.get('n_variables'),
+                'n_equality_constraints': stats.get('n_equality_constraints'),
+                'n_inequality_constraints': stats.get('n_inequality_constraints'),
+                'infeasibility': stats.get('infeasibility'),
+                'nl_write_time': read_presolve_time(output.getvalue()) if is_ipopt else None,
+                'ipopt_time': stats.get('ipopt_time'),
+                'solve_time': solve_time
+                }
+        solve_log.append(entry)
+        record_solve(m, entry, label=label)
+        m.fs.results = results
+        return results
+
+    def log_line(entry):
+        iterations = '' if entry['iterations'] is None else f', {entry["iterations"]} iterations'
+        return f'{entry["termination_condition"].swapcase()}{iterations}, {entry["solve_time"]:.2f} s'
+
+    warm = is_ipopt and getattr(m.fs, 'warm_start_duals', False)
+    m.fs.warm_start_duals = False
+    results = attempt({'options': warm_start_options} if warm else {})
+    if verbose:
+        print(f'\nInitial solve attempt {log_line(solve_log[-1])}')
 
     attempt_number = 1
-    while ((m.fs.results.solver.termination_condition in ['infeasible', 'maxIterations', 'unbounded', 'other']) & (attempt_number <= max_attempts)):
-        print(f'\nAttempt {attempt_number}:')
-        if solver == 'gdpopt':
-            m.fs.results = results = model_solver.solve(m, tee=tee, mip_solver=mip_solver)
-        else:
-            m.fs.results = results = model_solver.solve(m, tee=tee)
-        print(f'\n\tWaterTAP3 solver returned {results.solver.termination_condition.swapcase()} solution...')
+    while ((m.fs.results.solver.termination_condition in retry_on) & (attempt_number <= max_attempts)):
+        step = ladder[min(attempt_number, len(ladder)) - 1] if ladder else {}
+        if verbose:
+            print(f'\nAttempt {attempt_number}:' + (f' reset to {step["reset"]},' if step.get('reset') else '')
+                  + (f' options {step["options"]}' if step.get('options') else ''))
+        results = attempt(step)
+        if verbose:
+            print(f'\n\tWaterTAP3 solver returned {log_line(solve_log[-1])} solution...')
         attempt_number += 1
 
-    print(f'\nWaterTAP3 solution {results.solver.termination_condition.swapcase()}\n')
-    print('.................................')
+    if verbose:
+        print(f'\nWaterTAP3 solution {results.solver.termination_condition.swapcase()}\n')
+        print('.................................')
+
+    return results
+
+
+def run_and_return_model(m, solver='ipopt', tolerance=None, tee=False, objective=False, 
+                        max_attempts=3, print_it=False, initial_run=True, mip_solver='glpk'):
+
+    '''
+    Function to attempt model solve and return model object.
+
+    The model is compiled on the first call only (see compile_model); initial_run is kept for
+    backwards compatibility and has no effect.
+    '''
+
+    compile_model(m, objective=objective)
+    solve_model(m, solver=solver, tolerance=tolerance, tee=tee, max_attempts=max_attempts, mip_solver=mip_solver)
 
     if print_it:
         print_results(m)
 
-def run_model_no_print(m, solver='ipopt', tolerance=None, tee=False, objective=False, 
-                        max_attempts=3, initial_run=True, mip_solver='glpk'):
-
-    if initial_run:
-        financials.get_system_costing(m.fs)
+    return m
 
-    TransformationFactory('network.expand_arcs').apply_to(m)
+def run_model(m, solver='ipopt', tolerance=None, tee=False, objective=False, 
+                max_attempts=3, print_it=False, initial_run=True, mip_solver='glpk'):
+    
+    '''
+    Function used to attempt model solve.
 
-    if objective:
-        m.fs.objective_function = Objective(expr=m.fs.costing.LCOW)
+    The model is compiled on the first call only (see compile_model); initial_run is kept for
+    backwards compatibility and has no effect.
+    '''
 
-    model_solver = SolverFactory(solver)
-    if tolerance and solver == 'ipopt':
-        model_solver.options['tol'] = tolerance
-    # m.fs.solver = solver = SolverFactory('glpk')
+    compile_model(m, objective=objective)
+    solve_model(m, solver=solver, tolerance=tolerance, tee=tee, max_attempts=max_attempts, mip_solver=mip_solver)
 
-    logging.getLogger('pyomo.core').setLevel(logging.ERROR)
+    if print_it:
+        print_results(m)
 
-    if solver == 'gdpopt':
-        m.fs.results = results = model_solver.solve(m, tee=tee, mip_solver=mip_solver)
-    else:
-        m.fs.results = results = model_solver.solve(m, tee=tee)
+def run_model_no_print(m, solver='ipopt', tolerance=None, tee=False, objective=False, 
+                        max_attempts=3, initial_run=True, mip_solver='glpk'):
 
-    attempt_number = 1
-    while ((m.fs.results.solver.termination_condition in ['infeasible', 'maxIterations', 'unbounded']) & (attempt_number <= max_attempts)):
-        if solver == 'gdpopt':
-            m.fs.results = results = model_solver.solve(m, tee=tee, mip_solver=mip_solver)
-        else:
-            m.fs.results = results = model_solver.solve(m, tee=tee)
-        attempt_number += 1
+    compile_model(m, objective=objective)
+    solve_model(m, solver=solver, tolerance=tolerance, tee=tee, max_attempts=max_attempts, mip_solver=mip_solver,
+                verbose=False, retry_on=['infeasible', 'maxIterations', 'unbounded'])
 
+@profiled()
 def run_watertap3(m, desired_recovery=1, ro_bounds='seawater', solver='ipopt', 
-                    return_df=False, tolerance=None, tee=False):
+                    return_df=False, tolerance=None, tee=False, carry_values=False, warm_start=False,
+                    initialize=False, scale=False):
     
     '''
     Function to run WaterTAP3
+
+    Flowsheets rebuilt during the run (after make_decision and for RO) are cloned from cached
+    templates. With carry_values=True, solved variable values are carried over to the rebuilt
+    flowsheet.
+
+    With warm_start=True, the flowsheet is initialized from the closest stored solution of an
+    earlier run (see warm_start.load_solution) and the final solution is stored for later runs.
+    Set warm_start.warm_start_dir to keep stored solutions between processes.
+
+    With initialize=True, flowsheet streams are initialized unit by unit from the water sources
+    before the first solve (see initialize_flowsheet). With scale=True, scaling factors are set
+    for every flowsheet that is solved (see calculate_scaling_factors).
+
+    Call profiler.enable_profiling() first to record wall time and peak memory of each phase of
+    the run (see profiler.print_profile).
     '''
 
     print('\n=========================START WT3 MODEL RUN==========================')
@@ -267,7 +551,12 @@ def run_watertap3(m, desired_recovery=1, ro_bounds='seawater', solver='ipopt',
     case_study = m.fs.train['case_study']
     reference = m.fs.train['reference']
 
-    run_model(m, solver=solver, objective=True, tolerance=tolerance, tee=tee)
+    compile_model(m, objective=True, initialize=initialize, scale=scale)
+    if warm_start:
+        load_solution(m)
+
+    with profile_phase('initial_solve'):
+        run_model(m, solver=solver, objective=True, tolerance=tolerance, tee=tee)
 
     if m.fs.results.solver.termination_condition != 'optimal':
         raise Exception(f'\n\tMODEL RUN ABORTED:'
@@ -283,7 +572,9 @@ def run_watertap3(m, desired_recovery=1, ro_bounds='seawater', solver='ipopt',
         for dropped_unit in m.fs.all_dropped_units:
             print(f"\t{dropped_unit.replace('_', ' ').swapcase()}")
         print('\n=======================OPTIMIZED TREATMENT TRAIN=======================')
-        run_model(m, solver=solver, objective=True, tolerance=tolerance, tee=tee)
+        with profile_phase('decision_solve'):
+            compile_model(m, objective=True, initialize=initialize, scale=scale)
+            run_model(m, solver=solver, objective=True, tolerance=tolerance, tee=tee)
         if m.fs.results.solver.termination_condition != 'optimal':
             raise Exception(f'\n\tMODEL RUN ABORTED:'
               f'\n\tWT3 solution is {m.fs.results.solver.termination_condition.swapcase()}'
@@ -295,7 +586,8 @@ def run_watertap3(m, desired_recovery=1, ro_bounds='seawater', solver='ipopt',
         print('Initial IX solve OK...\nFixing number IX columns...')
         # m = fix_ix_stash(m, ix_stash, only_num_cols=True)
         m = fix_ix_stash(m, ix_stash)
-        run_model(m, solver=solver, objective=True, tolerance=tolerance)
+        with profile_phase('ix_solve'):
+            run_model(m, solver=solver, objective=True, tolerance=tolerance)
         # if m.fs.results.solver.termination_condition != 'optimal':
         #     raise Exception(f'\n\tMODEL RUN ABORTED:'
         #         f'\n\tWT3 solution is {m.fs.results.solver.termination_condition.swapcase()}'
@@ -352,21 +644,28 @@ def run_watertap3(m, desired_recovery=1, ro_bounds='seawater', solver='ipopt',
     if m.fs.has_ro:
         m, ro_stash = get_ro_stash(m)
         ###### RESET BOUNDS AND DOUBLE CHECK RUN IS OK SO CAN GO INTO SENSITIVITY #####
+        values_from = m if carry_values else None
         if m.fs.new_case_study:
             new_df_units = m.fs.df_units.copy()
             all_dropped_units = m.fs.all_dropped_units
-            m = watertap_setup(dynamic=False, case_study=case_study, scenario=scenario, new_df_units=new_df_units)
+            m = get_flowsheet(case_study=case_study, reference=reference, scenario=scenario, new_df_units=new_df_units,
+                              tea_overrides=m.fs.tea_overrides, values_from=values_from)
             m.fs.all_dropped_units = all_dropped_units
-            m = get_case_study(m=m, new_df_units=new_df_units)
             # if m.fs.has_ix:
             #     m = fix_ix_stash(m, ix_stash)
 
         else:
-            m = watertap_setup(dynamic=False, case_study=case_study, scenario=scenario)
-            m = get_case_study(m=m)
+            m = get_flowsheet(case_study=case_study, reference=reference, scenario=scenario,
+                              tea_overrides=m.fs.tea_overrides, values_from=values_from)
             # if m.fs.has_ix:
             #     m = fix_ix_stash(m, ix_stash)
 
+        compile_model(m, objective=True, initialize=initialize and not carry_values, scale=scale)
+        if warm_start and not carry_values:
+            load_solution(m)
+        elif warm_start:
+            _declare_duals(m)
+
         if case_study == 'gila_river' and scenario != 'baseline':
             m.fs.evaporation_pond.water_recovery.fix(0.895)
 
@@ -390,7 +689,8 @@ def run_watertap3(m, desired_recovery=1, ro_bounds='seawater', solver='ipopt',
             run_model(m, solver=solver, objective=True, tolerance=tolerance)
             m.fs.brine_concentrator.water_recovery.fix(0.8)
         
-        run_model(m, solver=solver, objective=True, tolerance=tolerance)
+        with profile_phase('ro_solve'):
+            run_model(m, solver=solver, objective=True, tolerance=tolerance)
         m = fix_ro_stash(m, ro_stash)
         m.fs.objective_function.deactivate()
         # m = fix_ro_stash(m, ro_stash)
@@ -398,7 +698,8 @@ def run_watertap3(m, desired_recovery=1, ro_bounds='seawater', solver='ipopt',
         #     m, ix_stash = get_ix_stash(m)
             m = fix_ix_stash(m, ix_stash)
 
-    run_model(m, solver=solver, objective=False, print_it=True, tolerance=tolerance)
+    with profile_phase('final_solve'):
+        run_model(m, solver=solver, objective=False, print_it=True, tolerance=tolerance)
 
     if m.fs.results.solver.termination_condition != 'optimal':
         print(f'\nFINAL MODEL RUN ABORTED:'
@@ -407,6 +708,19 @@ def run_watertap3(m, desired_recovery=1, ro_bounds='seawater', solver='ipopt',
               f'\n\tCheck model setup and initial conditions and retry.')
         return m
 
+    # how this model was run, so it can be rebuilt elsewhere (see parallel_sweep.get_model_spec)
+    m.fs.run_options = {
+            'desired_recovery': desired_recovery,
+            'ro_bounds': ro_bounds,
+            'solver': solver,
+            'tolerance': tolerance,
+            'initialize': initialize,
+            'scale': scale
+            }
+
+    if warm_start:
+        save_solution(m)
+
     m, df = get_results_table(m=m, case_study=case_study, scenario=scenario)
 
     print('\n==========================END WT3 MODEL RUN===========================')
@@ -417,6 +731,7 @@ def run_watertap3(m, desired_recovery=1, ro_bounds='seawater', solver='ipopt',
         return m
 
 
+@profiled()
 def get_ix_stash(m):
     m.fs.ix_stash = ix_stash = {}
     df = m.fs.df_units.set_index(['UnitName'])
@@ -434,6 +749,7 @@ def get_ix_stash(m):
     return m, ix_stash
 
 
+@profiled()
 def fix_ix_stash(m, ix_stash, only_num_cols=False):
     if only_num_cols:
         for ix in ix_stash.keys():
@@ -451,6 +767,7 @@ def fix_ix_stash(m, ix_stash, only_num_cols=False):
         return m
 
 
+@profiled()
 def get_ro_stash(m):
     m.fs.ro_stash = ro_stash = {}
     for k, v in m.fs.pfd_dict.items():
@@ -465,6 +782,7 @@ def get_ro_stash(m):
     return m, ro_stash
 
 
+@profiled()
 def fix_ro_stash(m, ro_stash):
     for ro in ro_stash.keys():
         unit = getattr(m.fs, ro)
@@ -593,6 +911,7 @@ def print_ro_results(m, ro_name):
     #     print(f'\tWater Perm. = {kws[-1]} m/(bar.hr)')
     #     print(f'\tSalt Perm. = {kss[-1]} m/hr')
 
+@profiled()
 def set_bounds(m=None, source_water_category=None):
     if source_water_category == 'seawater':
         feed_flux_max = 45  # lmh
@@ -644,6 +963,7 @@ def set_bounds(m=None, source_water_category=None):
     return m
 
 
+@profiled()
 def case_study_constraints(m, case_study, scenario):
     if case_study == 'upw':
         m.fs.media_filtration.water_recovery.fix(0.9)
@@ -780,6 +1100,7 @@ def connected_units(u, temp_pfd_dict, units=[]):
         connected_units(next_unit, temp_pfd_dict, units=units)
         return units
 
+@profiled()
 def make_decision(m, case_study, scenario):
 
     m.fs.units_to_drop = units_to_drop = []
@@ -804,7 +1125,7 @@ def make_decision(m, case_study, scenario):
 
         df_units = m.fs.df_units.set_index(['UnitName']).drop(index=remove_units).copy()
         from_unit_series = df_units.loc[from_unit].copy()
-        from_unit_params = ast.literal_eval(from_unit_series.Parameter)
+        from_unit_params = m.fs.pfd_dict[from_unit]['Parameter']
         from_unit_series.Parameter = str({k: v for k, v in from_unit_params.items() if k != 'split_fraction'})
         to_unit_name = []
         from_port = []
@@ -841,9 +1162,9 @@ def make_decision(m, case_study, scenario):
     df_units = df_units.set_index('UnitName').drop(index=units_to_drop).copy()
     df_units.reset_index(inplace=True)
 
-    m = watertap_setup(case_study=case_study, scenario=scenario, new_df_units=df_units)
+    m = get_flowsheet(case_study=case_study, reference=m.fs.train['reference'], scenario=scenario,
+                      new_df_units=df_units, tea_overrides=m.fs.tea_overrides)
     m.fs.all_dropped_units = all_dropped_units
-    m = get_case_study(m=m, new_df_units=df_units)
 
     return m
 
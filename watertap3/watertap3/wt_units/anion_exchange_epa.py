@@ -1,6 +1,7 @@
 import pandas as pd
 from pyomo.environ import Block, Constraint, Expression, NonNegativeReals, Var, exp, log, units as pyunits
 from watertap3.utils import financials
+from watertap3.utils.data_catalog import get_table
 from watertap3.wt_units.wt_unit import WT3UnitProcess
 
 ## REFERENCE: ADD REFERENCE HERE
@@ -15,8 +16,8 @@ class UnitProcess(WT3UnitProcess):
     def fixed_cap(self):
         t = self.flowsheet().config.time.first()
         def anion_ex_cost_curves(eqn, x):
-            cost_df = pd.read_csv('data/an_ex_cost_eqns.csv', index_col='eqn')
-            cost_df.drop(columns=['pct_deviation', 'date_modified', 'r_squared', 'max_size', 'min_size'], inplace=True)
+            cost_df = get_table('an_ex_cost_eqns.csv', index_col='eqn')
+            cost_df = cost_df.drop(columns=['pct_deviation', 'date_modified', 'r_squared', 'max_size', 'min_size'])
             coeffs = dict(cost_df.loc[eqn].items())
             cost = coeffs['C1'] * x ** coeffs['C2'] + coeffs['C3'] * log(x) + coeffs['C4'] + coeffs['C5'] * exp(coeffs['C6'] * x) + coeffs['C7'] * x ** 3 + coeffs['C8'] * x ** 2 + coeffs[
                 'C9'] * x + coeffs['C10']
@@ -1,6 +1,7 @@
 import pandas as pd
 from pyomo.environ import Block, Expression, units as pyunits
 from watertap3.utils import financials
+from watertap3.utils.data_catalog import get_table
 from watertap3.wt_units.wt_unit import WT3UnitProcess
 
 ## REFERENCE: Voutchkov (2018) figures 4.2 and 4.4
@@ -30,7 +31,7 @@ class UnitProcess(WT3UnitProcess):
         self.flow_in = pyunits.convert(self.flow_vol_in[time], to_units=pyunits.m ** 3 / pyunits.hr)
 
         def chem_addition(chem_name):
-            df = pd.read_csv('data/chemical_addition_cost_curves.csv', index_col='chem_name')
+            df = get_table('chemical_addition_cost_curves.csv', index_col='chem_name')
             df = df.loc[chem_name].copy()
             return df.base, df.exp, df.ratio, df.density
 
@@ -1,7 +1,8 @@
 import numpy as np
-import pandas as pd
 from pyomo.environ import Block, Expression, inequality, units as pyunits
 from watertap3.utils import financials, ml_regression
+from watertap3.utils.coef_cache import get_coefs
+from watertap3.utils.data_catalog import get_derived, get_table
 from watertap3.wt_units.wt_unit import WT3UnitProcess
 
 ## REFERENCE: 
@@ -11,6 +12,46 @@ module_name = 'chlorination'
 basis_year = 2014
 tpec_or_tic = 'TPEC'
 
+data_file = 'chlorination_cost.csv'
+
+
+def _build_dose_cost_surface():
+    df = get_table(data_file)
+    doses = np.round(np.arange(0, 25.1, 0.1), 1)
+    flows = np.unique(df.Flow_mgd.values)
+    xs = []
+    ys = []
+    for flow in flows:
+        df_hold = df[df.Flow_mgd == flow]
+        if 0 not in df_hold.Cost.values:
+            xs.append(np.hstack((0, df_hold.Dose.values)))
+            ys.append(np.hstack((0, df_hold.Cost.values)))
+        else:
+            xs.append(df_hold.Dose.values)
+            ys.append(df_hold.Cost.values)
+    pars = get_coefs(module_name, data_file, ('flows',),
+                     lambda: ml_regression.fit_power_laws(xs, ys, refine_tol=0)[0])
+    a, b = np.array(pars).T
+    costs = a[:, None] * doses[None, :] ** b[:, None]
+    # tabulated costs take precedence over the fitted curve where the dose is in the table
+    table = df.groupby(['Flow_mgd', 'Dose']).Cost.max()
+    for (flow, dose), cost in table.items():
+        match = np.flatnonzero(np.isclose(doses, dose))
+        if len(match):
+            costs[np.searchsorted(flows, flow), match[0]] = cost
+    return doses, flows, costs
+
+
+def get_dose_cost_surface():
+    '''
+    Chlorination capital cost surface from chlorination_cost.csv: cost at each dose from 0 to 25
+    mg/L (0.1 mg/L steps) for each tabulated flow. Built once and reused until the data file
+    changes.
+
+    :return: doses [mg/L], flows [MGD], costs with shape (len(flows), len(doses))
+    '''
+    return get_derived('chlorination_dose_cost_surface', _build_dose_cost_surface, tables=(data_file,))
+
 
 class UnitProcess(WT3UnitProcess):
 
@@ -52,39 +93,13 @@ class UnitProcess(WT3UnitProcess):
         except:
             self.chem_name = 'Chlorine'
         self.chem_dict = {self.chem_name: self.dose * 1E-3}
-        self.df = df = pd.read_csv('data/chlorination_cost.csv')
-        self.new_dose_list = new_dose_list = np.arange(0, 25.1, 0.1)
-        self.cost_list = cost_list = []
-        self.flow_list = flow_list = []
-        self.dose_list = dose_list = []
-        for flow in df.Flow_mgd.unique():
-            self.df_hold = df_hold = df[df.Flow_mgd == flow]
-            if 0 not in df_hold.Cost.values:
-                xs = np.hstack((0, df_hold.Dose.values))
-                ys = np.hstack((0, df_hold.Cost.values))
-            else:
-                xs = df_hold.Dose.values
-                ys = df_hold.Cost.values
-            a = ml_regression.get_cost_curve_coefs(xs=xs, ys=ys)[0][0]
-            b = ml_regression.get_cost_curve_coefs(xs=xs, ys=ys)[0][1]
-            for new_dose in new_dose_list:
-                if new_dose in df.Dose.to_list():
-                    if flow in df.Flow_mgd.to_list():
-                        cost_list.append(df[((df.Dose == new_dose) & (df.Flow_mgd == flow))].Cost.max())
-                    else:
-                        cost_list.append(a * new_dose ** b)
-                else:
-                    cost_list.append(a * new_dose ** b)
-                dose_list.append(new_dose)
-                flow_list.append(flow)
-        self.dose_cost_table = dose_cost_table = pd.DataFrame()
-        dose_cost_table['flow_mgd'] = flow_list
-        dose_cost_table['dose'] = dose_list
-        dose_cost_table['cost'] = cost_list
-        self.df1 = df1 = dose_cost_table[dose_cost_table.dose == self.dose]
-        self.final_xs = np.hstack((0, df1.flow_mgd.values))
-        self.final_ys = np.hstack((0, df1.cost.values))
-        (self.final_a, self.final_b) = ml_regression.get_cost_curve_coefs(xs=self.final_xs, ys=self.final_ys)[0]
+        doses, flows, costs = get_dose_cost_surface()
+        dose_i = int(np.abs(doses - self.dose).argmin())
+        self.final_xs = np.hstack((0, flows))
+        self.final_ys = np.hstack((0, costs[:, dose_i]))
+        (self.final_a, self.final_b) = get_coefs(module_name, data_file, ('dose', float(doses[dose_i])),
+                                                 lambda: ml_regression.fit_power_laws([self.final_xs], [self.final_ys],
+                                                                                      refine_tol=0)[0][0])
         self.cl_cap = (self.final_a * self.flow_in ** self.final_b) * 1E-3
         return self.cl_cap
 
@@ -5,6 +5,7 @@ from pyomo.environ import units as pyunits
 # from pyomo.repn.plugins.baron_writer import NonNegativeReals
 
 from watertap3.utils import financials
+from watertap3.utils.data_catalog import get_table
 from watertap3.wt_units.wt_unit import WT3UnitProcess
 import idaes.core.util.scaling as iscale
 
@@ -860,6 +861,29 @@ class UnitProcess(WT3UnitProcess):
                                             self.flow_vol_waste[self.t] * self.conc_mass_waste[self.t, c])
 
 
+    def get_scaling_nominals(self):
+        '''
+        Nominal values for the IX capital [$MM] and pump power [kW] variables, whose initial values
+        are placeholders several orders of magnitude off. Used by
+        WT3UnitProcess.calculate_scaling_factors.
+
+        :return: List of (variable, nominal value)
+        '''
+        nominals = [(self.total_ix_cap, 1),
+                    (self.column_total_cap, 1),
+                    (self.total_pump_cap, 0.1),
+                    (self.cap_per_column, 0.1),
+                    (self.resin_cap, 0.1),
+                    (self.ix_electricity_intensity, 0.1)]
+        for v in [self.regen_pump_cap, self.bw_pump_cap, self.rinse_pump_cap, self.boost_pump_cap]:
+            nominals.append((v, 0.01))
+        for v in [self.main_pump_power, self.regen_pump_power, self.bw_pump_power, self.rinse_pump_power,
+                  self.total_pump_power]:
+            nominals.append((v, 10))
+        if hasattr(self, 'bed_expansion_h'):
+            nominals.append((self.bed_expansion_h, 1))
+        return nominals
+
     def get_costing(self, unit_params=None, year=None):
         '''
         Initialize the unit in WaterTAP3.
@@ -889,7 +913,7 @@ class UnitProcess(WT3UnitProcess):
                     'polystyrenic_macro': 3680,
                     'polystyrenic_gel': 6240,
                     } # cost of resin per m3, adapted to $/m3 from EPA models
-            self.ix_df = pd.read_csv('data/ix_sac.csv', index_col='constituent')
+            self.ix_df = get_table('ix_sac.csv', index_col='constituent')
             self.presaturant_ion = 'sodium'
             try:
                 self.resin_type = unit_params['resin_type']
@@ -907,7 +931,7 @@ class UnitProcess(WT3UnitProcess):
                     'polyacrylic': 8658,
                     'nitrate': 6116
                     } # cost of resin per m3, adapted to $/m3 from EPA models
-            self.ix_df = pd.read_csv('data/ix_sba.csv', index_col='constituent')
+            self.ix_df = get_table('ix_sba.csv', index_col='constituent')
             self.presaturant_ion = 'chloride'
             try:
                 self.resin_type = unit_params['resin_type']
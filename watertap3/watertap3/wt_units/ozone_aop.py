@@ -1,9 +1,11 @@
 from pyomo.environ import value, Block, Expression, units as pyunits
 from watertap3.utils import financials
+from watertap3.utils.coef_cache import get_coefs
+from watertap3.utils.data_catalog import get_table
+from watertap3.utils.ml_regression import fit_power_laws
 from watertap3.wt_units.wt_unit import WT3UnitProcess
 import pandas as pd
 import numpy as np
-from scipy.optimize import curve_fit
 
 ## REFERENCES
 ## CAPITAL:
@@ -96,19 +98,24 @@ class UnitProcess(WT3UnitProcess):
         def power_curve(flow_mgd, a, b):
             return a * flow_mgd ** b
 
-        df = pd.read_csv('data/ozone_cost.csv', header=0)
-
-        doses = [1, 5, 10, 15, 20, 25]
-        flow_interp = []
-        cost_interp = []
-        for i, k in enumerate(df['flow (mgd)']):
-            costs = []
-            for d in doses:
-                cutal_ox = df[str(d)].to_numpy()
-                costs.append(cutal_ox[i])
-            flow_interp.append(k)
-            cost_interp.append(np.interp(dose, doses, costs))
-        (self.a, self.b), _ = curve_fit(power_curve, flow_interp, cost_interp, bounds=[[1E-5, 1E-5], [100000, 5]])
+        def fit():
+            df = get_table('ozone_cost.csv', header=0)
+
+            doses = [1, 5, 10, 15, 20, 25]
+            flow_interp = []
+            cost_interp = []
+            for i, k in enumerate(df['flow (mgd)']):
+                costs = []
+                for d in doses:
+                    cutal_ox = df[str(d)].to_numpy()
+                    costs.append(cutal_ox[i])
+                flow_interp.append(k)
+                cost_interp.append(np.interp(dose, doses, costs))
+            pars, _, _ = fit_power_laws([flow_interp], [cost_interp], refine_tol=0,
+                                        bounds=[[1E-5, 1E-5], [100000, 5]])
+            return pars[0]
+
+        self.a, self.b = get_coefs(module_name, 'ozone_cost.csv', (float(dose),), fit)
         iterp_cap = power_curve(flow, self.a, self.b)
         return iterp_cap
 
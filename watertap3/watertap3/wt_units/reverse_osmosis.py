@@ -1,4 +1,4 @@
-from pyomo.environ import Block, Constraint, Expression, NonNegativeReals, Var, units as pyunits
+from pyomo.environ import Block, Constraint, Expression, NonNegativeReals, Var, units as pyunits, value
 from watertap3.utils import financials
 from watertap3.wt_units.wt_unit import WT3UnitProcess
 
@@ -164,6 +164,35 @@ class UnitProcess(WT3UnitProcess):
         self.rack_support_cost_eq2 = Constraint(
                 expr=self.rack_support_cost[t] * 1.01 >= (150 + (self.membrane_area[t] * 0.025 * 5)) * 33 * 2)
 
+    def get_scaling_nominals(self):
+        '''
+        Nominal values for the RO variables that have no (or a poor) initial value. Used by
+        WT3UnitProcess.calculate_scaling_factors.
+
+        :return: List of (variable, nominal value)
+        '''
+        t = self.flowsheet().config.time.first()
+        flow = value(self.flow_vol_in[t])
+        tds = value(self.conc_mass_in[t, 'tds'])
+        nominals = [(self.membrane_area, value(self.membrane_area[t])),
+                    (self.pressure_vessel_cost, value(self.membrane_area[t]) * 25),
+                    (self.rack_support_cost, value(self.membrane_area[t]) * 8)]
+        for b in [self.feed, self.retentate, self.permeate]:
+            nominals += [(b.mass_flow_H2O, flow * 1000),
+                         (b.conc_mass_H2O, 1000),
+                         (b.conc_mass_total, 1000),
+                         (b.osm_coeff, 1),
+                         (b.mass_frac_H2O, 1),
+                         (b.pressure_osm, 10)]
+        for b in [self.feed, self.retentate]:
+            nominals += [(b.mass_flow_tds, flow * tds),
+                         (b.mass_frac_tds, tds / 1000),
+                         (b.pressure, value(b.pressure[t]))]
+        # Permeate salt mass fraction is in ppm.
+        nominals += [(self.permeate.mass_flow_tds, flow * tds * 1E-2),
+                     (self.permeate.mass_frac_tds, tds * 10)]
+        return nominals
+
     def get_costing(self, unit_params=None, year=None):
         '''
         Initialize the unit in WaterTAP3.
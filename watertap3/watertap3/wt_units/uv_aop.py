@@ -1,7 +1,9 @@
-import pandas as pd
+import numpy as np
 from pyomo.environ import Block, Expression, units as pyunits
-from scipy.optimize import curve_fit
 from watertap3.utils import financials
+from watertap3.utils.coef_cache import get_coefs
+from watertap3.utils.data_catalog import get_derived, get_table
+from watertap3.utils.ml_regression import fit_power_laws
 from watertap3.wt_units.wt_unit import WT3UnitProcess
 
 ## REFERENCE:
@@ -14,6 +16,53 @@ module_name = 'uv_aop'
 basis_year = 2014
 tpec_or_tic = 'TPEC'
 
+data_file = 'uv_cost.csv'
+flow_list = [1E-8, 1, 3, 5, 10, 25]  # flow in MGD
+
+
+def _build_cost_grid():
+    df = get_table(data_file)
+    flows = np.array(flow_list[1:], dtype=float)
+    doses = np.unique(df.dose.values).astype(float)
+    uvts = np.unique(df.uvt.values).astype(float)
+    in_flows = np.isin(df.flow.values, flows)
+    # reversed so the first row wins if a (dose, uvt, flow) is repeated
+    i = np.searchsorted(doses, df.dose.values[in_flows])[::-1]
+    j = np.searchsorted(uvts, df.uvt.values[in_flows])[::-1]
+    k = np.searchsorted(flows, df.flow.values[in_flows])[::-1]
+    costs = np.full((len(doses), len(uvts), len(flows)), np.nan)
+    costs[i, j, k] = df.cost.values[in_flows][::-1]
+    return doses, uvts, costs
+
+
+def get_cost_grid():
+    '''
+    UV capital cost from uv_cost.csv as a (dose, uvt, flow) array. Built once and reused until the
+    data file changes.
+
+    :return: doses [mJ/cm2], uvts, costs with shape (len(doses), len(uvts), len(flow_list) - 1)
+    '''
+    return get_derived('uv_cost_grid', _build_cost_grid, tables=(data_file,))
+
+
+def get_grid_coefs(i, j):
+    '''
+    Power curve a, b for the (doses[i], uvts[j]) point of the cost grid.
+    '''
+    doses, uvts, costs = get_cost_grid()
+
+    def fit():
+        return fit_power_laws([flow_list], [[1E-8, *costs[i, j]]], refine_tol=0)[0][0]
+
+    return get_coefs(module_name, data_file, (float(doses[i]), float(uvts[j])), fit)
+
+
+def _bracket(grid, x):
+    i1 = int(np.clip(np.searchsorted(grid, x), 1, len(grid) - 1))
+    i0 = i1 - 1
+    w = float(np.clip((x - grid[i0]) / (grid[i1] - grid[i0]), 0, 1))
+    return i0, i1, w
+
 
 class UnitProcess(WT3UnitProcess):
 
@@ -74,26 +123,24 @@ class UnitProcess(WT3UnitProcess):
 
     def uv_regress(self):
         '''
-        Determine a, b costing parameters as a function of flow, UVT, and UV dose for unit.
+        Determine a, b costing parameters as a function of flow, UVT, and UV dose for unit. a, b are
+        interpolated between the surrounding points of the cost grid.
 
         :return: a, b
         '''
-
-        def power_curve(x, a, b):
-            '''
-            Return power curve. Used for fitting cost data to determine a, b.
-            '''
-            return a * x ** b
-
-        self.df = pd.read_csv('data/uv_cost.csv', index_col='flow')
-        self.flow_points = [1E-8]
-        self.flow_list = [1E-8, 1, 3, 5, 10, 25]  # flow in MGD
-        for flow in self.flow_list[1:]:
-            temp = self.df.loc[flow]
-            cost = temp[((temp.dose == self.uv_dose) & (temp.uvt == self.uvt_in))]
-            cost = cost.iloc[0]['cost']
-            self.flow_points.append(cost)
-        (self.a, self.b), _ = curve_fit(power_curve, self.flow_list, self.flow_points)
+        doses, uvts, _ = get_cost_grid()
+        if not doses[0] <= self.uv_dose <= doses[-1] or not uvts[0] <= self.uvt_in <= uvts[-1]:
+            print(f'\n\t**ALERT**\n\tUV dose of {self.uv_dose} mJ/cm2 and/or UVT of {self.uvt_in} is outside the cost data.')
+            print(f'\tCost curve valid only for UV dose {doses[0]} - {doses[-1]} mJ/cm2 and UVT {uvts[0]} - {uvts[-1]}.')
+            print('\tNearest point in the cost data used.\n')
+        i0, i1, wi = _bracket(doses, self.uv_dose)
+        j0, j1, wj = _bracket(uvts, self.uvt_in)
+        coefs = np.zeros(2)
+        for i, w_dose in ((i0, 1 - wi), (i1, wi)):
+            for j, w_uvt in ((j0, 1 - wj), (j1, wj)):
+                if w_dose * w_uvt > 0:
+                    coefs += w_dose * w_uvt * np.array(get_grid_coefs(i, j))
+        self.a, self.b = float(coefs[0]), float(coefs[1])
 
         return self.a, self.b
 
@@ -7,9 +7,11 @@ import idaes.logger as idaeslog
 from idaes.core import (UnitModelBlockData, declare_process_block_class, useDefault)
 from idaes.core.util.config import is_physical_parameter_block
 from pyomo.common.config import ConfigBlock, ConfigValue, In
-from pyomo.environ import NonNegativeReals, SolverFactory, Var, units as pyunits
+from pyomo.environ import NonNegativeReals, SolverFactory, Var, units as pyunits, value
 from pyomo.network import Port
 
+from watertap3.utils.scaling import scale_stream, set_nominal
+
 __all__ = ['WT3UnitProcess']
 
 
@@ -226,4 +228,54 @@ class WT3UnitProcessData(UnitModelBlockData):
         self.waste.add(self.conc_mass_waste, 'conc_mass')
         self.waste.add(self.temperature_waste, 'temperature')
         self.waste.add(self.pressure_waste, 'pressure')
-        
\ No newline at end of file
+        
+
+    def initialize(self, **kwargs):
+        '''
+        Set the outlet and waste streams from the inlet stream, water_recovery and removal_fraction
+        so the unit starts from a point that satisfies its flow, component, temperature and
+        pressure balances. Fixed variables are left as they are.
+
+        Keyword arguments of the IDAES initialize method are accepted and ignored.
+        '''
+        time = self.flowsheet().config.time
+
+        def set_guess(var, val):
+            if not var.fixed:
+                var.value = val
+
+        for t in time:
+            flow_in = value(self.flow_vol_in[t])
+            flow_out = value(self.water_recovery[t]) * flow_in
+            flow_waste = flow_in - flow_out
+            set_guess(self.flow_vol_out[t], flow_out)
+            set_guess(self.flow_vol_waste[t], flow_waste)
+            for j in self.config.property_package.component_list:
+                conc_in = value(self.conc_mass_in[t, j])
+                mass_in = flow_in * conc_in
+                mass_waste = value(self.removal_fraction[t, j]) * mass_in
+                set_guess(self.conc_mass_out[t, j], (mass_in - mass_waste) / flow_out if flow_out > 0 else conc_in)
+                set_guess(self.conc_mass_waste[t, j], mass_waste / flow_waste if flow_waste > 0 else conc_in)
+            set_guess(self.temperature_out[t], value(self.temperature_in[t]))
+            set_guess(self.temperature_waste[t], value(self.temperature_in[t]))
+            set_guess(self.pressure_out[t], value(self.pressure_in[t]) + value(self.deltaP_outlet[t]))
+            set_guess(self.pressure_waste[t], value(self.pressure_in[t]) + value(self.deltaP_waste[t]))
+
+    def calculate_scaling_factors(self):
+        '''
+        Set scaling factors for the inlet, outlet and waste streams from the current inlet flow
+        and concentrations.
+
+        Units with other variables to scale define get_scaling_nominals, returning a list of
+        (variable, nominal value) pairs. (A calculate_scaling_factors method on a unit's
+        UnitProcess class would not be called: this data class comes first in the MRO of the
+        unit blocks.)
+        '''
+        for t in self.flowsheet().config.time:
+            flow = value(self.flow_vol_in[t])
+            conc = {j: value(self.conc_mass_in[t, j]) for j in self.config.property_package.component_list}
+            for name in ['in', 'out', 'waste']:
+                scale_stream(self, name, t, flow, conc)
+        if hasattr(self, 'get_scaling_nominals'):
+            for var, nominal in self.get_scaling_nominals():
+                set_nominal(var, nominal=nominal)